@@ -214,7 +214,7 @@ class DescendAction(Action):
         if self.entity.check_for_immobility():
             return None
 
-        if self.engine.game_map.tiles[self.entity.x, self.entity.y]["tile_id"] == "descending_stair":
+        if self.engine.game_map.get_tile_id(self.entity.x, self.entity.y) == "descending_stair":
             descend_x, descend_y = self.entity.x, self.entity.y
             actors = []
             if self.entity == self.engine.player:
@@ -238,7 +238,7 @@ class DescendAction(Action):
                 if actor.ai:
                     if actor.ai.owner == self.engine.player or actor.ai.target == self.engine.player:
                         self.engine.game_map.descending_actors.add(actor)
-        elif self.engine.game_map.tiles[self.entity.x, self.entity.y]["tile_id"] == "ascending_stair":
+        elif self.engine.game_map.get_tile_id(self.entity.x, self.entity.y) == "ascending_stair":
             raise exceptions.Impossible(i("이 계단은 위로만 향한다.",
                                           "This stair only goes up."))
         else:
@@ -260,7 +260,7 @@ class AscendAction(Action):
         if self.entity.check_for_immobility():
             return None
 
-        if self.engine.game_map.tiles[self.entity.x, self.entity.y]["tile_id"] == "ascending_stair":
+        if self.engine.game_map.get_tile_id(self.entity.x, self.entity.y) == "ascending_stair":
             ascend_x, ascend_y = self.entity.x, self.entity.y
             actors = []
             if self.entity == self.engine.player:
@@ -298,7 +298,7 @@ class AscendAction(Action):
                 if actor.ai:
                     if actor.ai.owner == self.engine.player or actor.ai.target == self.engine.player:
                         self.engine.game_map.ascending_actors.add(actor)
-        elif self.engine.game_map.tiles[self.entity.x, self.entity.y]["tile_id"] == "descending_stair":
+        elif self.engine.game_map.get_tile_id(self.entity.x, self.entity.y) == "descending_stair":
             raise exceptions.Impossible(i("이 계단은 아래로만 향한다.",
                                           "This stair only goes down."))
         else:
@@ -1150,7 +1150,7 @@ class MovementAction(ActionWithDirection):
         if self.entity.actor_state.is_in_deep_pit:
 
             # There are no "crawl out failure" when the actor is moving between different depth of pits.
-            if self.engine.game_map.tiles[dest_x, dest_y]["tile_id"] == "deep_pit" or self.engine.game_map.tiles[dest_x, dest_y]["tile_id"] == "shallow_pit":
+            if self.engine.game_map.get_tile_id(dest_x, dest_y) == "deep_pit" or self.engine.game_map.get_tile_id(dest_x, dest_y) == "shallow_pit":
                 crawl_out_chance = 1
             else:
                 # If the actor is big enough, it can crawl out freely
@@ -1665,7 +1665,7 @@ class BumpAction(ActionWithDirection):
                     return MovementAction(self.entity, self.dx, self.dy).perform()
                 else:
                     # If next tile is same as current one, ignore warning.
-                    if self.engine.game_map.tiles[self.entity.x + self.dx, self.entity.y + self.dy]["tile_id"] == self.engine.game_map.tiles[self.entity.x, self.entity.y]["tile_id"]:
+                    if self.engine.game_map.get_tile_id(self.entity.x + self.dx, self.entity.y + self.dy) == self.engine.game_map.get_tile_id(self.entity.x, self.entity.y):
                         return MovementAction(self.entity, self.dx, self.dy).perform()
                     from input_handlers import DangerousTileWalkHandler
                     self.engine.event_handler = DangerousTileWalkHandler(dx=self.dx, dy=self.dy)
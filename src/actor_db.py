@@ -1,4 +1,5 @@
-from typing import Optional
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
 from entity import Actor
 
 ### NOTE: Rarity can have value between 0 and 10 ###
@@ -21,13 +22,56 @@ class ActorDB:
 
     # k, v = difficulty, actor
 
+    actor_by_id: Dict[str, Actor] = {} # Index of monster_difficulty. Built by get_actor_by_id().
+    spawn_tables: Dict[tuple, Tuple[List[Actor], List[int]]] = {} # key: (type, difficulty, diff_range), value: (population, cumulative weights). Built by get_spawn_table().
+
     def get_actor_by_id(entity_id: str) -> Optional[Actor]:
+        mon = ActorDB.actor_by_id.get(entity_id)
+        if mon is None:
+            ActorDB.index_actors() # Monsters might have been added after the index was built
+            mon = ActorDB.actor_by_id.get(entity_id)
+            if mon is None:
+                print(f"WARNING::Can't find {entity_id} from ActorDB.")
+        return mon
+
+    def index_actors() -> None:
+        actor_by_id = {}
         for monslist in ActorDB.monster_difficulty.values():
             for mon in monslist:
-                if mon.entity_id == entity_id:
-                    return mon
-        print(f"WARNING::Can't find {entity_id} from ActorDB.")
-        return None
+                actor_by_id.setdefault(mon.entity_id, mon) # First match wins, like the linear search did
+        ActorDB.actor_by_id = actor_by_id
+
+    def get_spawn_table(difficulty: int, diff_range: Tuple[int, int], type: str="surface") -> Tuple[List[Actor], List[int]]:
+        """
+        Return monsters of the given type whose difficulty is in range(*diff_range),
+        and the cumulative sum of their weights. (For random.choices(cum_weights=...))
+        Monsters that are closer to the given difficulty get lower weights.
+        NOTE: Tables are cached, since monsters and their rarity do not change after actor_factories is imported.
+        """
+        key = (type, difficulty, diff_range)
+        table = ActorDB.spawn_tables.get(key)
+        if table is not None:
+            return table
+
+        if type == "surface":
+            mon_dict = ActorDB.surface_monster_difficulty
+        elif type == "underwater":
+            mon_dict = ActorDB.underwater_monster_difficulty
+        else:
+            print(f"ERROR::Cannot find monster type of {type}")
+            mon_dict = ActorDB.surface_monster_difficulty
+
+        population_list = []
+        rarity_list = []
+        for diff in range(*diff_range):
+            if diff in mon_dict:
+                population_list.extend(mon_dict[diff])
+                for mon in mon_dict[diff]:
+                    rarity_list.append(max(0, int(mon.rarity / 1 + abs(diff - difficulty))))
+
+        table = (population_list, list(accumulate(rarity_list)))
+        ActorDB.spawn_tables[key] = table
+        return table
 
     def reset() -> None:
         """Delete all db. Is called when you change the ingame language."""
@@ -44,4 +88,6 @@ class ActorDB:
             21: [], 22: [], 23: [], 24: [], 25: [], 26: [], 27: [], 28: [], 29: [], 30: [],
         }
         ActorDB.surface_monster_difficulty = {}
-        ActorDB.underwater_monster_difficulty = {}
\ No newline at end of file
+        ActorDB.underwater_monster_difficulty = {}
+        ActorDB.actor_by_id = {}
+        ActorDB.spawn_tables = {}
\ No newline at end of file
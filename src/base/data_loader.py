@@ -1,12 +1,56 @@
+import io
 import os
 import sys
 import shelve
+import pickle
 import copy
 from typing import Optional
 
 
+class EnginePickler(pickle.Pickler):
+    """
+    Pickles the engine without its gamemaps.
+    Gamemaps and the entities on them are already saved on their own files (see World.save_map_to_serialized_data()),
+    so they are saved as persistent ids instead.
+    """
+    def __init__(self, file, engine):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        from game_map import GameMap
+        self.gamemap_cls = GameMap
+        self.saved_maps = engine.world.saved_maps
+        self.entity_ids = {}
+        for depth in engine.world.depths_in_mem:
+            if engine.world.check_if_map_on_mem(depth):
+                for index, entity in enumerate(engine.world.mem_world[depth].entities):
+                    self.entity_ids[id(entity)] = ("entity", depth, index)
+
+    def persistent_id(self, obj):
+        if isinstance(obj, self.gamemap_cls) and obj.depth in self.saved_maps:
+            return ("gamemap", obj.depth)
+        return self.entity_ids.get(id(obj))
+
+
+class EngineUnpickler(pickle.Unpickler):
+    def __init__(self, file):
+        super().__init__(file)
+        self.gamemaps = {}
+
+    def get_gamemap(self, depth: int):
+        if depth not in self.gamemaps:
+            from world import World
+            self.gamemaps[depth] = World.load_map_from_serialized_data(depth)
+        return self.gamemaps[depth]
+
+    def persistent_load(self, pid):
+        if pid[0] == "gamemap":
+            return self.get_gamemap(pid[1])
+        elif pid[0] == "entity":
+            return self.get_gamemap(pid[1]).entities[pid[2]]
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
+
+
 def save_game(player, engine):
-    # Serialize all cached gamemaps
+    # Serialize gamemaps that has changed since their last save
     engine.world.save_world()
 
     with shelve.open(os.getcwd()+"\\storage\\data\\game") as gamedata:
@@ -14,18 +58,22 @@ def save_game(player, engine):
         temp_console = engine.console
         temp_context = engine.context
         temp_sound_manger = engine.sound_manager
+        temp_turn_profiler = engine.turn_profiler
         engine.console = None
         engine.context = None
         engine.sound_manager = None
-
-        # Player
-        gamedata["player_index"] = engine.game_map.entities.index(player) # Save the index number of a player instead of the entire object to reduce savefile size.
-
-        # Engine
-        gamedata["engine"] = engine
+        engine.turn_profiler = None
+
+        # Engine (Gamemaps are not included. see EnginePickler)
+        from world import SAVE_FORMAT_VERSION
+        buffer = io.BytesIO()
+        EnginePickler(buffer, engine).dump(engine)
+        gamedata["save_format_version"] = SAVE_FORMAT_VERSION
+        gamedata["engine"] = buffer.getvalue()
         engine.console = temp_console
         engine.context = temp_context
         engine.sound_manager = temp_sound_manger
+        engine.turn_profiler = temp_turn_profiler
 
         gamedata.close()
 
@@ -35,10 +83,12 @@ def load_game():
     if not os.path.isfile(os.getcwd()+"\\storage\\data\\game.dat"):
         raise FileNotFoundError
 
+    from world import SAVE_FORMAT_VERSION
     with shelve.open(os.getcwd()+"\\storage\\data\\game", "r") as savefile:
-        player_index = savefile["player_index"]
-        engine = savefile["engine"]
-        engine.player = engine.game_map.entities[player_index]
+        if savefile.get("save_format_version") != SAVE_FORMAT_VERSION:
+            print(f"ERROR::Save format version {savefile.get('save_format_version')} is not supported. Current:{SAVE_FORMAT_VERSION}")
+            raise FileNotFoundError
+        engine = EngineUnpickler(io.BytesIO(savefile["engine"])).load()
     return engine
 
 
@@ -54,15 +54,18 @@ def init_game_variables(player, cfg, console: Console, context: Context):
 
 
     engine.depth = 1
-    engine.world.save_map_to_memory(engine.generate_new_dungeon(console, context, engine.depth, False), engine.depth)
+    if engine.world.pregenerate_depth > 0:
+        engine.world.pregenerate_maps(range(engine.depth, engine.world.pregenerate_depth + 1))
+        engine.world.save_map_to_memory(engine.world.load_map_from_serialized_data(engine.depth), engine.depth)
+    else:
+        engine.world.save_map_to_memory(engine.generate_new_dungeon(console, context, engine.depth, False), engine.depth)
     engine.game_map = engine.world.get_map(depth=engine.depth) # Has to manually set player gamemap so that
 
     # Normally setting up gamemap is handled in entity.copy(gamemap=gamemap), but this is the only exception.
     engine.player.gamemap = engine.game_map
 
-    # You should not directly use .append
-    # but this is an exception.
-    engine.player.gamemap.entities.append(engine.player)
+    # Player is added to the gamemap manually, since player is not spawned using entity.spawn().
+    engine.player.gamemap.add_entity(engine.player)
 
     engine.player.initialize_self() # Initialize player (give initial items, skils, etc)
     engine.game_map.adjustments_before_new_map()
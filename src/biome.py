@@ -149,7 +149,9 @@ class Biome:
         if terrain is None:
             import terrain_factories
             terrain = terrain_factories.terrain_dict
-        self.terrain = copy.deepcopy(terrain)
+        # Only the weights are modified per biome, so the terrains themselves are shared with terrain_factories.
+        # NOTE: Terrains should not be modified directly. procgen.choose_terrain() copies the chosen terrain for each room.
+        self.terrain = dict(terrain)
 
         if remove_all_terrain_of_type:
             for string in remove_all_terrain_of_type:
@@ -180,6 +182,17 @@ class Biome:
         if self.monster_difficulty:
             self.adjust_biome_monster_difficulty()
 
+    def __deepcopy__(self, memo):
+        """Terrains are shared with terrain_factories. (see __init__) Only the terrain weights are copied."""
+        clone = copy.copy(self)
+        memo[id(self)] = clone
+        for k, v in self.__dict__.items():
+            if k == "terrain":
+                clone.terrain = dict(v)
+            else:
+                setattr(clone, k, copy.deepcopy(v, memo))
+        return clone
+
     @property
     def room_x_spacing(self) -> int:
         return self._room_x_spacing
@@ -1,4 +1,3 @@
-from collections import deque
 from typing import List, Optional, Tuple
 import numpy as np
 import tcod
@@ -37,30 +36,9 @@ class Blob:
         4. 죽은 세포 주변에 정확히 세 개의 살아있는 세포가 있을 경우 부활
         If your goal is to get a new random shaped grid, you can use noise() instead.
         """
-        temp_grid = np.full(
-            (self.grid_width, self.grid_height), fill_value=True, order="F"
-        )
-
-        for x in range(len(self.grid)):
-            for y in range(len(self.grid[0])):
-                cell_count = 0
-                for x_add, y_add in ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)):
-                    try:
-                        if self.grid[x + x_add, y + y_add] == True:
-                            cell_count += 1
-                    except:
-                        continue
-
-                if self.grid[x][y]:
-                    if cell_count == 3:
-                        continue
-                    else:
-                        temp_grid[x][y] = False
-                else:
-                    if cell_count == 3:
-                        temp_grid[x][y] = True
-
-        self.grid = temp_grid
+        alive = np.asarray(self.grid, dtype=bool)
+        cell_count = count_neighbors(alive)
+        self.grid = np.where(alive, (cell_count == 2) | (cell_count == 3), cell_count == 3)
 
     def noise(self): #TODO Unused function
         """
@@ -77,81 +55,46 @@ class Blob:
         self.grid = np.random.randint(0, 2, size=(self.grid_width, self.grid_height)) #0 to 1
 
     def get_start_cell(self) -> Optional[Tuple[int, int]]:
-        for x in range(len(self.grid)):
-            for y in range(len(self.grid[0])):
-                if self.grid[x][y]:
-                    return (x, y)
-        return None
+        cells = np.flatnonzero(self.grid) # x-major order, same as scanning x then y
+        if not cells.size:
+            return None
+        x, y = np.unravel_index(cells[0], self.grid.shape)
+        return (int(x), int(y))
 
     def remove_non_chunks(self):
-        q = deque()
+        """Remove every chunks that contains a cell in self.tried."""
+        if not self.tried:
+            return None
+        labels = label_chunks(self.grid)
         for x, y in self.tried:
-            visited = np.full((self.grid_width, self.grid_height), fill_value=False, order="F")
-            q.append((x, y))
-            while q:
-                curr = q.popleft()
-                if curr == None:
-                    break
-                for dxdy in ((1, 0), (0, 1), (-1, 0), (0, -1)):
-                    nx = curr[0] + dxdy[0]
-                    ny = curr[1] + dxdy[1]
-                    if nx >= 0 and nx < self.grid_width \
-                            and ny >= 0 and ny < self.grid_height:
-                        if not visited[nx][ny] and self.grid[nx][ny]:
-                            visited[nx][ny] = True
-                            self.grid[nx][ny] = False
-                            q.append((nx, ny))
+            if self.grid[x, y]:
+                self.grid[labels == labels[x, y]] = False
 
     def blobify(self, min_chunk_mass=None, max_chunk_mass=None, randomize_bfs_dir: bool=True) -> bool:
         """Make current noise map into one big blob so that every node is connected.
         NOTE: 'Connected' means either one of the 4 sides of the node is connected to other living node.
-        NOTE: There can be several different blobs in self.grid after running blobify(). So you must run remove_non_chunks() afterwards.
+        Chunks are searched in x-major order of their first cell.
+        The first chunk that is larger than min_chunk_mass becomes the blob,
+        and if the chunk is larger than max_chunk_mass, only the max_chunk_mass nodes that are closest to its first cell are kept.
+        Args:
+            randomize_bfs_dir:
+                if True, nodes of the same distance are randomly chosen when the chunk is cut down to max_chunk_mass.
         Return:
             boolean, whether the algorithm found a chunk of a given size or not."""
         self.tried.clear()
-        visited = np.full((self.grid_width, self.grid_height), fill_value=False, order="F")
-        chunk_size = 1
-
-        for x in range(len(self.grid)):
-            for y in range(len(self.grid[0])):
-                if not self.grid[x][y]:
-                    continue
-
-                q = deque()
-                q.append((x, y))
-                while q:
-                    curr = q.popleft()
-                    if curr == None:
-                        break
-
-                    if randomize_bfs_dir:
-                        dir = random.choice([
-                            ((1, 0), (0, 1), (-1, 0), (0, -1)),
-                            ((0, -1), (1, 0), (0, 1), (-1, 0)),
-                            ((0, -1), (1, 0), (0, 1), (-1, 0)),
-                            ((0, -1), (1, 0), (0, 1), (-1, 0))
-                        ])
-                    else:
-                        dir = ((1, 0), (0, 1), (-1, 0), (0, -1))
-
-                    for dxdy in dir:
-                        nx = curr[0] + dxdy[0]
-                        ny = curr[1] + dxdy[1]
-                        if nx >= 0 and nx < self.grid_width \
-                                and ny >= 0 and ny < self.grid_height:
-                            if not visited[nx][ny] and self.grid[nx][ny]:
-                                visited[nx][ny] = True
-                                q.append((nx, ny))
-                                chunk_size += 1
-                                if max_chunk_mass is not None and chunk_size >= max_chunk_mass:
-                                    self.grid = visited
-                                    return True
-                if min_chunk_mass is None or chunk_size > min_chunk_mass:
-                    self.grid = visited
-                    return True
-                else:
-                    self.tried.append((x, y))
-                    chunk_size = 1
+        labels = label_chunks(self.grid)
+        chunk_ids, chunk_sizes = np.unique(labels[labels >= 0], return_counts=True)
+
+        for chunk_id, chunk_size in zip(chunk_ids, chunk_sizes):
+            start = tuple(int(i) for i in np.unravel_index(chunk_id, labels.shape))
+            chunk = labels == chunk_id
+            if max_chunk_mass is not None and chunk_size >= max_chunk_mass:
+                self.grid = grow_within(chunk, start, int(max_chunk_mass), randomize=randomize_bfs_dir)
+                return True
+            if min_chunk_mass is None or chunk_size > min_chunk_mass:
+                self.grid = chunk
+                return True
+            self.tried.append(start)
         return False
 
     def crop(self, force_width: int = None, force_height: int = None):
@@ -168,13 +111,11 @@ class Blob:
         """
         min_x, max_x, min_y, max_y = self.grid_width, 0, self.grid_height, 0
 
-        for x in range(len(self.grid)):
-            for y in range(len(self.grid[0])):
-                if self.grid[x][y] == 1:
-                    min_x = min(min_x, x)
-                    max_x = max(max_x, x)
-                    min_y = min(min_y, y)
-                    max_y = max(max_y, y)
+        xs = np.flatnonzero(np.any(self.grid == 1, axis=1))
+        ys = np.flatnonzero(np.any(self.grid == 1, axis=0))
+        if xs.size:
+            min_x, max_x = int(xs[0]), int(xs[-1])
+            min_y, max_y = int(ys[0]), int(ys[-1])
 
         if force_width:
             if max_x > min_x + force_width:
@@ -214,20 +155,97 @@ class Blob:
         ######.
         #####..
         """
-        min_y, max_y = self.grid_height, 0
-
-        for x in range(len(self.grid)):
-            for y in range(len(self.grid[0])):
-                if self.grid[x][y] == True:
-                    min_y = min(min_y, y)
-                    max_y = max(max_y, y)
-                    gap_size = max_y - min_y - 1
-                    if gap_size <= max_fill_gap_size and gap_size > 0:
-                        for y in range(min_y+1, min_y+gap_size+1):
-                            self.grid[x][y] = True
-                    min_y += 1+gap_size
-                    max_y = 0
-            min_y, max_y = self.grid_height, 0
+        # Fill every gaps between two living nodes of the same column(x) that are shorter than max_fill_gap_size.
+        alive = np.asarray(self.grid, dtype=bool)
+        height = alive.shape[1]
+        ys = np.arange(height)
+        prev_alive = np.maximum.accumulate(np.where(alive, ys, -1), axis=1) # y of the closest living node above (or itself)
+        next_alive = np.minimum.accumulate(np.where(alive, ys, height)[:, ::-1], axis=1)[:, ::-1] # y of the closest living node below (or itself)
+        gap_size = next_alive - prev_alive - 1
+        self.grid[~alive & (prev_alive >= 0) & (next_alive < height) & (gap_size <= max_fill_gap_size)] = True
+
+
+def count_neighbors(alive: np.ndarray) -> np.ndarray:
+    """Return the number of living nodes among the 8 neighbors of each node. Nodes outside of the grid are considered dead."""
+    padded = np.pad(alive, 1).astype(np.int8)
+    width, height = alive.shape
+    cell_count = np.zeros(alive.shape, dtype=np.int8)
+    for x_add, y_add in ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)):
+        cell_count += padded[1+x_add:1+x_add+width, 1+y_add:1+y_add+height]
+    return cell_count
+
+
+def grow4(region: np.ndarray) -> np.ndarray:
+    """Return the region expanded by one node to its 4 sides."""
+    grown = region.copy()
+    grown[1:, :] |= region[:-1, :]
+    grown[:-1, :] |= region[1:, :]
+    grown[:, 1:] |= region[:, :-1]
+    grown[:, :-1] |= region[:, 1:]
+    return grown
+
+
+def label_chunks(grid: np.ndarray, diagonal: bool=False) -> np.ndarray:
+    """
+    Label the 4-connected chunks of living nodes.
+    Args:
+        diagonal:
+            If True, label 8-connected chunks instead.
+    Return:
+        Array of the same shape. Each living node has the flat index(x-major) of the first node of its chunk, and dead nodes have -1.
+    """
+    alive = np.ascontiguousarray(grid, dtype=bool)
+    empty = alive.size
+    labels = np.where(alive, np.arange(alive.size).reshape(alive.shape), empty)
+    while True:
+        # Take the smallest label among the 4 neighbors, then jump to the label of that node. (pointer jumping)
+        new_labels = labels.copy()
+        np.minimum(new_labels[1:, :], labels[:-1, :], out=new_labels[1:, :])
+        np.minimum(new_labels[:-1, :], labels[1:, :], out=new_labels[:-1, :])
+        np.minimum(new_labels[:, 1:], labels[:, :-1], out=new_labels[:, 1:])
+        np.minimum(new_labels[:, :-1], labels[:, 1:], out=new_labels[:, :-1])
+        if diagonal:
+            np.minimum(new_labels[1:, 1:], labels[:-1, :-1], out=new_labels[1:, 1:])
+            np.minimum(new_labels[:-1, :-1], labels[1:, 1:], out=new_labels[:-1, :-1])
+            np.minimum(new_labels[1:, :-1], labels[:-1, 1:], out=new_labels[1:, :-1])
+            np.minimum(new_labels[:-1, 1:], labels[1:, :-1], out=new_labels[:-1, 1:])
+        new_labels[~alive] = empty
+        flat = new_labels.ravel()
+        flat[alive.ravel()] = flat[flat[alive.ravel()]]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    labels[~alive] = -1
+    return labels
+
+
+def grow_within(chunk: np.ndarray, start: Tuple[int, int], mass: int, randomize: bool=True) -> np.ndarray:
+    """
+    Return the region of given mass inside the chunk, that is grown from the start node breadth-first.
+    Args:
+        randomize:
+            if True, nodes of the last layer are randomly chosen. If not, they are chosen in x-major order.
+    """
+    region = np.zeros(chunk.shape, dtype=bool)
+    region[start] = True
+    size = 1
+    while size < mass:
+        layer = grow4(region) & chunk & ~region
+        layer_size = int(np.count_nonzero(layer))
+        if layer_size == 0:
+            break
+        if size + layer_size <= mass:
+            region |= layer
+            size += layer_size
+            continue
+        cells = np.flatnonzero(layer)
+        if randomize:
+            cells = np.array(random.sample(list(cells), mass - size))
+        else:
+            cells = cells[:mass - size]
+        region.ravel()[cells] = True
+        size = mass
+    return region
 
 
 def generate_blob_of_mass(
@@ -64,6 +64,7 @@ class BaseAI(BaseComponent):
 
         # Vision
         self.vision = None # initialized in engine.update_enemy_fov() which is called from engine.handle_world()
+        self.vision_key = None # (depth, x, y, eyesight, transparency version of the gamemap) of the last vision update. Used to skip redundant updates.
 
         # bool, types of attack this ai can do
         self.do_melee_atk = do_melee_atk
@@ -138,6 +139,7 @@ class BaseAI(BaseComponent):
     def init_vision(self) -> None:
         """Initialize this ai's vision"""
         self.vision = np.full((self.parent.gamemap.width, self.parent.gamemap.height), fill_value=False, order="F")
+        self.vision_key = None
         self.update_vision()
 
     def activate(self) -> None:
@@ -246,74 +248,112 @@ class BaseAI(BaseComponent):
             else:
                 return WaitAction(self.parent).perform()
 
-    def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
+    def get_path_cost(self, dest_x: int, dest_y: int) -> np.ndarray:
         """
-        Compute and return a path to the target position.
-        If there is no valid path then returns an empty list.
+        Return the pathfinding cost array this ai uses when moving towards the given destination.
         """
         intelligence = self.parent.status.changed_status["intelligence"]
-        cost = np.array(self.parent.gamemap.tiles["walkable"], dtype=np.int8) # set to 1 (walkable)
-
-        for e in self.parent.gamemap.entities:
-            # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
-            if e.blocks_movement and cost[e.x, e.y]:
-                cost[e.x, e.y] += intelligence * 3
-            if intelligence > 3 and isinstance(e, SemiActor):
-                if (e.x != dest_x or e.y != dest_y) and not e.safe_to_move:
-                    cost[e.x, e.y] += intelligence * 5 # AIs with higher intelligence is more likely to dodge dangerous semiactors.
-
-        if not self.parent.is_on_air:
-            dangerous_coordinates = zip(*np.where(self.gamemap.tiles["safe_to_walk"][:,:] == False))
-            for cor in dangerous_coordinates:
-                if self.gamemap.tiles[cor]["tile_id"] == self.gamemap.tiles[self.parent.x, self.parent.y]["tile_id"]:
-                    # If the actor is already on dangerous tile, same types of tiles will be considered safe.
-                    # (Thus, the ai will be able to find its way out from the middle of giant pool of water.)
-                    continue
-                if self.gamemap.check_tile_safe(self.parent, cor[0], cor[1], ignore_semiactor=True): # Semiactor is handled below.
-                    break
-                cost[cor] += intelligence * 5 # AI with higher intelligence is more likely to dodge dangerous tiles.
+        gamemap = self.parent.gamemap
+
+        # Tile-based costs are shared by every ai with the same traits during this turn.
+        # Dangerous tiles, and water tiles for submerged underwater ais are handled there. (see gamemap.get_path_cost_grid())
+        cost = gamemap.get_path_cost_grid(self.parent)
+
+        # Entity-based costs
+        # Check that an enitiy blocks movement and the cost isn't zero (blocking.)
+        extra_cost = gamemap.movement_blockers * (intelligence * 3)
+        if intelligence > 3:
+            # AIs with higher intelligence is more likely to dodge dangerous semiactors.
+            extra_cost += gamemap.dangerous_semiactors * (intelligence * 5)
+            extra_cost[dest_x, dest_y] -= gamemap.dangerous_semiactors[dest_x, dest_y] * (intelligence * 5)
+        cost = cost + np.where(gamemap.tiles["walkable"], extra_cost, 0)
 
         # Disable ai from moving
         if self.parent.actor_state.live_underwater:
             if self.parent.actor_state.is_submerged: # If the actor is already out of the water this process is ignored.
-                nonwater_coordinates = [] # Cannot use numpy.where()
-                for x in range(self.gamemap.tiles.shape[0]):
-                    for y in range(self.gamemap.tiles.shape[1]):
-                        if self.gamemap.tiles[x,y]["tile_id"][-5:] != "water":
-                            nonwater_coordinates.append((x,y))
-                for cor in nonwater_coordinates:
-                    if cor[0] == dest_x and cor[1] == dest_y:
-                        pass
-                    else:
-                        cost[cor] += 50
-                        # NOTE: reason for not using 0 or negative value (blocking the tile) is
-                        # to make ai move through the water as much as possible
-                        # while also being able to track targets that are on the surface
-                        # e.g.
-                        # A. cost[cor] = 0
-                        # . . . @
-                        # f ~ ~ ~ (ai will not move any further)
-                        #
-                        # 1 2 3 4 (ai's path)
-                        # f ~ ~ ~
-                        #
-                        # B. cost[cor] += 50 (or any value)
-                        # . . . @
-                        # ~ ~ ~ f
-                        #
-                        # . . . 4 (ai's path)
-                        # f 1 2 3
-                        #
-                        # ai B is minimizing its distance with its target
-                        # They both are unable to move onto the surface (read the code below)
-
-        # Create a graph from the cost array and pass that graph to a new pathfinder
-        graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
-        pathfinder = tcod.path.Pathfinder(graph)
-        pathfinder.add_root((self.parent.x, self.parent.y))  # Start position
-
-        # Compute the path to the destination and remove the starting point
-        path = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
+                if gamemap.tiles["walkable"][dest_x, dest_y] and gamemap.check_if_tile_is_surface(dest_x, dest_y):
+                    cost[dest_x, dest_y] -= 50 # The destination is never penalized.
+                # NOTE: reason for not using 0 or negative value (blocking the tile) is
+                # to make ai move through the water as much as possible
+                # while also being able to track targets that are on the surface
+                # e.g.
+                # A. cost[cor] = 0
+                # . . . @
+                # f ~ ~ ~ (ai will not move any further)
+                #
+                # 1 2 3 4 (ai's path)
+                # f ~ ~ ~
+                #
+                # B. cost[cor] += 50 (or any value)
+                # . . . @
+                # ~ ~ ~ f
+                #
+                # . . . 4 (ai's path)
+                # f 1 2 3
+                #
+                # ai B is minimizing its distance with its target
+                # They both are unable to move onto the surface (read the code below)
+
+        return cost
+
+    def get_player_flow_field(self) -> tcod.path.Pathfinder:
+        """
+        Return a pathfinder rooted at the player, which is resolved for the entire gamemap. (Dijkstra map)
+        Every ai with the same pathfinding traits shares a single flow field during a turn,
+        so chasing the player only costs one graph search per turn instead of one per ai.
+        NOTE: The flow field only has tile-based costs. (see gamemap.get_path_cost_grid())
+        Entities keep moving while the field is shared, so entity-based costs are checked for each path instead. (see get_path_to())
+        """
+        gamemap = self.parent.gamemap
+        player = self.engine.player
+        key = (player.x, player.y, gamemap.get_path_cost_key(self.parent))
+        pathfinder = gamemap.get_player_flow_field(key)
+        if pathfinder is None:
+            graph = tcod.path.SimpleGraph(cost=gamemap.get_path_cost_grid(self.parent), cardinal=2, diagonal=3)
+            pathfinder = tcod.path.Pathfinder(graph)
+            pathfinder.add_root((player.x, player.y))
+            pathfinder.resolve()
+            gamemap.set_player_flow_field(key, pathfinder)
+        return pathfinder
+
+    def check_path_has_entity_cost(self, path: List[Tuple[int, int]]) -> bool:
+        """
+        Return True if any tile of the given path, except the destination, has entity-based costs of get_path_cost().
+        If not, the path is also one of the cheapest paths when entity-based costs are taken into account.
+        """
+        if len(path) <= 1:
+            return False
+        gamemap = self.parent.gamemap
+        xs, ys = np.array(path[:-1]).T
+        if gamemap.movement_blockers[xs, ys].any():
+            return True
+        if self.parent.status.changed_status["intelligence"] > 3 and gamemap.dangerous_semiactors[xs, ys].any():
+            return True
+        return False
+
+    def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
+        """
+        Compute and return a path to the target position.
+        If there is no valid path then returns an empty list.
+        NOTE: If the destination is the player's location, the shared flow field is descended instead of running a new search,
+        unless the path goes through a tile that has entity-based costs.
+        """
+        path = None
+        player = self.engine.player
+        if player.gamemap is self.parent.gamemap and player.x == dest_x and player.y == dest_y:
+            # Descend the flow field and remove the starting point
+            path = self.get_player_flow_field().path_from((self.parent.x, self.parent.y))[1:].tolist()
+            if self.check_path_has_entity_cost(path):
+                path = None # Blocked by other entities (or dangerous semiactors). Search again with the current entities.
+
+        if path is None:
+            # Create a graph from the cost array and pass that graph to a new pathfinder
+            graph = tcod.path.SimpleGraph(cost=self.get_path_cost(dest_x, dest_y), cardinal=2, diagonal=3)
+            pathfinder = tcod.path.Pathfinder(graph)
+            pathfinder.add_root((self.parent.x, self.parent.y))  # Start position
+
+            # Compute the path to the destination and remove the starting point
+            path = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
 
         # if ai is live_underwater and is submerged,
         # Prevent ai from moving onto the surface
@@ -647,21 +687,25 @@ class BaseAI(BaseComponent):
     def update_vision(self) -> None:
         """
         Updates this ai's vision.
+        Nothing is recomputed if neither the ai nor the gamemap's transparency has changed since the last update.
         """
-        temp_vision = copy.copy(self.parent.gamemap.tiles["transparent"])
+        gamemap = self.parent.gamemap
+        transparency = gamemap.get_transparency_mask()
 
-        for entity in self.parent.gamemap.entities:
-            if entity.blocks_sight:
-                temp_vision[entity.x, entity.y] = False
+        if self.vision is None or self.vision.shape != transparency.shape:
+            return self.init_vision() # Re-initialize vision if gamemap size has been changed.
 
         # Visible radius is proportionate to eyesight.
-        if self.vision.shape != temp_vision.shape:
-            self.init_vision() # Re-initialize vision if gamemap size has been changed.
+        eyesight = self.parent.status.changed_status["eyesight"]
+        vision_key = (gamemap.depth, self.parent.x, self.parent.y, eyesight, gamemap.transparency_version)
+        if vision_key == self.vision_key:
+            return None
         self.vision[:] = tcod.map.compute_fov(
-            temp_vision,
+            transparency,
             (self.parent.x, self.parent.y),
-            radius=self.parent.status.changed_status["eyesight"],
+            radius=eyesight,
         )
+        self.vision_key = vision_key
 
     def set_attraction(self) -> None:
         """
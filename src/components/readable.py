@@ -775,9 +775,9 @@ class ScrollOfDiggingReadable(RayReadable):
     def effects_on_consumer_tile(self, action: actions.ReadItem, x: int, y: int):
         consumer = action.entity
         if consumer.gamemap.tiles[x, y]["walkable"] and consumer.gamemap.tiles[x,y]["diggable"] and consumer.gamemap.tilemap[x,y] != TilemapOrder.MAP_BORDER.value:
-            self.engine.message_log.add_message(i(f"굴착의 광선이 {g(consumer.gamemap.tiles[x, y]['tile_name'], '을')} 뚫고 지나갔다.",
-                                                  f"A ray of digging goes through the {consumer.gamemap.tiles[x,y]['tile_name']}."),fg=color.player_neutral_important)
-            consumer.gamemap.tiles[x, y] = consumer.gamemap.tileset["t_hole"]()
+            self.engine.message_log.add_message(i(f"굴착의 광선이 {g(consumer.gamemap.get_tile_name(x, y), '을')} 뚫고 지나갔다.",
+                                                  f"A ray of digging goes through the {consumer.gamemap.get_tile_name(x, y)}."),fg=color.player_neutral_important)
+            consumer.gamemap.set_tile(x, y, consumer.gamemap.tileset["t_hole"]())
         return
 
     def effects_on_collided_wall(self, action: actions.ReadItem, x: int, y: int):
@@ -785,9 +785,9 @@ class ScrollOfDiggingReadable(RayReadable):
         dx = action.target_xy[0]
         dy = action.target_xy[1]
         if not consumer.gamemap.tiles[x,y]["walkable"] and consumer.gamemap.tiles[x,y]["diggable"] and consumer.gamemap.tilemap[x,y] != TilemapOrder.MAP_BORDER.value:
-            self.engine.message_log.add_message(i(f"굴착의 광선이 {g(consumer.gamemap.tiles[x, y]['tile_name'], '을')} 뚫고 지나갔다.",
-                                                  f"A ray of digging goes through the {consumer.gamemap.tiles[x, y]['tile_name']}."),fg=color.player_neutral_important)
-            consumer.gamemap.tiles[x, y] = consumer.gamemap.tileset["t_floor"]()
+            self.engine.message_log.add_message(i(f"굴착의 광선이 {g(consumer.gamemap.get_tile_name(x, y), '을')} 뚫고 지나갔다.",
+                                                  f"A ray of digging goes through the {consumer.gamemap.get_tile_name(x, y)}."),fg=color.player_neutral_important)
+            consumer.gamemap.set_tile(x, y, consumer.gamemap.tileset["t_floor"]())
 
 
 class ScrollOfScorchingRayReadable(RayReadable):
@@ -836,7 +836,7 @@ class ScrollOfFreezingRayReadable(RayReadable):
 
     def effects_on_path(self, action: actions.ReadItem, x: int, y: int):
         # Freeze water
-        self.engine.game_map.tiles[x, y] = TileUtil.freeze(self.engine.game_map.tiles[x, y])
+        self.engine.game_map.set_tile(x, y, TileUtil.freeze(self.engine.game_map.tiles[x, y]))
 
 
 class ScrollOfLightningReadable(AutoTargetingHarmfulReadable):
@@ -83,7 +83,7 @@ class FireRule(BaseRule):
 
         # Delete old entities
         if self.parent.lifetime == 0:
-            self.engine.game_map.tiles[self.parent.x, self.parent.y] = TileUtil.burn(self.engine.game_map.tiles[self.parent.x, self.parent.y])
+            self.engine.game_map.set_tile(self.parent.x, self.parent.y, TileUtil.burn(self.engine.game_map.tiles[self.parent.x, self.parent.y]))
             self.parent.remove_self()
             return None
 
@@ -92,15 +92,14 @@ class FireRule(BaseRule):
 
         # Collision with entities
         # NOTE: Actual calculations are handled in entity.collided_with_fire()
-        for entity in self.engine.game_map.entities:
-            if entity.x == self.parent.x and entity.y == self.parent.y:
-                if isinstance(entity, Actor):
-                    entity.collided_with_fire(self.parent) # pass fire semiactor to calculate dmg
-                else:
-                    entity.collided_with_fire()
+        for entity in self.engine.game_map.get_all_entities_at_location(self.parent.x, self.parent.y):
+            if isinstance(entity, Actor):
+                entity.collided_with_fire(self.parent) # pass fire semiactor to calculate dmg
+            else:
+                entity.collided_with_fire()
 
         # Try unfreezing
-        self.engine.game_map.tiles[self.parent.x, self.parent.y] = TileUtil.unfreeze(self.engine.game_map.tiles[self.parent.x, self.parent.y])
+        self.engine.game_map.set_tile(self.parent.x, self.parent.y, TileUtil.unfreeze(self.engine.game_map.tiles[self.parent.x, self.parent.y]))
 
         # Remove entity if floor is not flammable
         if self.engine.game_map.tiles[self.parent.x, self.parent.y]["flammable"] == False:
@@ -4,7 +4,8 @@ import copy
 
 from components.experience import Experience
 
-from typing import List, TYPE_CHECKING, Optional, Tuple
+from types import MappingProxyType
+from typing import List, TYPE_CHECKING, Mapping, Optional, Tuple
 
 import random
 import color
@@ -19,6 +20,23 @@ if TYPE_CHECKING:
 
 def clamp(n, smallest, largest): return max(smallest, min(n, largest))
 
+# Status values that can be changed by bonuses. (e.g. "strength" is changed by Bonus.bonus_strength)
+BONUS_KEYS = (
+    "hp", "max_hp", "mp", "max_mp", "strength", "dexterity", "agility", "intelligence", "constitution", "charm",
+    "base_melee", "additional_melee", "protection", "eyesight", "hearing",
+    "fire_resistance", "poison_resistance", "cold_resistance", "acid_resistance",
+    "psychic_resistance", "sleep_resistance", "shock_resistance", "magic_resistance",
+)
+
+# Attributes of Status that changed_status is calculated from.
+# Assigning any of them (including through property setters) invalidates the cached changed_status.
+ORIGIN_ATTRIBUTES = frozenset((
+    "max_hp", "_hp", "max_mp", "_mp", "_strength", "_dexterity", "_agility", "_intelligence", "_constitution", "_charm",
+    "base_melee", "additional_melee", "protection", "eyesight", "hearing",
+    "fire_resistance", "poison_resistance", "cold_resistance", "acid_resistance",
+    "psychic_resistance", "sleep_resistance", "shock_resistance", "magic_resistance",
+))
+
 class Bonus():
     """Indicates a single buff/debuff effect."""
     def __init__(self,
@@ -153,6 +171,11 @@ class Status(BaseComponent):
         super().__init__(None)
         self.difficulty = None
 
+        # Sum of every bonus in self.bonuses for each key of BONUS_KEYS. Updated in update_bonus_total().
+        self._bonus_total = dict.fromkeys(BONUS_KEYS, 0)
+        # Cached changed_status. None if it should be calculated again.
+        self._changed_status = None
+
         self.experience: Experience = None # If the actor has an experience component, it is initalized in Actor.__init__()
 
         self.max_hp = hp
@@ -214,166 +237,119 @@ class Status(BaseComponent):
             else:
                 print("ERROR::melee effects != melee effects var")
 
+    def __setattr__(self, name, value) -> None:
+        if name in ORIGIN_ATTRIBUTES:
+            self.__dict__["_changed_status"] = None
+        super().__setattr__(name, value)
+
+    def __setstate__(self, state) -> None:
+        """Bonus total is calculated again after loading, so that statuses saved from previous versions can be loaded as well."""
+        self.__dict__.update(state)
+        self.update_bonus_total()
+
+    def update_bonus_total(self) -> None:
+        """
+        Sum up every bonus in self.bonuses for each status value.
+        NOTE: Called whenever self.bonuses changes. Bonuses should not be modified after they are added. (Add a new bonus of same id instead)
+        """
+        total = dict.fromkeys(BONUS_KEYS, 0)
+        for bonus in self.bonuses.values():
+            for key in BONUS_KEYS:
+                total[key] += getattr(bonus, "bonus_" + key)
+        self._bonus_total = total
+        self._changed_status = None
+
     @property
     def bonus_hp(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_hp
-        return tmp
+        return self._bonus_total["hp"]
 
     @property
     def bonus_max_hp(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_max_hp
-        return tmp
+        return self._bonus_total["max_hp"]
 
     @property
     def bonus_mp(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_mp
-        return tmp
+        return self._bonus_total["mp"]
 
     @property
     def bonus_max_mp(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_max_mp
-        return tmp
+        return self._bonus_total["max_mp"]
 
     @property
     def bonus_strength(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_strength
-        return tmp
+        return self._bonus_total["strength"]
 
     @property
     def bonus_dexterity(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_dexterity
-        return tmp
+        return self._bonus_total["dexterity"]
 
     @property
     def bonus_agility(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_agility
-        return tmp
+        return self._bonus_total["agility"]
 
     @property
     def bonus_intelligence(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_intelligence
-        return tmp
+        return self._bonus_total["intelligence"]
 
     @property
     def bonus_constitution(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_constitution
-        return tmp
+        return self._bonus_total["constitution"]
 
     @property
     def bonus_charm(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_charm
-        return tmp
+        return self._bonus_total["charm"]
 
     @property
     def bonus_base_melee(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_base_melee
-        return tmp
+        return self._bonus_total["base_melee"]
 
     @property
     def bonus_additional_melee(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_additional_melee
-        return tmp
+        return self._bonus_total["additional_melee"]
 
     @property
     def bonus_protection(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_protection
-        return tmp
+        return self._bonus_total["protection"]
 
     @property
     def bonus_eyesight(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_eyesight
-        return tmp
+        return self._bonus_total["eyesight"]
 
     @property
     def bonus_hearing(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_hearing
-        return tmp
+        return self._bonus_total["hearing"]
 
     @property
     def bonus_fire_resistance(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_fire_resistance
-        return tmp
+        return self._bonus_total["fire_resistance"]
 
     @property
     def bonus_poison_resistance(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_poison_resistance
-        return tmp
+        return self._bonus_total["poison_resistance"]
 
     @property
     def bonus_cold_resistance(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_cold_resistance
-        return tmp
+        return self._bonus_total["cold_resistance"]
 
     @property
     def bonus_acid_resistance(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_acid_resistance
-        return tmp
+        return self._bonus_total["acid_resistance"]
 
     @property
     def bonus_psychic_resistance(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_psychic_resistance
-        return tmp
+        return self._bonus_total["psychic_resistance"]
 
     @property
     def bonus_sleep_resistance(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_sleep_resistance
-        return tmp
+        return self._bonus_total["sleep_resistance"]
 
     @property
     def bonus_shock_resistance(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_shock_resistance
-        return tmp
+        return self._bonus_total["shock_resistance"]
 
     @property
     def bonus_magic_resistance(self):
-        tmp = 0
-        for bonus in self.bonuses.values():
-            tmp += bonus.bonus_magic_resistance
-        return tmp
+        return self._bonus_total["magic_resistance"]
 
     @property
     def origin_melee_effect_set(self):
@@ -427,8 +403,16 @@ class Status(BaseComponent):
         return origin_status
 
     @property
-    def changed_status(self):
-        """Status used for actual in-game combat calculations."""
+    def changed_status(self) -> Mapping:
+        """
+        Status used for actual in-game combat calculations.
+        NOTE: Calculated only when the bonuses or the origin status have changed since the last access. Returned mapping is read-only.
+        """
+        if self._changed_status is None:
+            self._changed_status = self.calculate_changed_status()
+        return MappingProxyType(self._changed_status)
+
+    def calculate_changed_status(self) -> dict:
         changed_status = {
             "max_hp":max(0, self.max_hp + self.bonus_max_hp),
             "hp":max(0, self._hp + self.bonus_hp),
@@ -470,6 +454,7 @@ class Status(BaseComponent):
             if not ignore_warning:
                 print(f"WARNING::{bonus.bonus_id} Bonus already exists. Overwritten.")
         self.bonuses[bonus.bonus_id] = bonus
+        self.update_bonus_total()
 
     def remove_bonus(self, bonus_id: str, ignore_warning: bool=False) -> None:
         try:
@@ -480,12 +465,16 @@ class Status(BaseComponent):
             return None
         except:
             raise Exception("FATAL ERROR::status.remove_bonus()")
+        self.update_bonus_total()
 
     def remove_all_bonuses(self):
         self.bonuses.clear()
+        self.update_bonus_total()
 
     def death(self, cause: str="low_hp") -> None:
         self.parent.actor_state.is_dead = True
+        if self.parent.gamemap:
+            self.parent.gamemap.mark_actor_dead(self.parent)
         self.parent.actor_state.remove_all_actor_states(include_spatial_states=True)
         self.remove_all_bonuses()
 
@@ -459,7 +459,7 @@ class PotionOfFrostThrowable(PotionQuaffAndThrowSameEffectThrowable):
         super().effects_when_shattered()
         for dx in (1, 0, -1):
             for dy in (1, 0, -1):
-                self.engine.game_map.tiles[self.shattered_x+dx, self.shattered_y+dy] = TileUtil.freeze(self.engine.game_map.tiles[self.shattered_x+dx, self.shattered_y+dy])
+                self.engine.game_map.set_tile(self.shattered_x+dx, self.shattered_y+dy, TileUtil.freeze(self.engine.game_map.tiles[self.shattered_x+dx, self.shattered_y+dy]))
 
 
 class PotionOfLiquifiedAntsThrowable(CouldShatterWhenContactGroundThrowable):
@@ -1,110 +1,283 @@
 import json
+import os
+import threading
+import atexit
+from typing import Any, Callable, Dict, List, Optional
 from exceptions import ConfigException
 
-def get_game_config():
-    with open("./config/config.json", "r") as cfg:
-        game_config = json.load(cfg)
-    return game_config
+CONFIG_PATH = "./config/config.json"
+DEFAULT_CONFIG_PATH = "./config/config_default.json"
 
 
-def alter_resolution(tile_width: int, tile_height: int) -> None:
+class GameConfig:
     """
-    Alter the game's pixels per tiles number by directly modifying config.json file.
+    In-memory copy of config.json.
+    The file is read once, and every read after that is served from memory.
+    Changes are applied in memory immediately, then written back to the file after write_delay seconds,
+    so that a burst of changes (e.g. holding the volume key) ends up as a single write.
+
+    Listeners added with add_listener() are called once per update() with a dictionary of every value that has changed.
     """
-    if tile_width > 20 or tile_height > 20 or tile_width < 10 or tile_height < 10:
-        raise ConfigException()
+    # Type of each field. Values of a wrong type are rejected when they are set, and replaced with defaults when they are loaded.
+    FIELD_TYPES = {
+        "debugmode": bool,
+        "screen_width": int,
+        "screen_height": int,
+        "tile_width": int,
+        "tile_height": int,
+        "fullscreen": bool,
+        "camera_width": int,
+        "camera_height": int,
+        "camera_xpos": int,
+        "camera_ypos": int,
+        "render_animation": bool,
+        "rside_width": int,
+        "msg_log_height": int,
+        "status_height": int,
+        "state_height": int,
+        "sight_info_height": int,
+        "ignore_enemy_spotted_during_mouse_movement": bool,
+        "tileset_path": str,
+        "world_depth": int,
+        "lang": str,
+        "master_volume": int,
+        "report_issue_automatically": bool,
+        "profile_turns": bool,
+    }
 
-    with open("./config/config.json", "r") as cfg:
-        game_config = json.load(cfg)
-    
-    game_config["tile_width"] = tile_width
-    game_config["tile_height"] = tile_height
+    def __init__(self, path: str = CONFIG_PATH, default_path: str = DEFAULT_CONFIG_PATH, write_delay: float = 0.5):
+        self.path = path
+        self.default_path = default_path
+        self.write_delay = write_delay
+        self._values: Dict[str, Any] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.RLock()
+        self._write_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self.load()
 
-    with open("./config/config.json", "w") as cfg:
-        json.dump(game_config, cfg, indent=4)
+    @staticmethod
+    def check_type(key: str, value: Any) -> bool:
+        field_type = GameConfig.FIELD_TYPES.get(key)
+        if field_type is None:
+            return True # Unknown fields are kept as they are
+        if field_type is int and isinstance(value, bool): # bool is a subclass of int
+            return False
+        return isinstance(value, field_type)
 
-    from game import Game
-    if Game.engine:
-        Game.engine.update_config()
+    def load(self) -> None:
+        """
+        (Re)load values from the file. Missing or wrongly typed fields are filled with values of the default config.
+        NOTE: Pending changes that are not written yet are discarded.
+        """
+        with open(self.path, "r") as cfg:
+            values = json.load(cfg)
 
+        defaults = None
+        for key in GameConfig.FIELD_TYPES.keys():
+            if key in values and GameConfig.check_type(key, values[key]):
+                continue
+            if defaults is None:
+                with open(self.default_path, "r") as cfg:
+                    defaults = json.load(cfg)
+            print(f"WARNING::GameConfig.load() - {key} of {self.path} is missing or invalid. Using the default value {defaults.get(key)}.")
+            values[key] = defaults.get(key)
 
-def toggle_fullscreen() -> None:
-    """
-    Toggle on/off fullscreen by directly modifying config.json file.
-    """
-    with open("./config/config.json", "r") as cfg:
-        game_config = json.load(cfg)
-        
-    game_config["fullscreen"] = not game_config["fullscreen"]
+        with self._lock:
+            self.cancel_write()
+            self._values = values
+            self._dirty = False
 
-    with open("./config/config.json", "w") as cfg:
-        json.dump(game_config, cfg, indent=4)
+    def __getitem__(self, key: str) -> Any:
+        return self._values[key]
 
-    from game import Game
-    if Game.engine:
-        Game.engine.update_config()
+    def __contains__(self, key: str) -> bool:
+        return key in self._values
 
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._values.get(key, default)
 
-def change_master_volume(percent: int) -> None:
-    """Increase / Decrease master volume"""
-    with open("./config/config.json", "r") as cfg:
-        game_config = json.load(cfg)
+    def as_dict(self) -> Dict[str, Any]:
+        """Return a copy of every value. Changing the copy does not affect the config."""
+        with self._lock:
+            return dict(self._values)
 
-    game_config["master_volume"] = max(min(game_config["master_volume"] + percent, 100),0)
+    def set(self, key: str, value: Any) -> None:
+        self.update({key: value})
 
-    with open("./config/config.json", "w") as cfg:
-        json.dump(game_config, cfg, indent=4)
+    def update(self, changes: Dict[str, Any]) -> None:
+        """
+        Apply changes in memory, notify listeners, and schedule writing them to the file.
+        Raises ConfigException if any of the values has a wrong type. (Nothing is changed in that case)
+        """
+        for key, value in changes.items():
+            if not GameConfig.check_type(key, value):
+                raise ConfigException(f"{key} should be {GameConfig.FIELD_TYPES[key].__name__}, not {type(value).__name__}.")
 
-    from game import Game
-    if Game.engine:
-        Game.engine.update_config()
+        changed = {}
+        with self._lock:
+            for key, value in changes.items():
+                if self._values.get(key) != value:
+                    self._values[key] = value
+                    changed[key] = value
+            if changed:
+                self._dirty = True
+                self.schedule_write()
 
+        if changed:
+            self.notify(changed)
 
-def toggle_animation(using: bool) -> None:
-    """Toggle ingame animation effects"""
-    with open("./config/config.json", "r") as cfg:
-        game_config = json.load(cfg)
+    def reset_to_default(self) -> None:
+        """Replace every value with the default config, and write it immediately."""
+        with open(self.default_path, "r") as cfg:
+            defaults = json.load(cfg)
+        self.update(defaults)
+        self.flush()
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def notify(self, changes: Dict[str, Any]) -> None:
+        for listener in tuple(self._listeners):
+            try:
+                listener(changes)
+            except Exception as e:
+                print(f"ERROR::GameConfig.notify() - Listener {listener} failed on {', '.join(changes.keys())}. - {e}")
+
+    def schedule_write(self) -> None:
+        """Write after write_delay seconds. If called again before that, the write is postponed."""
+        with self._lock:
+            self.cancel_write()
+            if self.write_delay <= 0:
+                self.flush()
+                return
+            self._write_timer = threading.Timer(self.write_delay, self.flush)
+            self._write_timer.daemon = True # Pending changes are written by flush() at exit
+            self._write_timer.start()
 
-    game_config["render_animation"] = using
+    def cancel_write(self) -> None:
+        with self._lock:
+            if self._write_timer is not None:
+                self._write_timer.cancel()
+                self._write_timer = None
 
-    with open("./config/config.json", "w") as cfg:
-        json.dump(game_config, cfg, indent=4)
+    def flush(self) -> None:
+        """
+        Write pending changes to the file now.
+        The file is written to a temporary file first and then replaced, so that it is never left half written.
+        """
+        with self._lock:
+            self.cancel_write()
+            if not self._dirty:
+                return
+            values = dict(self._values)
+            self._dirty = False
 
+            temp_path = self.path + ".tmp"
+            try:
+                with open(temp_path, "w") as cfg:
+                    json.dump(values, cfg, indent=4)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                self._dirty = True
+                print(f"ERROR::GameConfig.flush() - Failed to write {self.path} - {e}")
+
+
+_game_config: Optional[GameConfig] = None
+_game_config_lock = threading.Lock()
+
+
+def get_config() -> GameConfig:
+    """Return the shared GameConfig. config.json is read when this is called for the first time."""
+    global _game_config
+    if _game_config is None:
+        with _game_config_lock:
+            if _game_config is None:
+                config = GameConfig()
+                config.add_listener(update_engine_config)
+                atexit.register(config.flush)
+                _game_config = config
+    return _game_config
+
+
+def update_engine_config(changes: Dict[str, Any]) -> None:
+    """Listener of the shared GameConfig. Keeps Game.engine.config up to date."""
     from game import Game
     if Game.engine:
         Game.engine.update_config()
 
 
-def toggle_mouse_enemy_ignore(using: bool) -> None:
+def get_game_config() -> Dict[str, Any]:
+    """
+    Return a copy of the current config. Does not read config.json. (see GameConfig)
+    """
+    return get_config().as_dict()
+
+
+def alter_resolution(tile_width: int, tile_height: int) -> None:
+    """
+    Alter the game's pixels per tiles number.
+    """
+    if tile_width > 20 or tile_height > 20 or tile_width < 10 or tile_height < 10:
+        raise ConfigException()
+    get_config().update({"tile_width": tile_width, "tile_height": tile_height})
+
+
+def toggle_fullscreen() -> None:
+    """
+    Toggle on/off fullscreen.
+    """
+    config = get_config()
+    config.set("fullscreen", not config["fullscreen"])
+
+
+def change_master_volume(percent: int) -> None:
+    """Increase / Decrease master volume"""
+    config = get_config()
+    config.set("master_volume", max(min(config["master_volume"] + percent, 100),0))
+
+
+def toggle_animation(using: bool) -> None:
     """Toggle ingame animation effects"""
-    with open("./config/config.json", "r") as cfg:
-        game_config = json.load(cfg)
+    get_config().set("render_animation", using)
 
-    game_config["ignore_enemy_spotted_during_mouse_movement"] = using
 
-    with open("./config/config.json", "w") as cfg:
-        json.dump(game_config, cfg, indent=4)
+def toggle_mouse_enemy_ignore(using: bool) -> None:
+    """Toggle ingame animation effects"""
+    get_config().set("ignore_enemy_spotted_during_mouse_movement", using)
 
-    from game import Game
-    if Game.engine:
-        Game.engine.update_config()
 
 def change_language() -> None:
     """Change in-game language"""
-    with open("./config/config.json", "r") as cfg:
-        game_config = json.load(cfg)
+    config = get_config()
 
     # TODO: Find a better way to enumerate through the list of supported languages
     support = ("KR", "EN")
+    lang = config["lang"]
     for i in range(0,len(support)):
-        if game_config["lang"] == support[i]:
-            game_config["lang"] = support[(i+1)%len(support)]
+        if config["lang"] == support[i]:
+            lang = support[(i+1)%len(support)]
             break
 
-    with open("./config/config.json", "w") as cfg:
-        json.dump(game_config, cfg, indent=4)
+    config.set("lang", lang)
 
     from game import Game
-    Game.update_language(game_config["lang"])
-    if Game.engine:
-        Game.engine.update_config()
\ No newline at end of file
+    Game.update_language(lang)
+
+
+def reset_config() -> None:
+    """
+    Reset config.json to config_default.json
+    NOTE: Other settings are applied after restarting the game, but the language is applied immediately like change_language().
+    """
+    config = get_config()
+    prev_lang = config["lang"]
+    config.reset_to_default()
+
+    if config["lang"] != prev_lang:
+        from game import Game
+        Game.update_language(config["lang"])
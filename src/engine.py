@@ -3,7 +3,7 @@ from __future__ import annotations
 import tcod
 
 from camera import Camera
-from typing import TYPE_CHECKING, List, Optional, Tuple, Set, Deque, Dict
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Tuple, Set, Deque, Dict
 from util import draw_thick_frame
 from tcod.path import SimpleGraph, Pathfinder
 from tcod.console import Console
@@ -41,6 +41,7 @@ if TYPE_CHECKING:
     from game_map import GameMap
     from input_handlers import EventHandler
     from world import World
+    from turn_profiler import TurnProfiler
 
 
 class Engine:
@@ -87,6 +88,7 @@ class Engine:
         self.easteregg: int = 0
         self._monster_activation_distance = 10 # distance
         self.sound_manager: SoundManager = None # Initialized in main
+        self.turn_profiler: TurnProfiler = None # Set from main when "profile_turns" is enabled in config.json. (see turn_profiler.py)
         self._config: Dict = None # Set from initialization
         self.console: tcod.Console = None # Set from main
         self.context: tcod.context.Context = None # Set from main
@@ -195,6 +197,7 @@ class Engine:
                 f.write(f"new depth: {depth} new gamemap: {len(self.world.get_map(depth).entities)} new player pos: {xpos, ypos} \n")
                 f.write("_______________________________________________________ \n")
 
+        self.world.collect_prefetched_map(depth) # Swap in the gamemap loaded on the background. (Waits if it is not done yet)
         if not self.world.check_if_map_on_mem(depth):
             # neither player nor other entities cannot move outside of memory capacity.
             # TODO: Might have to fix this part to make feature like multiple depth teleportation
@@ -217,18 +220,7 @@ class Engine:
             self.depth = depth
             self.refresh_gamemap_entities()
             self.camera.clear_visuals()
-
-            for tmp_depth in range(depth-self.world.mem_capacity, depth+self.world.mem_capacity+1): #USING (depth-self.world.mem_capacity, depth+self.world.mem_capacity+1) in order to make negative depth level generations.
-                if not self.world.check_if_map_has_been_generated(tmp_depth)\
-                    and self.world.check_if_should_exist_in_memory(depth):
-                        # MOST OF THE TIME THERE IS GOING TO BE ONLY 1 NEW GAMEMAP THATS BEING GENERATED.
-                        print(f"DEBUG::GENERATING DEPTH {tmp_depth}")
-                        new_map = self.generate_new_dungeon(depth=tmp_depth, console=self.console, context=self.context,display_process=True)
-                        new_map.adjustments_before_new_map() # Adjust things (AI's vision, etc. player's vision is initialized AFTER player has been placed.)
-                        self.world.save_map_to_memory(new_map, tmp_depth)
-                if not self.world.check_if_map_on_mem(tmp_depth):
-                    self.world.save_map_to_memory(self.world.load_map_from_serialized_data(tmp_depth), tmp_depth)
-
+            # Neighbor gamemaps (depth +- self.world.mem_capacity) are generated, or loaded on the background. (see world.optimize())
             self.game_map.init_physics()
         else:
             if not self.world.check_if_map_has_been_generated(depth): # When entity moves to an ungenerated map, it causes FATAL ERROR as seen below.
@@ -249,12 +241,10 @@ class Engine:
             self.update_fov()
 
         """
-        IMPORTANT: ALL CHANGES MADE TO GAMEMAPS THAT ARE OUTSIDE OF CURRENT self.depth +- self.world.mam_capaicty ARE NOT SAVED.
-        TO SAVE ALL AND EVERY SINGLE CHANGES MADE TO THE ENTIRE GAMEMAPS, USE SELF.WORLD.SAVE_WORLD() INSTEAD. (But its a heavy function)
-        ALSO world.save_mem() and world.optimize() should be called at last.
+        Gamemaps that are now outside of self.depth +- self.world.mem_capacity are serialized on the background when they are removed from the memory.
+        Gamemaps inside the range stays on the memory, and are serialized by world.save_world() when the game is saved.
         """
-        self.world.save_mem()  # Save all updated memories as data
-        self.world.optimize()  # Optimize memory (delete and load)
+        self.world.optimize()  # Optimize memory (delete and prefetch)
 
 
     def handle_world(self, turn_pass: bool) -> None:
@@ -271,32 +261,50 @@ class Engine:
         """
         if turn_pass:
             self.player.spend_action_point()
-            self.time_pass()
-            self.handle_enemy_turns()
-            self.handle_semiactor_turns()
-            self.handle_actor_states()
-            self.handle_item_states()
-            self.handle_semiactor_states()
-            self.handle_gamemap_states()
-            self.update_fov()
-            self.game_map.actors_change_depth_gradually()
-            self.game_map.update_enemy_fov()
+            if self.turn_profiler:
+                self.turn_profiler.run_phases(self.world_phases())
+            else:
+                for phase in self.world_phases():
+                    phase()
+
+    def world_phases(self) -> Iterator[Callable[[], None]]:
+        """
+        Yield every phase of handle_world() in the order they should be called.
+        NOTE: This is a generator so that each phase is looked up right before it is called. (e.g. self.game_map can change during enemy turns)
+        """
+        yield self.time_pass
+        yield self.handle_enemy_turns
+        yield self.handle_semiactor_turns
+        yield self.handle_actor_states
+        yield self.handle_item_states
+        yield self.handle_semiactor_states
+        yield self.handle_gamemap_states
+        yield self.update_fov
+        yield self.game_map.actors_change_depth_gradually
+        yield self.game_map.update_enemy_fov
 
     def time_pass(self) -> None:
         while self.player.action_point < 60:
-            for entity in set(self.game_map.actors) - {self.player}:
-                entity.gain_action_point()
-            for entity in set(self.game_map.semiactors):
-                entity.gain_action_point()
+            for entity in self.game_map.actor_bucket:
+                if entity is not self.player:
+                    entity.gain_action_point()
+            for entity in self.game_map.semiactor_bucket:
+                if entity.is_active:
+                    entity.gain_action_point()
             self.player.gain_action_point()
         self.game_turn += 1
         
     def handle_enemy_turns(self) -> None:
-        for entity in set(self.game_map.actors) - {self.player}:
-            if entity.ai and not entity.actor_state.is_dead:
+        # NOTE: Buckets are copied into a tuple since actors can be spawned or removed during other actors' turns.
+        profiler = self.turn_profiler
+        for entity in tuple(self.game_map.actor_bucket):
+            if entity is not self.player and entity.ai and not entity.actor_state.is_dead:
                 while entity.action_point >= 60:
                     try:
-                        entity.ai.perform()
+                        if profiler:
+                            profiler.measure("ai", entity.ai)
+                        else:
+                            entity.ai.perform()
                     except exceptions.Impossible:
                         pass  # Ignore impossible action exceptions from AI.
                     entity.spend_action_point()
@@ -306,12 +314,12 @@ class Engine:
         Handle things about items that should be updated every turn.
         e.g. Rotting foods, burning items
         """
-        for item in set(self.game_map.items):
+        for item in tuple(self.game_map.item_bucket):
             if item.item_state.is_burning:
                 item.item_state.burn()
             if item.edible:
                 item.edible.time_pass()
-        for entity in set(self.game_map.actors):# NOTE: If this cause too much performance issues, change the code so that the game only checks player's inventory.
+        for entity in tuple(self.game_map.actor_bucket):# NOTE: If this cause too much performance issues, change the code so that the game only checks player's inventory.
             for item in entity.inventory.items:
                 if item.item_state.is_burning:
                     item.item_state.burn(owner=entity)# NOTE: The fireproof checking of the inventory happens during the ignition of the fire. (at rule.py)
@@ -323,8 +331,8 @@ class Engine:
         Handle things about items that should be updated every turn.
         e.g. Rotting foods, burning items
         """
-        for semiactor in set(self.game_map.semiactors):
-            if semiactor.semiactor_info.is_burning:
+        for semiactor in tuple(self.game_map.semiactor_bucket):
+            if semiactor.is_active and semiactor.semiactor_info.is_burning:
                 semiactor.semiactor_info.burn()
 
     def handle_actor_states(self) -> None:
@@ -335,7 +343,7 @@ class Engine:
         When something should be handled immediately, this isn't the place to do it.
         e.g. electrical shock
         """
-        for actor in set(self.game_map.actors):
+        for actor in tuple(self.game_map.actor_bucket):
             # Bug prevention
             if actor.is_dead:
                 print("WARNING::THE ACTOR IS DEAD BUT HANDLE_ACTOR_STATES() IS STILL RUNNING.")
@@ -408,19 +416,18 @@ class Engine:
         NOTE: Semiactor's lifetime is handled in rule.perform(). 
         This includes deleting semiactors after there lifetime, and decreasing the lifetime every turn.
         """
-        current_entities = self.game_map.entities
-        current_semiactors = []
-
-        for entity in current_entities:
-            if isinstance(entity, SemiActor) and entity.is_active:
-                current_semiactors.append(entity)
-
-        for entity in set(current_semiactors):
+        profiler = self.turn_profiler
+        for entity in tuple(self.game_map.semiactor_bucket):
+            if not entity.is_active:
+                continue
             if entity.rule:
                 if entity.do_action:
                     while entity.action_point >= 60:
                         try:
-                            entity.rule.perform()
+                            if profiler:
+                                profiler.measure("rule", entity.rule)
+                            else:
+                                entity.rule.perform()
                         except exceptions.Impossible:
                             print(f"DEBUG::HANDLE_SEMIACTOR_TURNS() - IMPOSSIBLE ACTION WAS TRIED FROM THE SEMIACTOR{entity.name}")
                             pass
@@ -446,13 +453,18 @@ class Engine:
 
 
     def generate_new_dungeon(self, console, context, depth=1, display_process=True) -> GameMap:
-        """Generate new dungeon and return as gamemap object"""
-        return generate_dungeon(
-            console,
-            context,
-            depth,
-            display_process
-        )
+        """
+        Generate new dungeon and return as gamemap object
+        Each depth is generated from its own random streams derived from the world seed. (see rng.py)
+        """
+        from rng import depth_random_streams
+        with depth_random_streams(self.world.get_depth_seed(depth)):
+            return generate_dungeon(
+                console,
+                context,
+                depth,
+                display_process
+            )
 
 
     def update_entity_in_sight(self, is_initialization=False) -> None:
@@ -471,12 +483,12 @@ class Engine:
         self.items_in_sight.clear()
 
         # Get new data
-        for entity in self.game_map.entities:
+        for entity in self.game_map.actor_bucket:
+            if self.camera.in_bounds(entity.x, entity.y) and self.game_map.visible[entity.x, entity.y]:
+                self.actors_in_sight.add(entity)
+        for entity in self.game_map.item_bucket:
             if self.camera.in_bounds(entity.x, entity.y) and self.game_map.visible[entity.x, entity.y]:
-                if isinstance(entity, Actor):
-                    self.actors_in_sight.add(entity)
-                elif isinstance(entity, Item):
-                    self.items_in_sight.add(entity)
+                self.items_in_sight.add(entity)
         
         # If the function is called for the first time, copy data and set prev_ variables again since it was set to nothing before.
         if is_initialization:
@@ -524,14 +536,8 @@ class Engine:
         Recompute the visible area based on the players point of view.
         + apply telepathy
         """
-        temp_vision = copy.copy(self.game_map.tiles["transparent"])
-
-        for entity in self.game_map.entities:
-            if entity.blocks_sight:
-                temp_vision[entity.x, entity.y] = False
-
         self.game_map.visible[:] = compute_fov(
-            temp_vision,
+            self.game_map.get_transparency_mask(),
             (self.player.x, self.player.y),
             radius=self.player.status.changed_status["eyesight"],
         )
@@ -549,6 +555,8 @@ class Engine:
         elif actor.ai:
             explored = None
             visible = actor.ai.vision
+            if actor.actor_state.has_telepathy or actor.actor_state.is_detecting_obj[2]:
+                actor.ai.vision_key = None # Vision is modified by additional vision, so it has to be recomputed on the next update.
         else:
             print("ACTOR_STATE - ACTOR_DETECTING : THE ACTOR HAS NO AI / VISION")
             return
@@ -556,13 +564,13 @@ class Engine:
         # Entity detection
         if actor.actor_state.is_detecting_obj[2]:
             if isinstance(explored, np.ndarray):
-                self.detect_entities(self.player, visible=visible, explored=explored)
+                self.detect_entities(actor, visible=visible, explored=explored)
             else:
-                self.detect_entities(self.player, visible=visible)
+                self.detect_entities(actor, visible=visible)
         
         # Telepathy
         if actor.actor_state.has_telepathy:
-            for target in set(self.game_map.actors):
+            for target in tuple(self.game_map.actor_bucket):
                 self.apply_telepathy(actor, target, visible=visible)
 
     
@@ -603,7 +611,7 @@ class Engine:
                 # For example, when the player is in the middle of ocean, the player is most likely to be standing on the deep water tile.(which is considered "dangerous tile")
                 # When player click somewhere else to get out of the ocean, the game will not randomize any path because the player is surrounded by dangerous tiles(deep water).
                 # However by excluding all deep water tiles from "dangerous tile" temporarily, the player can now get out of the ocean by clicking somewhere else.
-                if self.game_map.tiles[cor]["tile_id"] == self.game_map.tiles[self.player.x, self.player.y]["tile_id"]:
+                if self.game_map.get_tile_id(*cor) == self.game_map.get_tile_id(self.player.x, self.player.y):
                     continue
 
                 cost[cor] = 0
@@ -707,7 +715,7 @@ class Engine:
                         self.player_dir = None
                         return False
                 # Check for descending stairs
-                if self.game_map.tiles[self.player.x, self.player.y]["tile_id"] == "descending_stair":
+                if self.game_map.get_tile_id(self.player.x, self.player.y) == "descending_stair":
                     try:
                         DescendAction(entity=self.player).perform()
                         self.player_dir = None
@@ -722,7 +730,7 @@ class Engine:
                         self.player_dir = None
                         return False
                 # Check for ascending stairs
-                elif self.game_map.tiles[self.player.x, self.player.y]["tile_id"] == "ascending_stair":
+                elif self.game_map.get_tile_id(self.player.x, self.player.y) == "ascending_stair":
                     try:
                         AscendAction(entity=self.player).perform()
                         self.player_dir = None
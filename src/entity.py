@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from tcod.tileset import get_default
-import copy
+import io
 import math
+import pickle
 import random
 import color
 import numpy as np
@@ -38,6 +39,34 @@ if TYPE_CHECKING:
 
 T = TypeVar("T", bound="Entity")
 
+
+class EntityPickler(pickle.Pickler):
+    """
+    Pickles an entity for Entity.instantiate().
+    Gamemaps referenced from the entity (e.g. gamemap of the actor that has the entity in its inventory) are saved as persistent ids,
+    so that they are shared with the copy instead of being copied.
+    """
+    def __init__(self, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        from game_map import GameMap
+        self.gamemap_class = GameMap
+        self.gamemaps = {}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, self.gamemap_class):
+            self.gamemaps[id(obj)] = obj
+            return id(obj)
+        return None
+
+
+class EntityUnpickler(pickle.Unpickler):
+    def __init__(self, file, gamemaps: Dict[int, GameMap]):
+        super().__init__(file)
+        self.gamemaps = gamemaps
+
+    def persistent_load(self, pid):
+        return self.gamemaps[pid]
+
 class Entity:
     """
     A generic object to represent players, enemies, items, etc.
@@ -122,6 +151,7 @@ class Entity:
         self.render_order = render_order
         self.entity_order = id(self)
         self.gamemap = gamemap
+        self._prototype_data: Optional[bytes] = None # Pickled state of this entity, if this is a prototype. (see instantiate())
     
     @property
     def engine(self):
@@ -274,7 +304,7 @@ class Entity:
 
     def environmental_hole(self):
         """Handle entity on a hole tile."""
-        if self.gamemap.tiles[self.x, self.y]["tile_id"] == "hole":
+        if self.gamemap.tiles["is_hole"][self.x, self.y]:
             new_gamemap = self.engine.world.get_map(depth=self.gamemap.depth + 1)
             if not new_gamemap:
                 print(f"ERROR::Depth {self.gamemap.depth + 1} is not generated yet. Ignoring environmental_hole(). entity:{self.entity_id}")
@@ -286,17 +316,17 @@ class Entity:
 
     def environmental_grass(self):
         """Handle entity on a grass tile"""
-        if self.gamemap.tiles[self.x, self.y]["tile_id"] == "dense_grass":
-            self.gamemap.tiles[self.x, self.y] = self.gamemap.tileset["t_sparse_grass"]()
+        if self.gamemap.get_tile_id(self.x, self.y) == "dense_grass":
+            self.gamemap.set_tile(self.x, self.y, self.gamemap.tileset["t_sparse_grass"]())
 
     def environmental_water(self):
         """Handle entity on water.
         NOTE: is different from Actor.environmental_water"""
-        if self.gamemap.tiles[self.x, self.y]["tile_id"] == "shallow_water":
-            self.gamemap.tiles[self.x, self.y] = self.gamemap.tileset["t_shallow_water"]()
+        if self.gamemap.get_tile_id(self.x, self.y) == "shallow_water":
+            self.gamemap.set_tile(self.x, self.y, self.gamemap.tileset["t_shallow_water"]())
             change_water_color = True
-        elif self.gamemap.tiles[self.x, self.y]["tile_id"] == "deep_water":
-            self.gamemap.tiles[self.x, self.y] = self.gamemap.tileset["t_deep_water"]()
+        elif self.gamemap.get_tile_id(self.x, self.y) == "deep_water":
+            self.gamemap.set_tile(self.x, self.y, self.gamemap.tileset["t_deep_water"]())
             change_water_color = True
         else:
             change_water_color = False
@@ -305,12 +335,12 @@ class Entity:
         if change_water_color:
             for x_add in range(3):
                 for y_add in range(3):
-                    if self.gamemap.tiles[self.x - 1 + x_add, self.y - 1 + y_add]["tile_id"] == "shallow_water":
-                        self.gamemap.tiles[self.x - 1 + x_add, self.y - 1 + y_add] = self.gamemap.tileset[
-                            "t_shallow_water"]()
-                    elif self.gamemap.tiles[self.x - 1 + x_add, self.y - 1 + y_add]["tile_id"] == "deep_water":
-                        self.gamemap.tiles[self.x - 1 + x_add, self.y - 1 + y_add] = self.gamemap.tileset[
-                            "t_deep_water"]()
+                    if self.gamemap.get_tile_id(self.x - 1 + x_add, self.y - 1 + y_add) == "shallow_water":
+                        self.gamemap.set_tile(self.x - 1 + x_add, self.y - 1 + y_add, self.gamemap.tileset[
+                            "t_shallow_water"]())
+                    elif self.gamemap.get_tile_id(self.x - 1 + x_add, self.y - 1 + y_add) == "deep_water":
+                        self.gamemap.set_tile(self.x - 1 + x_add, self.y - 1 + y_add, self.gamemap.tileset[
+                            "t_deep_water"]())
 
     def do_environmental_effects(self) -> None:
         """
@@ -364,7 +394,7 @@ class Entity:
             # If so, it can be safely ignored.
             # example of these errors: a flame that is generated on non-flammable tile may cause an error
             try:
-                self.gamemap.entities.remove(self)
+                self.gamemap.unregister_entity(self)
             except ValueError:
                 if isinstance(self, Item):
                     if self.parent:
@@ -377,8 +407,33 @@ class Entity:
         Most of the time it is overwritten."""
         pass
 
+    def __getstate__(self) -> dict:
+        """Pickled state of a prototype is not saved, and every copy is marked so that it is never used as a prototype."""
+        state = self.__dict__.copy()
+        state["_prototype_data"] = False
+        return state
+
+    def instantiate(self: T) -> T:
+        """
+        Return a new copy of this entity. Same as copy.deepcopy(), except that gamemaps are shared instead of being copied.
+        Prototypes (entities made in the factories, that are not on any gamemap or inventory) keep their pickled state after they are first copied,
+        so that copying them again only costs unpickling.
+        NOTE: Prototypes should not be modified once they are copied.
+        """
+        data = getattr(self, "_prototype_data", False)
+        if data is not False and self.gamemap is None and getattr(self, "parent", None) is None:
+            if data is None:
+                data = self._prototype_data = pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+            return pickle.loads(data)
+
+        buffer = io.BytesIO()
+        pickler = EntityPickler(buffer)
+        pickler.dump(self)
+        buffer.seek(0)
+        return EntityUnpickler(buffer, pickler.gamemaps).load()
+
     def copy(self, gamemap: GameMap, exact_copy: bool=False) -> Entity:
-        clone = copy.deepcopy(self)
+        clone = self.instantiate()
         clone.gamemap = gamemap
         if not exact_copy:
             clone.initialize_self()
@@ -392,7 +447,7 @@ class Entity:
             apply_physics:
                 if True, call environmental() functions during .place() call.
         """
-        if gamemap.tiles[x, y]["tile_id"][-4:] == "hole":
+        if gamemap.tiles["is_hole"][x, y]:
             print(f"ERROR::You should avoid spawning an entities on holes. This could cause an unexpected issue! - entity: {self.entity_id}, depth: {gamemap.depth}, xy:{x,y}")
         clone = self.copy(gamemap, exact_copy=exact_copy) # Most of the time, spawn() will have exact_copy param as False
         clone.place(x, y, gamemap, apply_physics=apply_physics)
@@ -405,11 +460,14 @@ class Entity:
         """
         Place this entitiy at a new location.
         If new gamemap is given, remove entity from previous gamemap, and place it onto new gamemap."""
+        prev_x, prev_y = self.x, self.y
         self.x = x
         self.y = y
+        if self.gamemap:
+            self.gamemap.update_entity_location(self, prev_x, prev_y)
         if gamemap:
             self.gamemap = gamemap
-            gamemap.entities.append(self)
+            gamemap.add_entity(self)
 
         # Apply environmental effects when placed.
         if apply_physics:
@@ -431,6 +489,8 @@ class Entity:
         # Move the entity by a given amount
         self.x += dx
         self.y += dy
+        if self.gamemap:
+            self.gamemap.update_entity_location(self, self.x - dx, self.y - dy)
 
         # Apply environmental effects when moved.
         self.do_physics()
@@ -673,7 +733,7 @@ class Actor(Entity):
     def environmental_pit(self):
         """Handles when actor is in pit"""
         # Deep pit
-        if self.gamemap.tiles[self.x, self.y]["tile_id"] == "deep_pit":
+        if self.gamemap.get_tile_id(self.x, self.y) == "deep_pit":
             if not self.actor_state.is_in_deep_pit:
                 pass  # TODO: Add an effect that happens only right after when the actor falls into the pit
             self.actor_state.is_in_deep_pit = True
@@ -681,7 +741,7 @@ class Actor(Entity):
             self.actor_state.is_in_deep_pit = False
 
         # Shallow pit
-        if self.gamemap.tiles[self.x, self.y]["tile_id"] == "shallow_pit":
+        if self.gamemap.get_tile_id(self.x, self.y) == "shallow_pit":
             self.actor_state.is_in_shallow_pit = True
         else:
             self.actor_state.is_in_shallow_pit = False
@@ -689,7 +749,7 @@ class Actor(Entity):
     def environmental_water(self):
         """Handles when actor is in water"""
         # Do not call the parent function since entity.do_environmental_effects() is called anyway
-        if self.gamemap.tiles[self.x, self.y]["tile_id"] == "deep_water":
+        if self.gamemap.get_tile_id(self.x, self.y) == "deep_water":
             # FX
             if self == self.engine.player and self.engine.sound_manager:
                 if not self.actor_state.is_underwater or not self.actor_state.is_submerged:
@@ -698,7 +758,7 @@ class Actor(Entity):
             self.actor_state.is_submerged = True
             if self.actor_state.size < 6:
                 self.actor_state.is_underwater = True
-        elif self.gamemap.tiles[self.x, self.y]["tile_id"] == "shallow_water":
+        elif self.gamemap.get_tile_id(self.x, self.y) == "shallow_water":
             # FX
             if self == self.engine.player and self.engine.sound_manager:
                 if not self.actor_state.is_submerged:
@@ -724,7 +784,7 @@ class Actor(Entity):
 
     def environmental_hole(self):# Is a override, do not call super().environmental_hole in this function. You should manually sync the changes.
         """Handle entity on a hole tile."""
-        if self.gamemap.tiles[self.x, self.y]["tile_id"] == "hole":
+        if self.gamemap.tiles["is_hole"][self.x, self.y]:
             new_gamemap = self.engine.world.get_map(depth=self.gamemap.depth + 1)
             x, y = new_gamemap.get_random_tile(should_no_entity=True, should_walkable=True, should_safe_to_walk=True,
                                                should_not_protected=True, should_connected_with_stair=True)
@@ -932,11 +992,11 @@ class Actor(Entity):
         You should not directly override this function, instead edit actor.change_tile_to variable(which is a id to get value from the tileset) instead."""
         if self.tile_effect_on_path != None:
             if self.tile_effect_on_path == "freeze":
-                self.gamemap.tiles[self.x, self.y] = TileUtil.freeze(self.gamemap.tiles[self.x, self.y])
+                self.gamemap.set_tile(self.x, self.y, TileUtil.freeze(self.gamemap.tiles[self.x, self.y]))
             elif self.tile_effect_on_path == "unfreeze":
-                self.gamemap.tiles[self.x, self.y] = TileUtil.unfreeze(self.gamemap.tiles[self.x, self.y])
+                self.gamemap.set_tile(self.x, self.y, TileUtil.unfreeze(self.gamemap.tiles[self.x, self.y]))
             elif self.tile_effect_on_path == "burn":
-                self.gamemap.tiles[self.x, self.y] = TileUtil.burn(self.gamemap.tiles[self.x, self.y]) #NOTE: You are not spawning a fire, instead you are only burning the tile.
+                self.gamemap.set_tile(self.x, self.y, TileUtil.burn(self.gamemap.tiles[self.x, self.y])) #NOTE: You are not spawning a fire, instead you are only burning the tile.
 
     def spawn_actor_on_path(self):
         if self.actor_to_spawn_on_path != None:
@@ -1147,7 +1207,7 @@ class Item(Entity):
 
     def environmental_water(self) -> None:
         super().environmental_water()
-        if self.gamemap.tiles[self.x, self.y]["tile_id"][-5:] == "water":
+        if self.gamemap.tiles["is_water"][self.x, self.y]:
             self.collided_with_water()
 
     def price_of_single_item(self, is_shopkeeper_is_selling: bool, discount: float=1) -> int:
@@ -1202,7 +1262,10 @@ class Item(Entity):
         else:
             using = self.initial_upgrades
         if self.equipable:
-            upgrade = random.choices(list(using.keys()), list(using.values()), k=1)[0]
+            if sum(using.values()) <= 0: # e.g. {0:0} - Always use the first upgrade value. (random.choices() raises ValueError since python 3.9)
+                upgrade = list(using.keys())[0]
+            else:
+                upgrade = random.choices(list(using.keys()), list(using.values()), k=1)[0]
             self.equipable.upgrade_this(amount=upgrade)
 
     def initialize_self(self):
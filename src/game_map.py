@@ -7,7 +7,7 @@ from numpy.lib.arraysetops import isin
 import tiles
 import color
 
-from typing import Iterable, Iterator, Optional, Tuple, List, TYPE_CHECKING
+from typing import Iterable, Iterator, Optional, Sequence, Tuple, List, Dict, Set, TYPE_CHECKING
 from entity import Actor, Item, SemiActor
 from order import TilemapOrder
 from game import Game
@@ -15,6 +15,7 @@ from korean import grammar as g
 from language import interpret as i
 
 if TYPE_CHECKING:
+    from tcod.path import Pathfinder
     from engine import Engine
     from entity import Entity
     from biome import Biome
@@ -28,6 +29,24 @@ class GameMap:
         self.biome = biome
         self.width, self.height = biome.map_width, biome.map_height
         self.entities = list()
+        self.entities_by_location: Dict[Tuple[int, int], List[Entity]] = {} # Spatial hash of self.entities. Kept up to date by add_entity(), remove_entity() and update_entity_location().
+        # Typed buckets of self.entities. Dictionaries are used as insertion-ordered sets.
+        self.actor_bucket: Dict[Actor, None] = {} # Living actors only
+        self.item_bucket: Dict[Item, None] = {}
+        self.semiactor_bucket: Dict[SemiActor, None] = {}
+        self.dead_actors: Set[Actor] = set() # Tombstones of actors that are dead but are not yet removed from the gamemap
+        self.is_dirty = True # True if the gamemap has changed since it was last serialized. (see World.check_if_map_is_dirty())
+        self.entities_sorted = True # False if self.entities needs to be re-sorted by render order. Set to False by add_entity().
+        self.sight_blockers = np.zeros((biome.map_width, biome.map_height), dtype=np.int16, order="F") # Number of sight blocking entities on each tile. Kept up to date by the spatial hash.
+        self.transparency_version = 0 # Increased whenever the transparency of any tile changes. (e.g. a door opens or closes, a wall is dug)
+        self.transparency_mask = None # Cached result of get_transparency_mask(). Updated tile by tile by update_transparency_at().
+        self.movement_blockers = np.zeros((biome.map_width, biome.map_height), dtype=np.int16, order="F") # Number of movement blocking entities on each tile. Kept up to date by the spatial hash.
+        self.dangerous_semiactors = np.zeros((biome.map_width, biome.map_height), dtype=np.int16, order="F") # Number of semiactors that are not safe to move onto on each tile. Kept up to date by the spatial hash.
+        self.path_cost_cache: Dict[tuple, np.ndarray] = {} # Pathfinding cost grids of the current turn. key: traits of the ai. (see get_path_cost_grid())
+        self.path_cost_cache_turn = None
+        self.player_flow_fields: Dict[tuple, Pathfinder] = {} # Dijkstra maps rooted at the player of the current turn. (see BaseAI.get_player_flow_field())
+        self.walkable_labels = None # Cached result of get_walkable_labels()
+        self.walkable_labels_source = None # Copy of tiles["walkable"] that self.walkable_labels was made from
 
         self.tileset = biome.tileset # initialized at procgen
 
@@ -56,6 +75,28 @@ class GameMap:
             (biome.map_width, biome.map_height), fill_value=False, order="F"
         )  # Tiles the player has seen before
 
+    def __getstate__(self) -> dict:
+        """
+        Per-turn caches are not saved. (Pathfinders cannot be pickled)
+        Tiles are saved in compact form. (see tiles.compact_tiles())
+        """
+        state = self.__dict__.copy()
+        state["tiles"] = None
+        state["compact_tiles"] = tiles.compact_tiles(self.tiles)
+        state["transparency_mask"] = None
+        state["path_cost_cache"] = {}
+        state["path_cost_cache_turn"] = None
+        state["player_flow_fields"] = {}
+        state["walkable_labels"] = None
+        state["walkable_labels_source"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        compact = state.pop("compact_tiles", None)
+        self.__dict__.update(state)
+        if compact is not None:
+            self.tiles = tiles.expand_tiles(*compact)
+
     @property
     def gamemap(self) -> GameMap:
         return self
@@ -76,32 +117,29 @@ class GameMap:
     
     def typed_entities(self, types: Tuple[str]) -> Iterator[Entity]:
         """Iterate over this maps entities of given types."""
-        yield from (
-            entity
-            for entity in self.entities
-            if self.is_type(entity, types)
-        )
+        if "actor" in types:
+            yield from self.actor_bucket
+        if "item" in types:
+            yield from self.item_bucket
+        if "semiactor" in types:
+            yield from self.semiactor_bucket
 
     @property
     def actors(self) -> Iterator[Actor]:
         """Iterate over this maps living actors."""
-        yield from (
-            entity
-            for entity in self.entities
-            if isinstance(entity, Actor) and not entity.is_dead
-        )
+        yield from self.actor_bucket
 
     @property
     def items(self) -> Iterator[Item]:
-        yield from (entity for entity in reversed(self.entities) if isinstance(entity, Item))
+        yield from self.item_bucket
 
     @property
     def semiactors(self) -> Iterator[SemiActor]:
         """Iterate over this maps active semiactors, and return in list."""
         yield from (
             entity
-            for entity in self.entities
-            if isinstance(entity, SemiActor) and entity.is_active
+            for entity in self.semiactor_bucket
+            if entity.is_active
         )
 
     def init_physics(self) -> None:
@@ -140,19 +178,213 @@ class GameMap:
                     self.engine.message_log.add_message(i(f"{g(actor.name, '이')} 계단을 올라왔다.",
                                                           f"{actor.name} went up the stair."), fg=color.world)
 
+    def add_entity(self, entity: Entity) -> None:
+        """Add the given entity to this gamemap.
+        Its recommended to use this method instead of doing gamemap.entities.append(something)"""
+        if entity in self.entities_at(entity.x, entity.y):
+            return None # Already on this gamemap
+        self.entities.append(entity)
+        self.entities_sorted = False
+        self.is_dirty = True
+        self.index_entity(entity)
+        if isinstance(entity, Actor):
+            if entity.is_dead:
+                self.dead_actors.add(entity)
+            else:
+                self.actor_bucket[entity] = None
+        elif isinstance(entity, Item):
+            self.item_bucket[entity] = None
+        elif isinstance(entity, SemiActor):
+            self.semiactor_bucket[entity] = None
+
+    def unregister_entity(self, entity: Entity) -> None:
+        """
+        Remove the given entity from self.entities, the spatial hash and the typed buckets.
+        Unlike remove_entity(), entity.gamemap is left untouched.
+        Raises ValueError if the entity is not in self.entities.
+        """
+        self.entities.remove(entity)
+        self.is_dirty = True
+        self.unindex_entity(entity, entity.x, entity.y)
+        self.actor_bucket.pop(entity, None)
+        self.item_bucket.pop(entity, None)
+        self.semiactor_bucket.pop(entity, None)
+        self.dead_actors.discard(entity)
+
     def remove_entity(self, entity: Entity) -> None:
         """Removes all connection with the given entity.
         Its recommended to use this method instead of doing gamemap.entities.remove(something)"""
         try:
-            self.entities.remove(entity)
+            self.unregister_entity(entity)
             entity.gamemap = None
         except ValueError:
             print(f"ERROR::{entity.entity_id} is not in gamemap.entities.")
 
+    def mark_actor_dead(self, actor: Actor) -> None:
+        """Move the given actor from the living actors bucket to the tombstones."""
+        if actor in self.actor_bucket:
+            del self.actor_bucket[actor]
+            self.dead_actors.add(actor)
+
+    def index_entity(self, entity: Entity) -> None:
+        """Register the given entity to the spatial hash using its current location."""
+        bucket = self.entities_by_location.setdefault((entity.x, entity.y), [])
+        if entity not in bucket:
+            bucket.append(entity)
+            if entity.blocks_sight:
+                self.sight_blockers[entity.x, entity.y] += 1
+                self.update_transparency_at(entity.x, entity.y)
+            if entity.blocks_movement:
+                self.movement_blockers[entity.x, entity.y] += 1
+            if isinstance(entity, SemiActor) and not entity.safe_to_move:
+                self.dangerous_semiactors[entity.x, entity.y] += 1
+
+    def unindex_entity(self, entity: Entity, x: int, y: int) -> bool:
+        """
+        Remove the given entity from the spatial hash bucket of (x, y).
+        Return:
+            True if the entity was found on the bucket.
+        """
+        bucket = self.entities_by_location.get((x, y))
+        if not bucket or entity not in bucket:
+            return False
+        bucket.remove(entity)
+        if not bucket:
+            del self.entities_by_location[(x, y)]
+        if entity.blocks_sight:
+            self.sight_blockers[x, y] -= 1
+            self.update_transparency_at(x, y)
+        if entity.blocks_movement:
+            self.movement_blockers[x, y] -= 1
+        if isinstance(entity, SemiActor) and not entity.safe_to_move:
+            self.dangerous_semiactors[x, y] -= 1
+        return True
+
+    def update_entity_location(self, entity: Entity, prev_x: int, prev_y: int) -> None:
+        """
+        Is called whenever an entity on this gamemap changes its location.
+        Entities that are not on the spatial hash (e.g. items in an inventory) are ignored.
+        """
+        if self.unindex_entity(entity, prev_x, prev_y):
+            self.index_entity(entity)
+            self.is_dirty = True
+
+    def rebuild_entity_index(self) -> None:
+        """Rebuild the spatial hash from scratch using self.entities."""
+        self.entities_by_location = {}
+        for entity in self.entities:
+            self.index_entity(entity)
+
+    def get_transparency_mask(self) -> np.ndarray:
+        """
+        Return the array of tiles that does not block sight, with sight blocking entities taken into account.
+        The mask is shared by the player and every ai on this gamemap.
+        It is only built once, and then kept up to date by update_transparency_at().
+        NOTE: The returned array should not be modified.
+        """
+        if self.transparency_mask is None:
+            self.transparency_mask = self.tiles["transparent"] & (self.sight_blockers == 0)
+        return self.transparency_mask
+
+    def update_transparency_at(self, x: int, y: int) -> None:
+        """
+        Is called when a sight blocking entity or the tile of the given location has changed.
+        Increases self.transparency_version only if the transparency of the location has actually changed.
+        """
+        transparent = bool(self.tiles["transparent"][x, y]) and self.sight_blockers[x, y] == 0
+        if self.transparency_mask is None:
+            self.transparency_version += 1
+        elif self.transparency_mask[x, y] != transparent:
+            self.transparency_mask[x, y] = transparent
+            self.transparency_version += 1
+
+    def set_tile(self, x: int, y: int, tile) -> None:
+        """
+        Replace the tile of the given location.
+        NOTE: Once the gamemap is generated, tiles should be changed using this function instead of writing to self.tiles directly,
+        so that the transparency mask stays up to date.
+        """
+        self.tiles[x, y] = tile
+        self.is_dirty = True
+        self.update_transparency_at(x, y)
+
+    def get_tile_id(self, x: int, y: int) -> str:
+        return tiles.get_tile_id(self.tiles[x, y])
+
+    def get_tile_name(self, x: int, y: int) -> str:
+        return tiles.get_tile_name(self.tiles[x, y])
+
+    def check_path_caches_expired(self) -> None:
+        """Clear the pathfinding caches if they were made on previous turns."""
+        if self.path_cost_cache_turn != self.engine.game_turn:
+            self.path_cost_cache.clear()
+            self.player_flow_fields.clear()
+            self.path_cost_cache_turn = self.engine.game_turn
+
+    def get_path_cost_key(self, actor: Actor) -> tuple:
+        """Return the traits of the given actor that affects its pathfinding costs."""
+        # If the actor is already on dangerous tile, same types of tiles will be considered safe.
+        # (Thus, the ai will be able to find its way out from the middle of giant pool of water.)
+        standing_on = None
+        if not actor.is_on_air and not self.tiles["safe_to_walk"][actor.x, actor.y]:
+            standing_on = self.tiles["tile_type"][actor.x, actor.y]
+        return (
+            actor.status.changed_status["intelligence"],
+            actor.is_on_air,
+            actor.actor_state.can_swim,
+            actor.actor_state.live_underwater and actor.actor_state.is_submerged,
+            standing_on,
+        )
+
+    def get_player_flow_field(self, key: tuple) -> Optional[Pathfinder]:
+        self.check_path_caches_expired()
+        return self.player_flow_fields.get(key)
+
+    def set_player_flow_field(self, key: tuple, pathfinder: Pathfinder) -> None:
+        self.check_path_caches_expired()
+        self.player_flow_fields[key] = pathfinder
+
+    def get_path_cost_grid(self, actor: Actor) -> np.ndarray:
+        """
+        Return the tile-based pathfinding cost grid for the given actor.
+        Grids are cached for the current turn, and shared by every actor with the same traits.
+        Costs that changes whenever an entity moves (blocking entities, dangerous semiactors) are NOT included.
+        (They are added by the ai using self.movement_blockers and self.dangerous_semiactors)
+        NOTE: The returned array should not be modified.
+        """
+        self.check_path_caches_expired()
+        key = self.get_path_cost_key(actor)
+        intelligence, is_on_air, can_swim, is_submerged, standing_on = key
+        cost = self.path_cost_cache.get(key)
+        if cost is not None:
+            return cost
+
+        walkable = self.tiles["walkable"]
+        cost = walkable.astype(np.int32) # set to 1 (walkable)
+
+        if not is_on_air:
+            dangerous = walkable & ~self.tiles["safe_to_walk"]
+            if standing_on is not None:
+                dangerous &= self.tiles["tile_type"] != standing_on
+            if can_swim:
+                dangerous &= self.tiles["tile_type"] != tiles.TILE_TYPES["deep_water"] # Deep water is safe for swimming actors. (see check_tile_safe())
+            cost[dangerous] += intelligence * 5 # AI with higher intelligence is more likely to dodge dangerous tiles.
+
+        if is_submerged:
+            # Submerged actors tries to stay under the water. (see BaseAI.get_path_to())
+            cost[walkable & ~self.tiles["is_water"]] += 50
+
+        self.path_cost_cache[key] = cost
+        return cost
+
+    def entities_at(self, x: int, y: int) -> Sequence[Entity]:
+        """Return the entities on the given location, in the order they arrived. The returned sequence should not be modified."""
+        return self.entities_by_location.get((x, y), ())
+
     def check_tile_monster_spawnable(self, x:int, y:int, must_not_be_in_sight: bool=False):
         if must_not_be_in_sight and self.visible[x, y]:
             return False
-        if any(entity.x == x and entity.y == y and entity.blocks_movement for entity in self.entities) or not self.tiles["walkable"][x, y]:
+        if any(entity.blocks_movement for entity in self.entities_at(x, y)) or not self.tiles["walkable"][x, y]:
             return False
         else:
             return True
@@ -160,25 +392,24 @@ class GameMap:
     def get_any_type_entity_prioritize_actor_item_semiactor(self, x: int, y: int) -> Optional[Entity]:
         """Get any entity. Priority - Actor > item > semiactor"""
         temp = None
-        for entity in self.engine.game_map.entities:
-            if entity.x == x and entity.y == y:
-                if isinstance(entity, Actor) or temp == None:
-                    temp = entity
-                elif isinstance(entity, Item) and isinstance(temp, SemiActor):
-                    temp = entity
+        for entity in self.entities_at(x, y):
+            if isinstance(entity, Actor) or temp == None:
+                temp = entity
+            elif isinstance(entity, Item) and isinstance(temp, SemiActor):
+                temp = entity
         return temp
 
     def get_all_entities_at_location(self, location_x, location_y) -> Iterator[Entity]:
-        yield from (entity for entity in self.entities if entity.x == location_x and entity.y == location_y)
+        yield from list(self.entities_at(location_x, location_y))
 
     def get_all_blocking_entities_at_location(self, location_x, location_y) -> Iterator[Entity]:
-        yield from (entity for entity in reversed(self.entities) if (entity.blocks_movement and entity.x == location_x and entity.y == location_y))
+        yield from [entity for entity in reversed(self.entities_at(location_x, location_y)) if entity.blocks_movement]
 
     def get_any_entity_at_location(
         self, location_x: int, location_y: int, exception=None,
     ) -> Optional[Entity]:
-        for entity in self.entities:
-            if (entity.x == location_x and entity.y == location_y and entity != exception):
+        for entity in self.entities_at(location_x, location_y):
+            if entity != exception:
                 return entity
 
         return None
@@ -186,47 +417,36 @@ class GameMap:
     def get_blocking_entity_at_location(
         self, location_x: int, location_y: int
     ) -> Optional[Entity]:
-        for entity in self.entities:
-            if (
-                entity.blocks_movement
-                and entity.x == location_x
-                and entity.y == location_y
-            ):
+        for entity in self.entities_at(location_x, location_y):
+            if entity.blocks_movement:
                 return entity
 
         return None
 
     def get_actor_at_location(self, x: int, y: int) -> Optional[Actor]:
-        for actor in self.actors:
-            if actor.x == x and actor.y == y:
-                return actor
+        for entity in self.entities_at(x, y):
+            if isinstance(entity, Actor) and not entity.is_dead:
+                return entity
 
         return None
 
     def get_all_actors_at_location(self, x: int, y: int) -> Optional[List[Actor]]:
-        tmp = []
-        for actor in self.actors:
-            if actor.x == x and actor.y == y:
-                tmp.append(actor)
+        tmp = [entity for entity in self.entities_at(x, y) if isinstance(entity, Actor) and not entity.is_dead]
         if len(tmp):
             return tmp
         return None
 
     def get_all_items_at_location(self, x: int, y: int) -> Optional[List[Item]]:
-        tmp = []
-        for item in self.items:
-            if item.x == x and item.y == y:
-                tmp.append(item)
+        # Same order as reversed(self.entities) after sort_entities(), so that the topmost item is listed first.
+        tmp = sorted((entity for entity in self.entities_at(x, y) if isinstance(entity, Item)),
+                     key=lambda x: (x.render_order.value, -x.entity_order), reverse=True)
         if tmp:
             return tmp
         return None
 
     def get_item_at_location(self, x: int, y: int) -> Optional[Item]:
-        for item in self.items:
-            if item.x == x and item.y == y:
-                return item
-
-        return None
+        return max((entity for entity in self.entities_at(x, y) if isinstance(entity, Item)),
+                   key=lambda x: (x.render_order.value, -x.entity_order), default=None) # First item of get_all_items_at_location()
 
     def get_semiactor_at_location(self, x: int, y: int, semiactor_id: Optional[str]=None) -> Optional[SemiActor]:
         """
@@ -234,8 +454,8 @@ class GameMap:
             semiactor_id:
                 you can pass part of the string such as 'door' to get only the semiactor with id ending with door.
         """
-        for semiactor in self.semiactors:
-            if semiactor.x == x and semiactor.y == y:
+        for semiactor in self.entities_at(x, y):
+            if isinstance(semiactor, SemiActor) and semiactor.is_active:
                 if semiactor_id:
                     if semiactor.entity_id[-len(semiactor_id):] == semiactor_id:
                         return semiactor
@@ -244,17 +464,14 @@ class GameMap:
         return None
 
     def get_semiactor_that_bump(self, x: int, y: int) -> Optional[SemiActor]:
-        for semiactor in self.semiactors:
-            if semiactor.x == x and semiactor.y == y and (semiactor.trigger_bump or semiactor.blocks_movement):
+        for semiactor in self.entities_at(x, y):
+            if isinstance(semiactor, SemiActor) and semiactor.is_active and (semiactor.trigger_bump or semiactor.blocks_movement):
                 return semiactor
         
         return None
 
     def get_all_semiactors_at_location(self, x: int, y: int) -> Optional[List[SemiActor]]:
-        tmp = []
-        for semiactor in self.semiactors:
-            if semiactor.x == x and semiactor.y == y:
-                tmp.append(semiactor)
+        tmp = [entity for entity in self.entities_at(x, y) if isinstance(entity, SemiActor) and entity.is_active]
         if len(tmp):
             return tmp
         return None
@@ -272,7 +489,7 @@ class GameMap:
            tile_safe = True
         else:
             # If the tile is deep water, but the ai is able to swim, its considered safe.
-            if actor.actor_state.can_swim and self.gamemap.tiles[x, y]["tile_id"] == "deep_water":
+            if actor.actor_state.can_swim and self.tiles["tile_type"][x, y] == tiles.TILE_TYPES["deep_water"]:
                 tile_safe = True
             # TODO : Add other tiles logics
             else:
@@ -293,7 +510,21 @@ class GameMap:
         return tile_safe and semiactor_safe
 
 
-    def check_if_tile_connected_with_stair(self, x: int, y: int) -> bool:
+    def get_walkable_labels(self) -> np.ndarray:
+        """
+        Return the 8-connected components of walkable tiles. (see blob.label_chunks())
+        Two walkable tiles are connected with one another if they have the same label. Unwalkable tiles are labeled -1.
+        The labels are rebuilt only when the walkability of any tile has changed.
+        NOTE: The returned array should not be modified.
+        """
+        from blob import label_chunks
+        walkable = self.tiles["walkable"]
+        if self.walkable_labels is None or not np.array_equal(self.walkable_labels_source, walkable):
+            self.walkable_labels = label_chunks(walkable, diagonal=True)
+            self.walkable_labels_source = walkable.copy()
+        return self.walkable_labels
+
+    def check_if_tile_connected_with_stair(self, x: int, y: int, labels: Optional[np.ndarray] = None) -> bool:
         """
         NOTE: We assume that the both descending and ascending stairs are connected,
         so we only check the ascending one since every floor has one.
@@ -301,32 +532,25 @@ class GameMap:
         NOTE: This function DOES NOT check for dangerous tiles or blocking entities.
         it only checks if the two position is physically connected with one another.
 
+        Args:
+            labels:
+                Result of get_walkable_labels().
+                Pass it when checking many tiles while no tile changes, so that the walkable tiles are compared with the cache only once.
+
         Return:
             True if connected.
         """
-        import tcod
-        # Copy the walkable array. (All walkable tiles are set to 1)
-        cost = np.array(self.tiles["walkable"], dtype=np.int8)
-
-        # Create a graph from the cost array and pass that graph to a new pathfinder.
-        graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3, greed=1)
-        pathfinder = tcod.path.Pathfinder(graph)
-
-        # Set start position, get stair coordinates
-        pathfinder.add_root((x, y))
         if self.ascend_loc:
             dest_x, dest_y = self.ascend_loc
         elif self.descend_loc:
             dest_x, dest_y = self.descend_loc
         else:
             print(f"FATAL ERROR::There are no stairs in depth {self.depth} - gamemap.check_if_tile_connected_with_stair()")
-            dest_x, dest_y = x, y
-
-        # Compute the path to the destination and remove the starting point.
-        path = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
-        if not path:
             return False
-        return True
+
+        if labels is None:
+            labels = self.get_walkable_labels()
+        return labels[x, y] != -1 and labels[x, y] == labels[dest_x, dest_y]
 
 
     def get_random_tile(
@@ -349,6 +573,8 @@ class GameMap:
                 Max try count.
                 If None, try indefinitely.
         """
+        labels = self.get_walkable_labels() if should_connected_with_stair else None # Tiles do not change while searching
+
         t = -1
         while (threshold == None) or (threshold != None and t < threshold):
             t += 1
@@ -371,7 +597,7 @@ class GameMap:
                 continue
             if should_not_protected and self.protectmap[x,y]:
                 continue
-            if should_connected_with_stair and not self.check_if_tile_connected_with_stair(x,y):
+            if should_connected_with_stair and not self.check_if_tile_connected_with_stair(x,y, labels=labels):
                 continue
             return (x,y)
 
@@ -385,8 +611,8 @@ class GameMap:
             return (0,0)
 
     def check_if_id_at_location(self, entity_id: str, x: int, y: int) -> bool:
-        for entity in self.entities:
-            if (entity.x == x and entity.y == y and entity.entity_id == entity_id):
+        for entity in self.entities_at(x, y):
+            if entity.entity_id == entity_id:
                 return True
         return False
 
@@ -394,9 +620,7 @@ class GameMap:
         """
         Surface = tiles that is not a liquid
         """
-        if self.tiles[x, y]["tile_id"][-5:] == "water":
-            return False
-        return True
+        return not self.tiles["is_water"][x, y]
 
     def in_bounds(self, x: int, y: int) -> bool:
         """Return True if x and y are inside of the bounds of this map."""
@@ -404,31 +628,42 @@ class GameMap:
 
     def remove_dup_entities(self) -> None:
         self.entities = list(set(self.entities))
+        self.entities_sorted = False
     
     def sort_entities(self) -> None:
-        self.remove_dup_entities()
-        self.entities = sorted(
-            self.entities, key=lambda x: (x.render_order.value, -x.entity_order)
-        )
+        """
+        Sort entities by their render order.
+        Removing an entity keeps the order intact, so the actual sorting only happens after new entities were added.
+        """
+        if self.entities_sorted:
+            return None
+        self.entities.sort(key=lambda x: (x.render_order.value, -x.entity_order))
+        self.entities_sorted = True
 
     def update_enemy_fov(self, is_initialization: bool=False) -> None:
         """
         Recomputes the vision of actors on this gamemap (besides player)
-        This function is called every turn, but the actual update might not be called every turn due to perf. issues.
+        This function is called every turn.
+        Every ai shares a single transparency mask (see get_transparency_mask()),
+        and the vision of an ai is only recomputed when the ai has moved or the transparency of the gamemap has changed. (see BaseAI.update_vision())
         """
-        for actor in set(self.actors):
+        for actor in tuple(self.actor_bucket):
+            if not actor.ai:
+                continue
+
             # initialize actors vision
             if is_initialization:
-                if actor.ai:
-                    actor.ai.init_vision()
+                actor.ai.init_vision()
+                continue
 
-            ## The game will not update every actor's vision/additional vision every turn due to performance issues
-            # actor.ai.update_vision()
-            # if actor.actor_state.has_telepathy\
-            #     or actor.actor_state.is_detecting_obj[2]:
-            #     self.update_additional_vision(actor=actor)
+            actor.ai.update_vision()
+            if actor.actor_state.has_telepathy\
+                or actor.actor_state.is_detecting_obj[2]:
+                self.engine.update_additional_vision(actor=actor)
 
     def adjustments_before_new_map(self):
+        self.transparency_mask = None # Procgen writes to self.tiles directly, so a mask that was built during the generation is outdated.
+        self.transparency_version += 1
         self.remove_dup_entities()
         self.sort_entities()
         self.update_enemy_fov(is_initialization=True)
@@ -472,8 +707,8 @@ class GameMap:
 
             # Check if there is enough monsters in this gamemap or not
             actor_num = 0
-            for entity in self.actors:
-                if entity.is_dead or not entity.spawnable or entity == self.engine.player: # Ignore maggots
+            for entity in self.actor_bucket:
+                if not entity.spawnable or entity == self.engine.player: # Ignore maggots
                     continue
                 else:
                     actor_num += 1
@@ -2,11 +2,12 @@ from entity import Item
 from order import InventoryOrder
 from korean import grammar as g
 from game import Game
-from typing import List
+from typing import List, Tuple
 from language import interpret as i
 
 import random
 import copy
+import itertools
 import color
 
 class ItemManager:
@@ -18,6 +19,8 @@ class ItemManager:
         e.g. identification, randomized color, randomized name, etc
         """
         self.items_lists = None
+        self._items_rarity = None # Cache of items_rarity. items_lists does not change once it is initialized.
+        self._spawn_table = None # (source items list, generated artifacts, population, cumulative weights) Cache of get_spawn_table().
         self.items_identified = {}
         self.items_fake_info = {} # key: item.entity_id, value: dice{"fg":(r,g,b), "bg":(r,g,b), "name":string, "char":string, "entity_desc":string}
         # items_fake_info stores fake information(or the surface information) for EVERY items that exists in game.
@@ -100,12 +103,37 @@ class ItemManager:
         random.shuffle(self.shapes_for_rings)
         random.shuffle(self.colors_for_rings)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_spawn_table"] = None # Holds item prototypes. Rebuilt when needed.
+        return state
+
     @property
     def items_rarity(self) -> List:
-        tmp = []
-        for item in self.items_lists:
-            tmp.append(item.rarity)
-        return tmp
+        if getattr(self, "_items_rarity", None) is None: # Saves made before the cache was added do not have the attribute
+            self._items_rarity = [item.rarity for item in self.items_lists]
+        return self._items_rarity
+
+    def get_spawn_table(self) -> Tuple[List[Item], List[int]]:
+        """
+        Return items that can be spawned naturally, and the cumulative sum of their rarity. (For random.choices(cum_weights=...))
+        NOTE: Made from item_factories.temp_items_lists, not self.items_lists, so that reloaded item_factories is used after changing the language.
+        The table is rebuilt only when generated artifacts have changed or item_factories has been reloaded.
+        """
+        import item_factories
+
+        artifacts = frozenset(self.generated_artifacts)
+        table = getattr(self, "_spawn_table", None)
+        if table is None or table[0] is not item_factories.temp_items_lists or table[1] != artifacts:
+            population = []
+            rarity = []
+            for item, item_rarity in zip(item_factories.temp_items_lists, item_factories.item_rarity):
+                if item.spawnable and item.entity_id not in artifacts:
+                    population.append(item)
+                    rarity.append(item_rarity)
+            table = (item_factories.temp_items_lists, artifacts, population, list(itertools.accumulate(rarity)))
+            self._spawn_table = table
+        return table[2], table[3]
 
     def engine(self):
         return Game.engine
@@ -6,7 +6,6 @@ import sys
 import traceback
 import tcod
 import color
-import json
 import threading
 from exceptions import RestartException
 from game import Game
@@ -14,14 +13,13 @@ from option import Option
 from configuration import get_game_config
 from title import Title
 from sound import SoundManager
+from turn_profiler import TurnProfiler
 
 global sound_queue # Contains sound that are going to be played once
 global bgm
 global bgs
 
-f = open("./config/config.json", "r")
-debug = json.load(f)["debugmode"]
-f.close()
+debug = get_game_config()["debugmode"]
 
 class SystemLog(object):
     def __init__(self, origin_stdout):
@@ -77,6 +75,11 @@ def main() -> None:
     # Get Configuration
     cfg = get_game_config()
 
+    # Measure each phase of the turn loop, and export the result every 100 turns (see turn_profiler.py)
+    turn_profiler = None
+    if cfg.get("profile_turns", False):
+        turn_profiler = TurnProfiler(window=100, export_path="log\\turn_profile.json", export_interval=100)
+
     # Toggle Fullscreen
     if cfg["fullscreen"]:
         set_screen = tcod.context.SDL_WINDOW_FULLSCREEN_DESKTOP
@@ -117,6 +120,7 @@ def main() -> None:
                 engine.console = root_console
                 engine.context = context
                 engine.sound_manager = sound_manager
+                engine.turn_profiler = turn_profiler
                 engine.initialize_pixel()
                 sound_manager.play_bgm_for_biome(engine.game_map.biome)
                 sound_manager.play_bgs_for_biome(engine.game_map.biome)
@@ -3,7 +3,6 @@ from __future__ import annotations
 import color
 import tcod
 import exceptions
-import json
 import configuration as modify
 from sound import SoundManager
 from typing import Optional
@@ -196,8 +195,7 @@ class Option():
     @staticmethod
     def render_display_option_gui(console: tcod.Console, context: tcod.context.Context):
         console.clear(fg=color.option_bg, bg=color.option_bg)
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         fullscreen_str = lambda x : i("전체화면","fullscreen") if x else i("창 모드","windowed")
         console.print(Option.opt_x + 2, Option.opt_y + 2, string=i(f"\n창 모드 사용이 권장됩니다.\n\n디스플레이 관련 설정은 게임을 다시 시작해야 적용됩니다.\
@@ -212,8 +210,7 @@ class Option():
     @staticmethod
     def render_control_option_gui(console: tcod.Console, context: tcod.context.Context):
         console.clear(fg=color.option_bg, bg=color.option_bg)
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         string = lambda x: i("활성화","enabled") if not x else i("비활성화","disabled")
         console.print(Option.opt_x + 2, Option.opt_y + 2, string=i(f"\n\n안전한 마우스 이동: {string(cfg['ignore_enemy_spotted_during_mouse_movement'])}"
@@ -226,8 +223,7 @@ class Option():
     @staticmethod
     def render_sound_option_gui(console: tcod.Console, context: tcod.context.Context):
         console.clear(fg=color.option_bg, bg=color.option_bg)
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         console.print(Option.opt_x + 2, Option.opt_y + 2, string=i(f"\n\n마스터 볼륨: {cfg['master_volume']}%",
                                                                    f"\n\nMaster volume: {cfg['master_volume']}%"), fg=color.option_fg)
@@ -237,8 +233,7 @@ class Option():
     @staticmethod
     def render_gameplay_option_gui(console: tcod.Console, context: tcod.context.Context):
         console.clear(fg=color.option_bg, bg=color.option_bg)
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         string = lambda x : i("활성화","enabled") if x else i("비활성화","disabled")
         stringlang = lambda x : "한국어/Korean" if x == "KR" else ("English/영어" if x == "EN" else "Unknown language. Using English instead.")
@@ -256,8 +251,7 @@ class Option():
     @staticmethod
     def render_reset_option_gui(console: tcod.Console, context: tcod.context.Context):
         console.clear(fg=color.option_bg, bg=color.option_bg)
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         console.print(Option.opt_x + 2, Option.opt_y + 2, string=i(f"\n\n설정 초기화는 게임을 다시 시작해야 적용됩니다."
                                                                    "\n\n게임 플레이 중에는 설정을 초기화할 수 없습니다.",
@@ -276,8 +270,7 @@ class Option():
         Returns:
             if return is False, the event handler that called this function will stop the loop.
         """
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         # remove any leftover messages on the screen from previous changes
         Option.render_display_option_gui(console, context)
@@ -308,8 +301,7 @@ class Option():
         Returns:
             if return is False, the event handler that called this function will stop the loop.
         """
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         # remove any leftover messages on the screen from previous changes
         Option.render_control_option_gui(console, context)
@@ -329,8 +321,7 @@ class Option():
         Returns:
             if return is False, the event handler that called this function will stop the loop.
         """
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         # remove any leftover messages on the screen from previous changes
         Option.render_sound_option_gui(console, context)
@@ -372,8 +363,7 @@ class Option():
         Returns:
             if return is False, the event handler that called this function will stop the loop.
         """
-        with open("./config/config.json", "r") as f:
-            cfg = json.load(f)
+        cfg = modify.get_config()
 
         # remove any leftover messages on the screen from previous changes
         Option.update_lang()
@@ -405,10 +395,7 @@ class Option():
         display_action = Option.get_input_action(ResetInputHandler(game_started))
         if display_action == "reset":
             try:
-                with open("./config/config_default.json", "r") as f:
-                    default_cfg = json.load(f)
-                with open("./config/config.json", "w") as f2:
-                    json.dump(default_cfg, f2, indent=4)
+                modify.reset_config()
                 Option.done_reset = True
             except exceptions.ConfigException:
                 pass
@@ -21,10 +21,11 @@ import terrain_generation
 
 from actor_db import ActorDB
 from order import TilemapOrder
-from typing import Iterator, List, Tuple, TYPE_CHECKING, Optional
+from typing import Dict, Iterator, List, Tuple, TYPE_CHECKING, Optional
 from rooms import Room, RectangularRoom, CircularRoom, BlobRoom
 from game_map import GameMap
 from render import randomized_screen_paint
+from tiles import fill_tiles
 
 if TYPE_CHECKING:
     from engine import Engine
@@ -111,26 +112,12 @@ def choose_monster_by_difficulty(difficulty: int, radius: Tuple[int,int]=(-1,2),
             underwater
     """
     diff_range = (max(difficulty + radius[0], 1) , max(radius[0], radius[1]) + difficulty)
-    if type == "surface":
-        mon_dict = ActorDB.surface_monster_difficulty
-    elif type == "underwater":
-        mon_dict = ActorDB.underwater_monster_difficulty
-    else:
-        print(f"ERROR::Cannot find monster type of {type}")
-        mon_dict = ActorDB.surface_monster_difficulty
-
-    population_list = []
-    rarity_list = []
-    for diff in range(*diff_range):
-        if diff in mon_dict:
-            population_list.extend(mon_dict[diff])
-            for mon in mon_dict[diff]:
-                rarity_list.append(max(0, int(mon.rarity / 1 + abs(diff - difficulty))))
+    population_list, cum_weights = ActorDB.get_spawn_table(difficulty, diff_range, type)
 
     try:
         monster_to_spawn = random.choices(
             population=population_list,
-            weights=rarity_list,
+            cum_weights=cum_weights,
             k=1
         )[0]
         return monster_to_spawn
@@ -224,7 +211,7 @@ def spawn_monster_lists(room: Room, dungeon: GameMap, monsters_to_spawn: List[Ac
         place_tile = random.choice(tile_coordinates)
 
         # Prevent entities clipping
-        if any(entity.x == place_tile[0] and entity.y == place_tile[1] for entity in dungeon.entities) \
+        if dungeon.get_any_entity_at_location(place_tile[0], place_tile[1]) \
                 or dungeon.tilemap[place_tile[0], place_tile[1]] == TilemapOrder.ASCEND_STAIR.value \
                 or dungeon.tilemap[place_tile[0], place_tile[1]] == TilemapOrder.DESCEND_STAIR.value:
             continue
@@ -324,7 +311,7 @@ def spawn_underwater_monster(
 
             monsters_to_spawn.append(choose_monster_by_difficulty(difficulty_chosen, type="underwater"))
 
-    coors = [t for t in room.inner_tiles if dungeon.tiles[t[0], t[1]]["tile_id"][-5:] == "water"]
+    coors = [t for t in room.inner_tiles if dungeon.tiles["is_water"][t[0], t[1]]]
     if not coors:
         return 0  # Cannot spawn underwater monster since there are no water tile
 
@@ -345,27 +332,27 @@ def spawn_items(
         k=1)[0]
     tile_coordinates = room.inner_tiles
 
+    # Choose items to spawn
     if room.terrain.item_to_spawn:
         item_candidates = room.terrain.item_to_spawn
+        spawn_list = random.choices(
+            population=list(item_candidates.keys()),
+            weights=list(item_candidates.values()),
+            k=number_of_items
+            )
     else:
-        item_candidates = {}
-        from item_factories import item_rarity, temp_items_lists
-        for i in range(len(temp_items_lists)):
-            if temp_items_lists[i].spawnable and not dungeon.engine.item_manager.check_artifact_id_generated(temp_items_lists[i].entity_id):
-                item_candidates[temp_items_lists[i]] = item_rarity[i]
-
-    # Choose items to spawn
-    spawn_list = random.choices(
-        population=list(item_candidates.keys()),
-        weights=list(item_candidates.values()),
-        k=number_of_items
-        )
+        population, cum_weights = dungeon.engine.item_manager.get_spawn_table()
+        spawn_list = random.choices(
+            population=population,
+            cum_weights=cum_weights,
+            k=number_of_items
+            )
 
     # Spawn items
     for item_to_spawn in spawn_list:
         place_tile = random.choice(tile_coordinates)
         
-        if not any(entity.x == place_tile[0] and entity.y == place_tile[1] for entity in dungeon.entities) \
+        if not dungeon.get_any_entity_at_location(place_tile[0], place_tile[1]) \
                 and item_to_spawn.spawnable \
                 and not dungeon.engine.item_manager.check_artifact_id_generated(item_to_spawn.entity_id)\
                 and dungeon.tilemap[place_tile[0], place_tile[1]] != TilemapOrder.ASCEND_STAIR.value\
@@ -425,6 +412,109 @@ def path_between(
 
 
 
+def plan_tunnels(
+    cost: np.ndarray, points: List[Tuple[int, int]], pairs_only: bool=False,
+) -> List[List[Tuple[int, int]]]:
+    """
+    Plan tunnels that connect the given points, using a single multi-source dijkstra search.
+    Every point is a root of the search, which splits the map into regions of the closest point.
+    Where two regions meet, the path from each side of the border back to its own root makes a candidate tunnel between the two points.
+    Candidates are chosen from the shortest, like kruskal's algorithm.
+
+    Args:
+        cost:
+            Tiles with 0 cost are never tunneled through. (e.g. dungeon.tunnelmap)
+        pairs_only:
+            If True, each point is connected to at most one other point.
+            Otherwise the tunnels form a minimum spanning tree of the points. (Points that can't be reached are left out)
+    Return:
+        List of tunnels. Each tunnel is a list of coordinates from one point to another, including both ends.
+    """
+    if len(points) < 2:
+        return []
+
+    # diagonal cost is set to 1000, so the path isn't too narrow.
+    graph = tcod.path.SimpleGraph(cost=np.asarray(cost, dtype=np.int8), cardinal=2, diagonal=1000)
+    pathfinder = tcod.path.Pathfinder(graph)
+    for point in points:
+        pathfinder.add_root((int(point[0]), int(point[1])))
+    pathfinder.resolve()
+
+    # Find the root of every tile by following the traversal array. (pointer jumping)
+    shape = cost.shape
+    reachable = pathfinder.distance != np.iinfo(pathfinder.distance.dtype).max
+    traversal = np.where(reachable[..., None], pathfinder.traversal, np.indices(shape).transpose(1, 2, 0))
+    root = np.ravel_multi_index((traversal[..., 0].ravel(), traversal[..., 1].ravel()), shape)
+    while True:
+        next_root = root[root]
+        if np.array_equal(next_root, root):
+            break
+        root = next_root
+    point_index = np.full(root.size, -1)
+    point_index[np.ravel_multi_index(tuple(np.array(points, dtype=np.int64).T), shape)] = np.arange(len(points))
+    region = np.where(reachable.ravel(), point_index[root], -1).reshape(shape)
+
+    # Borders between regions. Only the shortest candidate of each pair of points is kept.
+    distance = np.where(reachable, pathfinder.distance, 0).astype(np.int64)
+    tiles_a, tiles_b, regions_a, regions_b, lengths = [], [], [], [], []
+    for dx, dy in ((1, 0), (0, 1)):
+        a = region[:shape[0]-dx, :shape[1]-dy]
+        b = region[dx:, dy:]
+        xs, ys = np.nonzero((a >= 0) & (b >= 0) & (a != b))
+        tiles_a.append(np.stack((xs, ys), axis=1))
+        tiles_b.append(np.stack((xs + dx, ys + dy), axis=1))
+        regions_a.append(a[xs, ys])
+        regions_b.append(b[xs, ys])
+        lengths.append(distance[xs, ys] + distance[xs + dx, ys + dy])
+    tiles_a, tiles_b = np.concatenate(tiles_a), np.concatenate(tiles_b)
+    regions_a, regions_b, lengths = np.concatenate(regions_a), np.concatenate(regions_b), np.concatenate(lengths)
+    pair_key = np.minimum(regions_a, regions_b) * len(points) + np.maximum(regions_a, regions_b)
+    order = np.lexsort((lengths, pair_key))
+    order = order[np.unique(pair_key[order], return_index=True)[1]]
+    order = order[np.argsort(lengths[order], kind="stable")]
+
+    # Kruskal's algorithm
+    group = list(range(len(points)))
+    def find(i: int) -> int:
+        while group[i] != i:
+            group[i] = group[group[i]]
+            i = group[i]
+        return i
+
+    used = set()
+    tunnels = []
+    for edge in order:
+        a, b = int(regions_a[edge]), int(regions_b[edge])
+        if pairs_only:
+            if a in used or b in used:
+                continue
+            used.update((a, b))
+        else:
+            root_a, root_b = find(a), find(b)
+            if root_a == root_b:
+                continue
+            group[root_a] = root_b
+        path_a = pathfinder.path_from(tuple(tiles_a[edge])).tolist()
+        path_b = pathfinder.path_from(tuple(tiles_b[edge])).tolist()
+        tunnels.append([(x, y) for x, y in path_a[::-1] + path_b])
+    return tunnels
+
+
+def dig_tunnel(
+    dungeon: GameMap, path: List[Tuple[int, int]],
+) -> None:
+    """Turn every empty tile on the path into a tunnel."""
+    if not path:
+        return
+    xs, ys = np.array(path).T
+    empty = dungeon.tilemap[xs, ys] == TilemapOrder.VOID.value
+    xs, ys = xs[empty], ys[empty]
+    dungeon.tiles[xs, ys] = dungeon.tileset["t_floor"](shape=(len(xs),))
+    #dungeon.tiles[xs, ys] = dungeon.tileset["t_DEBUG"](shape=(len(xs),))
+    dungeon.tilemap[xs, ys] = TilemapOrder.TUNNEL.value
+    dungeon.tunnelmap[xs, ys] = True
+
+
 def search_empty_convex(
     dungeon: GameMap
 ) -> List:
@@ -464,18 +554,9 @@ def adjust_convex(
     # Search
     empty_convex = search_empty_convex(dungeon=dungeon)
 
-    # Connect convexes 
-    while len(empty_convex) >= 2:
-        con1 = empty_convex.pop()
-        con2 = empty_convex.pop()
-
-        for x, y in path_between(dungeon.tunnelmap, (con1[0], con1[1]), (con2[0], con2[1])):
-            if dungeon.tilemap[x, y] == TilemapOrder.VOID.value:
-                dungeon.tiles[x, y] = dungeon.tileset["t_floor"]()
-                dungeon.tilemap[x, y] = TilemapOrder.TUNNEL.value
-                dungeon.tunnelmap[x, y] = True
-            else:
-                continue
+    # Connect convexes in pairs
+    for path in plan_tunnels(dungeon.tunnelmap, empty_convex, pairs_only=True):
+        dig_tunnel(dungeon, path)
 
     # Search for leftover, and use it as something else
     empty_convex = search_empty_convex(dungeon=dungeon)
@@ -491,19 +572,16 @@ def remove_awkward_entities(
     if check_spawn_err != None:
         print(f"WARNING::{check_spawn_err.name} spawned at (0,0)")
 
+    # Water, holes, pits, stairs and map borders
+    awkward = gamemap.tiles["is_water"] | gamemap.tiles["is_hole"] | gamemap.tiles["is_pit"] | gamemap.tiles["is_stair"]\
+        | (gamemap.tilemap == TilemapOrder.MAP_BORDER.value)
+
     trash = []
-    for e in gamemap.entities:
-        if isinstance(e, SemiActor): # Delete semiactors that are generated on water (both opened/closed)
-            if e.entity_id[-4:] == "door" or e.entity_id[-4:] == "trap" or e.entity_id[-5:] == "chest" or e.entity_id[-4:] == "tree":
-                if gamemap.tiles[e.x, e.y]["tile_id"] == "deep_water"\
-                    or gamemap.tiles[e.x, e.y]["tile_id"] == "shallow_water"\
-                    or gamemap.tiles[e.x, e.y]["tile_id"] == "hole"\
-                    or gamemap.tiles[e.x, e.y]["tile_id"] == "deep_pit"\
-                    or gamemap.tiles[e.x, e.y]["tile_id"] == "shallow_pit"\
-                    or gamemap.tiles[e.x, e.y]["tile_id"] == "ascending_stair"\
-                    or gamemap.tiles[e.x, e.y]["tile_id"] == "descending_stair"\
-                    or gamemap.tilemap[e.x, e.y] == TilemapOrder.MAP_BORDER.value:
-                    trash.append(e)
+    for e in gamemap.semiactor_bucket:
+        # Delete semiactors that are generated on water (both opened/closed)
+        if e.entity_id[-4:] == "door" or e.entity_id[-4:] == "trap" or e.entity_id[-5:] == "chest" or e.entity_id[-4:] == "tree":
+            if awkward[e.x, e.y]:
+                trash.append(e)
     for e in trash:
         print(f"DEBUG::Removed awkwardly placed entity {e.entity_id}.")
         e.remove_self()
@@ -529,21 +607,14 @@ def generate_earth(
     engine: Engine
     ) -> None:
     # Generate color-randomized walls
-    for x in range(len(dungeon.tiles)):
-        for y in range(len(dungeon.tiles[x])):
-            dungeon.tiles[x, y] = dungeon.tileset["t_wall"]()
+    fill_tiles(dungeon.tiles, None, dungeon.tileset["t_wall"])
 
     # Generate unbreakable outer walls
-    for x in range(len(dungeon.tiles)):
-        dungeon.tiles[x, 0] = dungeon.tileset["t_border"]()
-        dungeon.tilemap[x, 0] = TilemapOrder.MAP_BORDER.value
-        dungeon.tiles[x, -1] = dungeon.tileset["t_border"]()
-        dungeon.tilemap[x, -1] = TilemapOrder.MAP_BORDER.value
-    for y in range(len(dungeon.tiles[0])):
-        dungeon.tiles[0, y] = dungeon.tileset["t_border"]()
-        dungeon.tilemap[0, y] = TilemapOrder.MAP_BORDER.value
-        dungeon.tiles[-1, y] = dungeon.tileset["t_border"]()
-        dungeon.tilemap[-1, y] = TilemapOrder.MAP_BORDER.value
+    border = np.zeros(dungeon.tiles.shape, dtype=bool)
+    border[[0, -1], :] = True
+    border[:, [0, -1]] = True
+    fill_tiles(dungeon.tiles, border, dungeon.tileset["t_border"])
+    dungeon.tilemap[border] = TilemapOrder.MAP_BORDER.value
 
     # TODO : Add metals and ores and gems?
 
@@ -590,7 +661,7 @@ def spawn_room(
 
     # Dig out this rooms inner area.
     for inner_slice in room.inner:
-        dungeon.tiles[inner_slice] = dungeon.tileset["t_floor"]()
+        fill_tiles(dungeon.tiles[inner_slice], None, dungeon.tileset["t_floor"])
         dungeon.tilemap[inner_slice] = TilemapOrder.ROOM_INNER.value
         dungeon.tunnelmap[inner_slice] = True
         if room.terrain.protected:
@@ -627,6 +698,43 @@ def spawn_doors(
         else:
             print(f"LOG::Door already exists on {door_pos}. Cancelled Spawning.")
 
+def find_room_location(
+    dungeon: GameMap,
+    new_room: Room,
+    rooms: List[Room],
+    nx: int,
+) -> Optional[int]:
+    """
+    Move the room to the first location that it fits in, checking every candidate location at once with room.intersects_at().
+    Candidates are the room's current location, followed by the grid of (x, y) starting from (nx, 0) with the biome's room spacing, in column order.
+    Args:
+        nx:
+            x coordinate of the column that the search begins.
+    Return:
+        x coordinate of the column that the next room's search should begin.
+        None if there is no location left for the room.
+    NOTE: The first room is always placed at its current location.
+    """
+    xs = np.arange(nx, dungeon.tiles.shape[0], dungeon.biome.room_x_spacing)
+    ys = np.arange(0, dungeon.tiles.shape[1], dungeon.biome.room_y_spacing) # Map border colliding handled in room.intersects_at()
+    if len(xs) == 0 or len(ys) == 0:
+        return None
+    if not rooms:
+        return int(xs[0])
+
+    # The last location of the grid is never used. Next room's search begins from the column of the location next to the chosen one.
+    grid_x, grid_y = np.meshgrid(xs, ys, indexing="ij")
+    cand_x = np.concatenate(([new_room.x1], grid_x.ravel()[:-1]))
+    cand_y = np.concatenate(([new_room.y1], grid_y.ravel()[:-1]))
+    free = np.flatnonzero(~new_room.intersects_at(cand_x, cand_y))
+    if len(free) == 0:
+        return None
+    if free[0] == 0:
+        return int(xs[0])
+    new_room.move(int(cand_x[free[0]]), int(cand_y[free[0]]))
+    return int(xs[free[0] // len(ys)])
+
+
 def generate_rooms(
     dungeon: GameMap,
     rooms: List,
@@ -635,7 +743,7 @@ def generate_rooms(
 ) -> Tuple[GameMap, list]:
     """Generate rooms, stairs, and doors."""
     # Generate rooms
-    nx, ny = 0, 0
+    nx = 0
     for r in range(max_rooms):
         # Choose the terrain of the room
         if dungeon.biome.terrain == None:
@@ -658,23 +766,12 @@ def generate_rooms(
         room_shape = random.choices(population=shape, weights=shape_weights, cum_weights=None, k=1)[0]
         new_room = create_room(dungeon, x, y, room_width, room_height, room_shape, room_terrain) # Generated door locations as well
 
-        # Run through the other rooms and see if they intersect with this one.
-        found = False
-        for x in range(nx, dungeon.tiles.shape[0], dungeon.biome.room_x_spacing):
-            for y in range(ny, dungeon.tiles.shape[1], dungeon.biome.room_y_spacing): # Map border colliding handled in room.move()
-                if any(new_room.intersects(other_room) for other_room in rooms):
-                    new_room.move(x, y)
-                    continue  # This room intersects, so go to the next attempt.
-                # If there are no intersections then the room is valid.
-                else:
-                    found = True
-                    nx = x
-                    ny = 0
-                    break
-            if found:
-                break
-        if not found:
+        # Find the first location where the room does not intersect with anything.
+        # Locations are searched column by column, starting from the column where the last room was placed.
+        found = find_room_location(dungeon, new_room, rooms, nx)
+        if found is None:
             break # Made every available rooms
+        nx = found
 
         # Actual entity, tile spawning
         spawn_room(dungeon, new_room)
@@ -735,83 +832,74 @@ def generate_tunnels(
     dungeon: GameMap,
     rooms: List,
 ) -> None:
-    """Generate a new dungeon map."""
+    """
+    Connect every room with tunnels.
+    Tunnels form a minimum spanning tree of the room centers. (see plan_tunnels())
+    """
+    for path in plan_tunnels(dungeon.tunnelmap, [room.center for room in rooms]):
+        dig_tunnel(dungeon, path)
 
-    # Sort rooms by the distance between one another
-    dist_order_rooms = []
-    temp = copy.deepcopy(rooms)
-    new = None
+    return None
 
-    while len(temp) != 0:
 
-        if len(dist_order_rooms) == 0:
-            base_room = temp.pop()
-            dist_order_rooms.append(base_room)
-        else:
-            base_room = new[0]
-            dist_order_rooms.append(new[0])
-            temp.remove(new[0])
-            new = None
-        
-        for room in temp:
-            dist_square = pow(base_room.x1 - room.x1, 2) + pow(base_room.y1 - room.y1, 2)
-            if new == None:
-                new = (room, dist_square)
-            elif new[1] > dist_square:
-                new = (room, dist_square)
-
-    # Choose two rooms and make a tunnel
-    while len(dist_order_rooms) >= 2:
-        room1 = dist_order_rooms.pop(0)
-        room2 = dist_order_rooms[0]
-
-        # The path starts at the center of the room
-        start_x = room1.center[0]
-        start_y = room1.center[1]
-        
-        end_x = room2.center[0]
-        end_y = room2.center[1]
-
-        for x, y in path_between(dungeon.tunnelmap, (start_x, start_y), (end_x, end_y)):
-            if dungeon.tilemap[x, y] == TilemapOrder.VOID.value:
-                dungeon.tiles[x, y] = dungeon.tileset["t_floor"]()
-                #dungeon.tiles[x, y] = dungeon.tileset["t_DEBUG"]()
-                dungeon.tilemap[x, y] = TilemapOrder.TUNNEL.value
-                dungeon.tunnelmap[x, y] = True
-            else:
-                continue
-
-    return None
+def get_stair_candidates(
+    dungeon: GameMap,
+    rooms: List[Room],
+) -> Tuple[List[Tuple[int, int]], List[float]]:
+    """
+    Return every tile that a staircase can be placed on, and the weight of each tile.
+    Tiles are weighted as if a random room that can have stairs is chosen first, and then a random tile of that room.
+    (Tiles of smaller rooms are more likely to be chosen)
+    """
+    tiles, weights = [], []
+    for room in rooms:
+        if not room.terrain.can_have_stair:
+            continue
+        inner_tiles = room.inner_tiles
+        for tile in inner_tiles:
+            if dungeon.tiles["walkable"][tile] and dungeon.tiles["safe_to_walk"][tile] and not dungeon.get_any_entity_at_location(tile[0], tile[1]):
+                tiles.append(tile)
+                weights.append(1 / len(inner_tiles))
+    return tiles, weights
 
 
 def stair_generation(
     dungeon: GameMap,
     rooms: List[Room],
-    direction: int, #0 - up, 1 - down
-    ):
+    pair: bool = False,
+    ) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
     """
-    Choose a random room, check if the room is suitable, choose a random tile, check if the tile is suitable, then return the tile.
+    Choose random tiles for the staircases.
+    If pair is True, both tiles are chosen from the same connected area of walkable and safe tiles,
+    which is labeled only once, so this function never has to retry.
+    Return:
+        (ascending stair tile, descending stair tile)
+        Descending stair tile is None if pair is False.
     """
-    if direction == 0:
-        while True:
-            ascend_room = random.choice(rooms)
-            if not ascend_room.terrain.can_have_stair:
-                continue
-            ascend_tile = random.choice(ascend_room.inner_tiles)
-            if dungeon.get_any_entity_at_location(ascend_tile[0], ascend_tile[1]) or not dungeon.tiles[ascend_tile]["walkable"] or not dungeon.tiles[ascend_tile]["safe_to_walk"]:
-                continue
-            else:
-                return ascend_tile
-    elif direction == 1:
-        while True:
-            descend_room = random.choice(rooms)
-            if not descend_room.terrain.can_have_stair:
-                continue
-            descend_tile = random.choice(descend_room.inner_tiles)
-            if dungeon.get_any_entity_at_location(descend_tile[0], descend_tile[1]) or not dungeon.tiles[descend_tile]["walkable"] or not dungeon.tiles[descend_tile]["safe_to_walk"]:
-                continue
-            else:
-                return descend_tile
+    tiles, weights = get_stair_candidates(dungeon, rooms)
+    if not tiles:
+        print(f"ERROR::There is no tile to place staircases on depth {dungeon.depth}. Using random walkable tiles instead.")
+        tiles = [(int(x), int(y)) for x, y in zip(*np.nonzero(dungeon.tiles["walkable"] & dungeon.tiles["safe_to_walk"]))]
+        weights = [1] * len(tiles)
+        if not tiles:
+            return None, None
+    if not pair:
+        return random.choices(tiles, weights, k=1)[0], None
+
+    # Only the tiles that share an area with at least one other tile can be chosen.
+    from blob import label_chunks
+    labels = label_chunks(dungeon.tiles["walkable"] & dungeon.tiles["safe_to_walk"], diagonal=True)
+    tile_labels = np.array([labels[tile] for tile in tiles])
+    _, inverse, counts = np.unique(tile_labels, return_inverse=True, return_counts=True)
+    pairable = np.flatnonzero(counts[inverse] >= 2)
+    if len(pairable) == 0:
+        print(f"WARNING::There are no connected tiles to place staircases on depth {dungeon.depth}. Staircases may not be connected.")
+        return random.choices(tiles, weights, k=1)[0], random.choices(tiles, weights, k=1)[0]
+
+    ascend_index = random.choices(pairable.tolist(), [weights[n] for n in pairable], k=1)[0]
+    same_area = [n for n in pairable if tile_labels[n] == tile_labels[ascend_index] and n != ascend_index]
+    descend_index = random.choices(same_area, [weights[n] for n in same_area], k=1)[0]
+    return tiles[ascend_index], tiles[descend_index]
 
 
 def generate_stair(
@@ -823,45 +911,22 @@ def generate_stair(
     ascend_tile, descend_tile = None, None
 
     if stair_type == "pair":
-        while True:
-            # Generate stairs
-            ascend_tile = stair_generation(dungeon, rooms, 0)
-            descend_tile = stair_generation(dungeon, rooms, 1)
-            
-            # Check if both stairs are connected to one another
-            connected = False
-            cost = np.array(dungeon.tiles["walkable"], dtype=np.int8) # tunnelmap includes "void" tiles as a valid path, so create a new cost grid and pass it to pathfinder
-
-            # Avoid dangerous tiles
-            dangerous_coordinates = zip(*np.where(dungeon.tiles["safe_to_walk"][:,:] == False))
-            for cor in dangerous_coordinates:
-                cost[cor] = 0
-
-            dangerous_entities = []
+        ascend_tile, descend_tile = stair_generation(dungeon, rooms, pair=True)
+
+        # Remove dangerous entities to walk on, that are on the path between two stairs.
+        if ascend_tile and descend_tile:
+            cost = np.array(dungeon.tiles["walkable"] & dungeon.tiles["safe_to_walk"], dtype=np.int8) # tunnelmap includes "void" tiles as a valid path, so create a new cost grid and pass it to pathfinder
             for x, y in path_between(cost, ascend_tile, descend_tile):
-                # Remove dangerous entities to walk on
                 entity_at_loc = dungeon.get_any_entity_at_location(x, y)
                 if entity_at_loc:
                     if entity_at_loc.walkable:
                         if entity_at_loc.walkable.is_dangerous:
                             print(f"WARNING::Removed entity with dangerous walkable {entity_at_loc.entity_id} on stair pathway at location {x, y}.")
                             entity_at_loc.remove_self()
-
-                if x != descend_tile[0] or y != descend_tile[1]:
-                    continue
-                else:
-                    connected = True
-                    break
-
-            if connected:
-                break
-            else:
-                print("WARNING::Path not found, Regenerating Staircases...") # Search for new locations
-                continue
     elif stair_type == "ascend": # Generate single stair
-        ascend_tile = stair_generation(dungeon, rooms, 0)
+        ascend_tile = stair_generation(dungeon, rooms)[0]
     elif stair_type == "descend": # Generate single stair
-        descend_tile = stair_generation(dungeon, rooms, 1)
+        descend_tile = stair_generation(dungeon, rooms)[0]
 
     if ascend_tile:
         dungeon.tilemap[ascend_tile] = TilemapOrder.ASCEND_STAIR.value
@@ -959,21 +1024,40 @@ def generate_dungeon(
     display_process: bool,
     debugmode: bool = True,
     txt_log: bool = False,
+    biome: Optional[Biome] = None,
+    stage_timings: Optional[Dict[str, float]] = None,
 ) -> GameMap:
     """
     Args:
         display_process:
             Whether to display current procgen process on the screen or not.
+        biome:
+            If given, generate the dungeon using a copy of this biome instead of choosing one by depth.
+        stage_timings:
+            If given, the time spent on each stage(in seconds) is stored in this dictionary.
+            Keys: earth, rooms, tunnels, terrain, stairs, entities, adjust
     """
     from game import Game
     from language import interpret as i
     engine = Game.engine
     rooms: List[Room] = []
-    biome = choose_biome(get_dungeon_biome(depth))# If there is certain list of biomes specified for certain depth, choose one from the specified biome list.
+    if biome is None:
+        biome = choose_biome(get_dungeon_biome(depth))# If there is certain list of biomes specified for certain depth, choose one from the specified biome list.
+    else:
+        biome = copy.deepcopy(biome)
 
     dungeon = GameMap(depth=depth, biome=biome) #NOTE: tilemap initialization happens during  gamemap.__init__()
 
-    t = time.time()
+    t = time.perf_counter()
+    def end_stage(stage: str, description: str) -> None:
+        nonlocal t
+        elapsed = time.perf_counter() - t
+        if stage_timings is not None:
+            stage_timings[stage] = elapsed
+        if debugmode:
+            print(f"{description} - {elapsed}s")
+        t = time.perf_counter()
+
     diversity = 0
     if display_process:
         render_generation_screen(console, context, i("토양 생성 중...", "Generating earth..."), engine, diversity)
@@ -985,9 +1069,7 @@ def generate_dungeon(
         map_height=biome.map_height,
         engine=engine
     )
-    if debugmode:
-        print(f"Generating Earth - {time.time() - t}s")
-        t = time.time()
+    end_stage("earth", "Generating Earth")
 
     if display_process:
         render_generation_screen(console, context, i("던전 공간 생성 중...", "Generating dungeon rooms..."), engine, diversity)
@@ -999,9 +1081,7 @@ def generate_dungeon(
         max_rooms=biome.max_rooms,
         engine=engine
     )
-    if debugmode:
-        print(f"Generating Dungeon Rooms - {time.time() - t}s")
-        t = time.time()
+    end_stage("rooms", "Generating Dungeon Rooms")
 
     if display_process:
         render_generation_screen(console, context, i("터널 생성 중...", "Generating tunnels..."), engine, diversity)
@@ -1011,9 +1091,7 @@ def generate_dungeon(
         dungeon=dungeon,
         rooms=rooms,
     )
-    if debugmode:
-        print(f"Generating Tunnels - {time.time() - t}s")
-        t = time.time()
+    end_stage("tunnels", "Generating Tunnels")
 
     if display_process:
         render_generation_screen(console, context, i("지형 생성 중...", "Generating terrains..."), engine, diversity)
@@ -1025,9 +1103,7 @@ def generate_dungeon(
         map_width=biome.map_width,
         map_height=biome.map_height,
     )
-    if debugmode:
-        print(f"Generating Terrains - {time.time() - t}s")
-        t = time.time()
+    end_stage("terrain", "Generating Terrains")
 
     if display_process:
         render_generation_screen(console, context, i("계단 생성 중...", "Generating staircases..."), engine, diversity)
@@ -1045,9 +1121,7 @@ def generate_dungeon(
             rooms=rooms,
             stair_type="pair"
         )
-    if debugmode:
-        print(f"Generating Staircases - {time.time() - t}s")
-        t = time.time()
+    end_stage("stairs", "Generating Staircases")
 
     if display_process:
         render_generation_screen(console, context, i("엔티티 생성 중...", "Spawning entities..."), engine, diversity)
@@ -1058,9 +1132,7 @@ def generate_dungeon(
         rooms=rooms,
         depth=depth,
     )
-    if debugmode:
-        print(f"Spawning Entities - {time.time() - t}s")
-        t = time.time()
+    end_stage("entities", "Spawning Entities")
 
     if display_process:
         render_generation_screen(console, context, i("던전 다듬는 중...", "Adjusting dungeon..."), engine, diversity)
@@ -1077,9 +1149,7 @@ def generate_dungeon(
         gamemap=dungeon
     )
 
-    if debugmode:
-        print(f"Adjusting Tunnels - {time.time() - t}s")
-        t = time.time()
+    end_stage("adjust", "Adjusting Tunnels")
 
 
     if txt_log:
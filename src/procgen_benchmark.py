@@ -0,0 +1,132 @@
+"""
+Headless benchmark of dungeon generation.
+
+Generates dungeons of every biome in biome_factories.biome_dict with fixed seeds, and reports the time spent on each procgen stage as JSON.
+No tcod console / context is created, so this can be run on a machine without a display.
+
+Usage:
+    python procgen_benchmark.py [--count N] [--seed SEED] [--depth DEPTH] [--biome BIOME_ID ...] [--output FILE]
+
+NOTE: Run from the src directory, like main.py.
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Optional
+
+import argparse
+import contextlib
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+
+STAGES = ("earth", "rooms", "tunnels", "terrain", "stairs", "entities", "adjust")
+
+
+def init_benchmark_engine(depth: int):
+    """
+    Create an engine that only has the information needed to generate dungeons, and set it as Game.engine.
+    """
+    from game import Game
+    from engine import Engine
+    from world import World
+    from configuration import get_game_config
+
+    engine = Engine(player=None, language=Game.language, version=Game.version)
+    engine._config = get_game_config()
+    engine.world = World(max_depth=999)
+    engine.depth = depth
+    engine.initialize_item_manager()
+    Game.engine = engine
+    return engine
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "mean": statistics.mean(samples),
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def run_benchmark(count: int, seed: int, depth: int, biome_ids: Optional[List[str]] = None) -> dict:
+    """
+    Generate count dungeons per biome and measure each procgen stage.
+    The n-th dungeon of every biome is generated from the random streams of (seed + n),
+    so results of different runs are made from the exact same dungeons.
+    Args:
+        biome_ids:
+            Biomes to benchmark. If None, every biome in biome_factories.biome_dict is used.
+    Return:
+        Dictionary that can be dumped as JSON.
+    """
+    import biome_factories
+    from procgen import generate_dungeon
+    from rng import depth_random_streams
+
+    engine = init_benchmark_engine(depth)
+    item_manager = engine.item_manager # Every dungeon starts from the same item manager. (Artifacts are only spawned once per item manager)
+
+    if biome_ids is None:
+        biome_ids = list(biome_factories.biome_dict.keys())
+
+    results = {}
+    for biome_id in biome_ids:
+        biome = biome_factories.biome_dict[biome_id]
+        runs = []
+        for n in range(count):
+            engine.item_manager = copy.deepcopy(item_manager)
+            timings = {}
+            start = time.perf_counter()
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # Mute procgen progress messages
+                with depth_random_streams(seed + n):
+                    dungeon = generate_dungeon(None, None, depth, display_process=False, debugmode=False, biome=biome, stage_timings=timings)
+            timings["total"] = time.perf_counter() - start
+            runs.append({
+                "seed": seed + n,
+                "timings": timings,
+                "entities": len(dungeon.entities),
+            })
+        results[biome_id] = {
+            "runs": runs,
+            "summary": {stage: summarize([run["timings"][stage] for run in runs]) for stage in STAGES + ("total",)},
+        }
+
+    return {
+        "benchmark": "procgen",
+        "version": engine.VERSION,
+        "python": platform.python_version(),
+        "count": count,
+        "seed": seed,
+        "depth": depth,
+        "stages": list(STAGES),
+        "biomes": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the time spent on each dungeon generation stage.")
+    parser.add_argument("--count", type=int, default=5, help="Number of dungeons to generate per biome.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first dungeon of each biome.")
+    parser.add_argument("--depth", type=int, default=1, help="Depth of generated dungeons. (Affects monster and item difficulty)")
+    parser.add_argument("--biome", action="append", dest="biomes", help="Biome id to benchmark. Can be given multiple times. (Default: every biome)")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr): # Keep stdout clean for the JSON report (Factories print debug messages when imported)
+        report = run_benchmark(count=args.count, seed=args.seed, depth=args.depth, biome_ids=args.biomes)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
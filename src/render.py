@@ -49,13 +49,13 @@ def get_names_at_location(x: int, y: int, game_map: GameMap, display_id: bool=Fa
 
     names = []
 
-    for entity in reversed(game_map.entities):
-        if entity.x == x and entity.y == y:
-            if display_id:
-                names.append(f"{id(entity)}:{entity.name}")
-                continue
-            name = Game.engine.modify_entity_name_to_render(entity)
-            names.append(name)
+    # Same order as rendering (entities on top first)
+    for entity in sorted(game_map.entities_at(x, y), key=lambda x: (x.render_order.value, -x.entity_order), reverse=True):
+        if display_id:
+            names.append(f"{id(entity)}:{entity.name}")
+            continue
+        name = Game.engine.modify_entity_name_to_render(entity)
+        names.append(name)
 
     names = ", ".join(names)
     names = names[0:game_map.engine.config["camera_width"] - 7]
@@ -70,7 +70,7 @@ def get_tile_name_at_location(x: int, y: int, game_map: GameMap) -> str:
     if not game_map.in_bounds(x, y) or not game_map.explored[x, y]:
         return ""
 
-    return game_map.tiles[x, y]["tile_name"].capitalize()
+    return game_map.get_tile_name(x, y).capitalize()
 
 
 def render_character_name(
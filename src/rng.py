@@ -0,0 +1,41 @@
+"""
+Per-depth random number streams.
+
+Dungeon generation, and the initialization of entities spawned during the generation, call the module level functions of random and numpy.random. (e.g. random.randint())
+While depth_random_streams() is active, the module level generators are seeded with the depth's seed,
+so that each depth is generated from its own stream regardless of the game's random state.
+The game's random state is restored when the context exits.
+NOTE: The module level generators are shared by every thread of the process.
+Thus dungeons must only be generated on the main thread. (World.pregenerate_maps() uses separate processes)
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Iterator
+
+import random
+import numpy as np
+
+
+def get_depth_seed(world_seed: int, depth: int) -> int:
+    """Return the seed of the given depth's random streams, derived from the world seed."""
+    return int(np.random.SeedSequence([world_seed, depth % (2**32)]).generate_state(1)[0])
+
+
+@contextmanager
+def depth_random_streams(seed: int) -> Iterator[None]:
+    """
+    Seed random and numpy.random with the given seed while the context is active.
+    Args:
+        seed:
+            Use get_depth_seed() to get the seed of a depth.
+    """
+    prev_random = random.getstate()
+    prev_numpy = np.random.get_state()
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        yield
+    finally:
+        random.setstate(prev_random)
+        np.random.set_state(prev_numpy)
@@ -210,6 +210,63 @@ class Room:
                 return True
         return False
     
+    def intersects_at(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of intersects().
+        Checks every given location at once, using a summed-area table of the parent's tilemap.
+        Args:
+            xs, ys:
+                Candidate top-left coordinates of the room. Arrays of the same shape.
+        Return:
+            Boolean array of the same shape as xs.
+            Each element is True if the room would intersect when moved to the location.
+        NOTE: The room is not moved.
+        """
+        tilemap = self.parent.tilemap
+        protectmap = self.parent.protectmap != 0
+        map_width, map_height = tilemap.shape
+        X = np.asarray(xs, dtype=np.int64)
+        Y = np.asarray(ys, dtype=np.int64)
+
+        # Collided with map border
+        result = (X + self.width - 1 > map_width - 4) | (Y + self.height - 1 > map_height - 4) | (X < 4) | (Y < 4)
+        if result.all():
+            return result
+        # Only the results of in-bound locations are used, every other location is clamped to be safely indexed.
+        X = np.clip(X, 4, max(4, map_width - 3 - self.width))[..., None]
+        Y = np.clip(Y, 4, max(4, map_height - 3 - self.height))[..., None]
+
+        # Check for tiles that should not collide with other rooms
+        blocked = np.isin(tilemap, (TilemapOrder.ROOM_INNER.value, TilemapOrder.TUNNEL.value, TilemapOrder.DOOR_CONVEX.value)) | protectmap
+        if self.terrain.protected:
+            blocked |= np.isin(tilemap, (TilemapOrder.DOOR.value, TilemapOrder.DOOR_CONVEX.value))
+        sat = np.zeros((map_width + 1, map_height + 1), dtype=np.int32)
+        sat[1:, 1:] = blocked.cumsum(axis=0, dtype=np.int32).cumsum(axis=1)
+        rects = np.array([(s[0].start, s[0].stop, s[1].start, s[1].stop) for s in self.outer], dtype=np.int64).reshape(-1, 4)
+        rects -= (self.x1, self.x1, self.y1, self.y1) # Relative to the room's location
+        x1 = np.clip(X + rects[:, 0], 0, map_width)
+        x2 = np.clip(X + rects[:, 1], 0, map_width)
+        y1 = np.clip(Y + rects[:, 2], 0, map_height)
+        y2 = np.clip(Y + rects[:, 3], 0, map_height)
+        result |= ((sat[x2, y2] - sat[x1, y2] - sat[x2, y1] + sat[x1, y1]) > 0).any(axis=-1)
+
+        # Doors
+        is_door = tilemap == TilemapOrder.DOOR.value
+        padded = np.pad(is_door, 1)
+        near_door = np.zeros_like(is_door)
+        for dx, dy in ((1,0),(0,1),(-1,0),(0,-1),(1,1),(-1,-1),(1,-1),(-1,1)):
+            near_door |= padded[1+dx:1+dx+map_width, 1+dy:1+dy+map_height]
+        door_banned = near_door | np.isin(tilemap, (TilemapOrder.DOOR.value, TilemapOrder.DOOR_CONVEX.value, TilemapOrder.MAP_BORDER.value))
+        convex_banned = np.isin(tilemap, (TilemapOrder.ROOM_WALL.value, TilemapOrder.DOOR.value, TilemapOrder.MAP_BORDER.value))
+        for locs, banned in ((self.doors_rel.values(), door_banned), (self.door_convexes_rel.values(), convex_banned)):
+            for loc_x, loc_y in locs:
+                loc_xs = np.clip(X[..., 0] + loc_x, 0, map_width - 1)
+                loc_ys = np.clip(Y[..., 0] + loc_y, 0, map_height - 1)
+                result |= banned[loc_xs, loc_ys]
+                if not self.check_if_in_room(self.x1 + loc_x, self.y1 + loc_y):
+                    result |= protectmap[loc_xs, loc_ys]
+        return result
+
     def check_if_in_room(self, x:int, y: int) -> bool:
         """Check if the given coordinates is in this room's inner area."""
         for inner_slice in self.inner:
@@ -214,7 +214,7 @@ class SoundManager():
 
     def update_volume_change(self) -> None:
         """
-        Refresh current config volume data to newly updated json.
+        Refresh current config volume data to newly updated config.
         """
         from configuration import get_game_config
         self.master_volume = round(get_game_config()["master_volume"] / 100, 2)
@@ -11,11 +11,91 @@ from game_map import GameMap
 import semiactor_factories
 import chests
 import chest_factories
+import tiles
 
 if TYPE_CHECKING:
     from rooms import Room
 
 
+def grow_terrain(
+    gamemap: GameMap,
+    core: Tuple[int, int],
+    core_value: int,
+    grown_value: int,
+    scale: int=2,
+    density: float=0.6,
+    check_protected: bool=False,
+    no_border: bool=False,
+) -> Optional[Tuple[Tuple[slice, slice], np.ndarray]]:
+    """
+    Growth kernel of grass, holes, water and pits.
+    Every core spreads the terrain to its diagonal neighbors, and duplicates itself to its cross-direction neighbors, each with the chance of density.
+    Reapeat for amount of scale value received.
+    All cores of a step grow at once using random masks and shifted arrays, instead of visiting each core.
+    NOTE: The result has the same distribution as visiting each core, since every tile is only reached by its 8 neighbors.
+    Args:
+        core_value, grown_value:
+            TilemapOrder values of the core and the terrain. (e.g. GRASS_CORE, GRASS)
+        check_protected:
+            If True, the terrain does not grow onto protected tiles.
+        no_border:
+            If True, the terrain grows onto every tile except for the map border and protected tiles.
+            If False, the terrain only grows onto ROOM_INNER. (Cores can also move onto the terrain that is already grown)
+    Return:
+        (window, grown)
+        window - 2D array index of the area that the terrain can reach.
+        grown - Mask of the tiles in the window that became the terrain.
+        None if the core cannot be placed at the given location.
+    """
+    tilemap = gamemap.tilemap
+    x, y = core
+
+    # Create core at given location
+    if no_border:
+        if tilemap[x, y] == TilemapOrder.MAP_BORDER.value or gamemap.protectmap[x, y]:
+            return None
+    elif tilemap[x, y] != TilemapOrder.ROOM_INNER.value:
+        return None
+
+    # Cores move one tile per step, so the terrain can't reach further than scale+1 tiles from the core.
+    window = (slice(max(x - scale - 1, 0), x + scale + 2), slice(max(y - scale - 1, 0), y + scale + 2))
+    area = tilemap[window] # view
+    before = area.copy()
+    blocked = np.zeros(area.shape, dtype=bool)
+    if check_protected or no_border:
+        blocked |= gamemap.protectmap[window] != 0
+    if no_border:
+        blocked |= area == TilemapOrder.MAP_BORDER.value
+    area[x - window[0].start, y - window[1].start] = core_value
+
+    width, height = area.shape
+    for _ in range(scale):
+        padded_cores = np.pad(area == core_value, 1)
+        chances = (np.random.random((8, width, height)) < density) & ~blocked
+        # Each direction is applied in the order of the core's location(x-major), so that the later core overwrites what the earlier core did.
+        for n, (dx, dy) in enumerate(((1,1), (1,0), (1,-1), (0,1), (0,-1), (-1,1), (-1,0), (-1,-1))):
+            reached = padded_cores[1-dx:1-dx+width, 1-dy:1-dy+height] & chances[n] # Tiles reached by the core at (-dx, -dy)
+            if dx and dy: # Spread terrain in X-directions
+                if not no_border:
+                    reached &= area == TilemapOrder.ROOM_INNER.value
+                area[reached] = grown_value
+            else: # Duplicate cores in cross-directions
+                if not no_border:
+                    reached &= (area == TilemapOrder.ROOM_INNER.value) | (area == grown_value)
+                area[reached] = core_value
+
+    # Change leftover cores into regular terrain
+    area[area == core_value] = grown_value
+    return window, (area == grown_value) & (before != grown_value)
+
+
+def make_deep_terrain(gamemap: GameMap, shallow_value: int, deep_tile) -> None:
+    """Place deep tiles on every tile of the terrain that has at least 8 tiles of the same terrain on its 3x3 area. (including itself)"""
+    from blob import count_neighbors
+    shallow = gamemap.tilemap == shallow_value
+    tiles.fill_tiles(gamemap.tiles, shallow & (count_neighbors(shallow) >= 7), deep_tile) # count_neighbors() does not count the tile itself
+
+
 def grow_grass(
     gamemap: GameMap, grass_tile, grass_core: Tuple[int, int], scale:int=2, density: float=0.6,
 ) -> None:
@@ -27,56 +107,15 @@ def grow_grass(
         scale:
             Integer. Indicates how many time will the grass generating loop repeats.
     """
-    tilemap = gamemap.tilemap
-
-    # Set directions
-    spawn_core_dir = ((1,0), (-1,0), (0,1), (0,-1)) # duplicate core in cross-directions
-    spawn_grass_dir = ((1,1), (1,-1), (-1,1), (-1,-1)) # randomize grass in X-directions
-
-    # Create grass_core at given location
     # NOTE: You have to manually write what types of terrains that the grass can overwrite
     # Currently the grass only grows on ROON_INNER.
-    if tilemap[grass_core[0]][grass_core[1]] == TilemapOrder.ROOM_INNER.value:
-        tilemap[grass_core[0]][grass_core[1]] = TilemapOrder.GRASS_CORE.value
-    else:# cannot spawn grass at given location
+    grown = grow_terrain(gamemap, grass_core, TilemapOrder.GRASS_CORE.value, TilemapOrder.GRASS.value, scale=scale, density=density)
+    if grown is None: # cannot spawn grass at given location
         return -1
 
-    for _ in range(scale):
-        core_locations = zip(*np.where(tilemap == TilemapOrder.GRASS_CORE.value))
-
-        for loc in core_locations:
-            # Spawn grass
-            for direction in spawn_grass_dir:
-                try:
-                    if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.ROOM_INNER.value:#TODO terrain겹침
-                        if random.random() < density:
-                            tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.GRASS.value
-                        else:
-                            continue # density-1/density chance of not generating anything (NOTE: this feature will randomize and diversify grassfield shapes)
-                except:
-                    continue
-
-            # Spawn new grass core
-            for direction in spawn_core_dir:
-                try:
-                    if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.ROOM_INNER.value or tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.GRASS.value:#TODO terrain겹침
-                        if random.random() < density:
-                            tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.GRASS_CORE.value
-                        else:
-                            continue # density-1/density chance of not generating anything
-                except:
-                    continue
-
-    # Change leftover grass_cores into regular grass
-    leftcore_locations = zip(*np.where(tilemap == TilemapOrder.GRASS_CORE.value))
-    for loc in leftcore_locations:
-        tilemap[loc[0]][loc[1]] = TilemapOrder.GRASS.value
-
     # Make Grass tiles
-    grass_locations = zip(*np.where(tilemap == TilemapOrder.GRASS.value))
-
-    for loc in grass_locations:
-        gamemap.tiles[loc[0], loc[1]] = grass_tile()
+    window, grass = grown
+    tiles.fill_tiles(gamemap.tiles[window], grass, grass_tile)
 
 
 def generate_grass(gamemap: GameMap, room: Room) -> None:
@@ -106,59 +145,15 @@ def grow_hole(
         scale:
             Integer. Indicates how many time will the hole generating loop repeats.
     """
-    tilemap = gamemap.tilemap
-
-    # Set directions
-    spawn_core_dir = ((1, 0), (-1, 0), (0, 1), (0, -1))  # duplicate core in cross-directions
-    spawn_hole_dir = ((1, 1), (1, -1), (-1, 1), (-1, -1))  # randomize hole in X-directions
-
-    # Create hole_core at given location
     # NOTE: You have to manually write what types of terrains that the hole can overwrite
     # Currently the hole only grows on ROON_INNER.
-    if tilemap[hole_core[0]][hole_core[1]] == TilemapOrder.ROOM_INNER.value:
-        tilemap[hole_core[0]][hole_core[1]] = TilemapOrder.HOLE_CORE.value
-    else:  # cannot spawn hole at given location
+    grown = grow_terrain(gamemap, hole_core, TilemapOrder.HOLE_CORE.value, TilemapOrder.HOLE.value, scale=scale, density=density)
+    if grown is None: # cannot spawn hole at given location
         return -1
 
-    for _ in range(scale):
-        core_locations = zip(*np.where(tilemap == TilemapOrder.HOLE_CORE.value))
-
-        for loc in core_locations:
-            # Spawn hole
-            for direction in spawn_hole_dir:
-                try:
-                    if tilemap[loc[0] + direction[0]][
-                        loc[1] + direction[1]] == TilemapOrder.ROOM_INNER.value:  # TODO terrain겹침
-                        if random.random() < density:
-                            tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.HOLE.value
-                        else:
-                            continue  # density-1/density chance of not generating anything (NOTE: this feature will randomize and diversify holefield shapes)
-                except:
-                    continue
-
-            # Spawn new hole core
-            for direction in spawn_core_dir:
-                try:
-                    if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.ROOM_INNER.value or \
-                            tilemap[loc[0] + direction[0]][
-                                loc[1] + direction[1]] == TilemapOrder.HOLE.value:  # TODO terrain겹침
-                        if random.random() < density:
-                            tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.HOLE_CORE.value
-                        else:
-                            continue  # density-1/density chance of not generating anything
-                except:
-                    continue
-
-    # Change leftover hole_cores into regular hole
-    leftcore_locations = zip(*np.where(tilemap == TilemapOrder.HOLE_CORE.value))
-    for loc in leftcore_locations:
-        tilemap[loc[0]][loc[1]] = TilemapOrder.HOLE.value
-
     # Make hole tiles
-    hole_locations = zip(*np.where(tilemap == TilemapOrder.HOLE.value))
-
-    for loc in hole_locations:
-        gamemap.tiles[loc[0], loc[1]] = hole_tile()
+    window, holes = grown
+    tiles.fill_tiles(gamemap.tiles[window], holes, hole_tile)
 
 
 def generate_hole(gamemap: GameMap, room: Room) -> None:
@@ -248,105 +243,22 @@ def make_shallow_water(
     """
     NOTE: This function was created based on the grow_grass function
     """
-    tilemap = gamemap.tilemap
-
-    # Set directions
-    spawn_core_dir = ((1,0), (-1,0), (0,1), (0,-1)) # duplicate core in cross-directions
-    spawn_water_dir = ((1,1), (1,-1), (-1,1), (-1,-1)) # randomize grass in X-directions
-
-    # Create water_core at given location
-    # NOTE: You have to manually write what types of terrains that the grass can overwrite
+    # NOTE: You have to manually write what types of terrains that the water can overwrite
     # Currently the water only generates on ROON_INNER, unless it has no_border parameter set to True.
-    if not no_border:
-        if tilemap[water_core[0]][water_core[1]] == TilemapOrder.ROOM_INNER.value:
-            tilemap[water_core[0]][water_core[1]] = TilemapOrder.WATER_CORE.value
-        else:# cannot spawn water at given location
-            return -1
-    else:
-        if tilemap[water_core[0]][water_core[1]] != TilemapOrder.MAP_BORDER.value\
-            and not gamemap.protectmap[water_core[0]][water_core[1]]:
-            tilemap[water_core[0]][water_core[1]] = TilemapOrder.WATER_CORE.value
-        else:
-            return -1
-
-    for _ in range(scale):
-        core_locations = zip(*np.where(tilemap == TilemapOrder.WATER_CORE.value))
-
-        for loc in core_locations:
-            # Spawn water
-            for direction in spawn_water_dir:
-                try:
-                    if no_border:
-                        if random.random() < density:
-                            if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] != TilemapOrder.MAP_BORDER.value\
-                                and not gamemap.protectmap[loc[0] + direction[0]][loc[1] + direction[1]]:
-                                tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.WATER.value
-                        else:
-                            continue # density-1/density chance of not generating
-                    else:
-                        if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.ROOM_INNER.value\
-                            and not gamemap.protectmap[loc[0] + direction[0]][loc[1] + direction[1]]:#TODO terrain collided
-                            if random.random() < density:
-                                tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.WATER.value
-                            else:
-                                continue # density-1/density chance of not generating
-                except:
-                    continue
-
-            # Spawn new water core
-            for direction in spawn_core_dir:
-                try:
-                    if no_border:
-                        if random.random() < density:
-                            if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] != TilemapOrder.MAP_BORDER.value\
-                            and not gamemap.protectmap[loc[0] + direction[0]][loc[1] + direction[1]]:
-                                tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.WATER_CORE.value
-                        else:
-                            continue # density-1/density chance of not generating
-                    else:
-                        if (tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.ROOM_INNER.value or tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.WATER.value)\
-                            and not gamemap.protectmap[loc[0] + direction[0]][loc[1] + direction[1]]:#TODO terrain collided
-                            if random.random() < density:
-                                tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.WATER_CORE.value
-                            else:
-                                continue # density-1/density chance of not generating
-                except:
-                    continue
-
-    # Change leftover water_cores into regular water
-    leftcore_locations = zip(*np.where(tilemap == TilemapOrder.WATER_CORE.value))
-    for loc in leftcore_locations:
-        tilemap[loc[0], loc[1]] = TilemapOrder.WATER.value
-        
-    # Make shallow_pit tile at every TilemapORder.WATER locations 
-    water_locations = zip(*np.where(tilemap == TilemapOrder.WATER.value))
+    grown = grow_terrain(gamemap, water_core, TilemapOrder.WATER_CORE.value, TilemapOrder.WATER.value, scale=scale, density=density, check_protected=True, no_border=no_border)
+    if grown is None: # cannot spawn water at given location
+        return -1
 
-    for loc in water_locations:
-        gamemap.tiles[loc[0], loc[1]] = gamemap.tileset["t_shallow_water"]()
-        #gamemap.tiles[loc[0], loc[1]] = gamemap.tileset["t_DEBUG"]()
+    # Make shallow water tile at every new TilemapOrder.WATER locations
+    window, water = grown
+    tiles.fill_tiles(gamemap.tiles[window], water, gamemap.tileset["t_shallow_water"])
 
 
 def make_deep_water(
     gamemap: GameMap,
 ) -> None:
-    # Search for locations where deep water needs to be placed
-    water_locations = zip(*np.where(gamemap.tilemap == TilemapOrder.WATER.value))
-    deep_water_locations = []
-
-    for cor in water_locations:
-        nearby_water_count = 0
-        for x_add in range(3):
-            for y_add in range(3):
-                try:
-                    if gamemap.tilemap[cor[0]-1+x_add, cor[1]-1+y_add] == TilemapOrder.WATER.value:
-                        nearby_water_count += 1
-                except IndexError: # Out of map border (TODO: Find a better way of dealing this)
-                    continue
-        if nearby_water_count >= 8:# Generate deep water if there are 8 surrounding water tiles nearby
-            deep_water_locations.append(cor)
-
-    for loc in deep_water_locations:
-        gamemap.tiles[loc[0], loc[1]] = gamemap.tileset["t_deep_water"]()
+    # Generate deep water if there are 8 surrounding water tiles nearby
+    make_deep_terrain(gamemap, TilemapOrder.WATER.value, gamemap.tileset["t_deep_water"])
 
 
 def generate_water(gamemap: GameMap, room: Room) -> None:
@@ -374,108 +286,22 @@ def make_shallow_pit(
     """
     NOTE: This function was created based on the grow_grass function
     """
-    tilemap = gamemap.tilemap
-
-    # Set directions
-    spawn_core_dir = ((1, 0), (-1, 0), (0, 1), (0, -1))  # duplicate core in cross-directions
-    spawn_pit_dir = ((1, 1), (1, -1), (-1, 1), (-1, -1))  # randomize grass in X-directions
-
-    # Create pit_core at given location
     # NOTE: You have to manually write what types of terrains that pits can overwrite
     # Currently the pit only generates on ROON_INNER, unless it has no_border parameter set to True.
-    if not no_border:
-        if tilemap[pit_core[0]][pit_core[1]] == TilemapOrder.ROOM_INNER.value:
-            tilemap[pit_core[0]][pit_core[1]] = TilemapOrder.PIT_CORE.value
-        else:  # cannot spawn pit at given location
-            return -1
-    else:
-        if tilemap[pit_core[0]][pit_core[1]] != TilemapOrder.MAP_BORDER.value \
-                and not gamemap.protectmap[pit_core[0]][pit_core[1]]:
-            tilemap[pit_core[0]][pit_core[1]] = TilemapOrder.PIT_CORE.value
-        else:
-            return -1
+    grown = grow_terrain(gamemap, pit_core, TilemapOrder.PIT_CORE.value, TilemapOrder.PIT.value, scale=scale, density=density, check_protected=True, no_border=no_border)
+    if grown is None: # cannot spawn pit at given location
+        return -1
 
-    for _ in range(scale):
-        core_locations = zip(*np.where(tilemap == TilemapOrder.PIT_CORE.value))
-
-        for loc in core_locations:
-            # Spawn pit
-            for direction in spawn_pit_dir:
-                try:
-                    if no_border:
-                        if random.random() < density:
-                            if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] != TilemapOrder.MAP_BORDER.value \
-                                    and not gamemap.protectmap[loc[0] + direction[0]][loc[1] + direction[1]]:
-                                tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.PIT.value
-                        else:
-                            continue  # density-1/density chance of not generating
-                    else:
-                        if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.ROOM_INNER.value \
-                                and not gamemap.protectmap[loc[0] + direction[0]][
-                            loc[1] + direction[1]]:  # TODO terrain collided
-                            if random.random() < density:
-                                tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.PIT.value
-                            else:
-                                continue  # density-1/density chance of not generating
-                except:
-                    continue
-
-            # Spawn new pit core
-            for direction in spawn_core_dir:
-                try:
-                    if no_border:
-                        if random.random() < density:
-                            if tilemap[loc[0] + direction[0]][loc[1] + direction[1]] != TilemapOrder.MAP_BORDER.value \
-                                    and not gamemap.protectmap[loc[0] + direction[0]][loc[1] + direction[1]]:
-                                tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.PIT_CORE.value
-                        else:
-                            continue  # density-1/density chance of not generating
-                    else:
-                        if (tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.ROOM_INNER.value or
-                            tilemap[loc[0] + direction[0]][loc[1] + direction[1]] == TilemapOrder.PIT.value) \
-                                and not gamemap.protectmap[loc[0] + direction[0]][
-                            loc[1] + direction[1]]:  # TODO terrain collided
-                            if random.random() < density:
-                                tilemap[loc[0] + direction[0]][loc[1] + direction[1]] = TilemapOrder.PIT_CORE.value
-                            else:
-                                continue  # density-1/density chance of not generating
-                except:
-                    continue
-
-    # Change leftover pit_cores into regular pit
-    leftcore_locations = zip(*np.where(tilemap == TilemapOrder.PIT_CORE.value))
-    for loc in leftcore_locations:
-        tilemap[loc[0], loc[1]] = TilemapOrder.PIT.value
-
-    # Make shallow_pit tile at every TilemapORder.PIT locations
-    pit_locations = zip(*np.where(tilemap == TilemapOrder.PIT.value))
-
-    for loc in pit_locations:
-        gamemap.tiles[loc[0], loc[1]] = gamemap.tileset["t_shallow_pit"]()
-        # gamemap.tiles[loc[0], loc[1]] = gamemap.tileset["t_DEBUG"]()
+    # Make shallow_pit tile at every new TilemapOrder.PIT locations
+    window, pits = grown
+    tiles.fill_tiles(gamemap.tiles[window], pits, gamemap.tileset["t_shallow_pit"])
 
 
 def make_deep_pit(
         gamemap: GameMap,
 ) -> None:
-    # Search for locations where deep pit needs to be placed
-    pit_locations = zip(*np.where(gamemap.tilemap == TilemapOrder.PIT.value))
-    deep_pit_locations = []
-
-    for cor in pit_locations:
-        nearby_pit_count = 0
-        for x_add in range(3):
-            for y_add in range(3):
-                try:
-                    if gamemap.tilemap[cor[0] - 1 + x_add, cor[1] - 1 + y_add] == TilemapOrder.PIT.value:
-                        nearby_pit_count += 1
-                except IndexError:  # Out of map border (TODO: Find a better way of dealing this)
-                    continue
-        if nearby_pit_count >= 8:  # Generate deep pit if there are 8 surrounding pit tiles nearby
-            deep_pit_locations.append(cor)
-
-    for loc in deep_pit_locations:
-        gamemap.tiles[loc[0], loc[1]] = gamemap.tileset["t_deep_pit"]()
+    # Generate deep pit if there are 8 surrounding pit tiles nearby
+    make_deep_terrain(gamemap, TilemapOrder.PIT.value, gamemap.tileset["t_deep_pit"])
 
 
 def generate_pits(gamemap: GameMap, room: Room) -> None:
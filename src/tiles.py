@@ -1,4 +1,4 @@
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from game import Game
 from language import interpret as t
 
@@ -32,11 +32,81 @@ tile_dt = np.dtype(
         ("diggable", np.bool), # if True, can dig the tile
         ("dark", graphic_dt),  # Graphics for when this tile is not in FOV.
         ("light", graphic_dt),  # Graphics for when the tile is in FOV.
-        ("tile_name", np.unicode_, 16), # Tile name (under 16 letters)
-        ("tile_id", np.unicode_, 16) # Tile id (under 16 letters)
+        ("tile_def", np.uint16), # Index of the tile's (tile_name, tile_id) on TILE_DEFINITIONS. Use get_tile_name(), get_tile_id() to read them.
+        # Integer code and category layers derived from tile_id. (see tile_type_fields())
+        # Use these instead of comparing tile_id strings, so that the check can be done for the whole map using numpy masks.
+        ("tile_type", np.uint8), # TILE_TYPES[tile_id]
+        ("is_water", np.bool), # deep_water, shallow_water
+        ("is_hole", np.bool), # hole
+        ("is_pit", np.bool), # deep_pit, shallow_pit
+        ("is_stair", np.bool), # ascending_stair, descending_stair
     ]
 )
 
+# Shared table of (tile_name, tile_id) of every tile made in this process.
+# Names and ids are kept here instead of in each cell, since they are the largest fields of the tile and are the same for most of the map.
+# NOTE: Indices are only valid in the process that made them. Gamemaps are saved with the names and ids as text. (see compact_tiles())
+TILE_DEFINITIONS: List[Tuple[str, str]] = []
+_tile_definition_index: Dict[Tuple[str, str], int] = {}
+
+
+def register_tile_definition(tile_name: str, tile_id: str) -> int:
+    """Return the index of (tile_name, tile_id) on TILE_DEFINITIONS. Adds it to the table if it is not there yet."""
+    key = (str(tile_name), str(tile_id))
+    index = _tile_definition_index.get(key)
+    if index is None:
+        index = len(TILE_DEFINITIONS)
+        TILE_DEFINITIONS.append(key)
+        _tile_definition_index[key] = index
+    return index
+
+
+def get_tile_name(tile) -> str:
+    """Return the name of the given tile. (e.g. gamemap.tiles[x, y])"""
+    return TILE_DEFINITIONS[tile["tile_def"]][0]
+
+
+def get_tile_id(tile) -> str:
+    """Return the id of the given tile. (e.g. gamemap.tiles[x, y])"""
+    return TILE_DEFINITIONS[tile["tile_def"]][1]
+
+
+# Integer code of every tile_id.
+# NOTE: Codes are saved with the gamemap, so only append new ids at the end of the list.
+TILE_TYPES = {tile_id: code for code, tile_id in enumerate((
+    "debug",
+    "vintronium",
+    "floor",
+    "wall",
+    "dense_grass",
+    "sparse_grass",
+    "burnt_floor",
+    "ascending_stair",
+    "descending_stair",
+    "hole",
+    "deep_pit",
+    "shallow_pit",
+    "deep_water",
+    "shallow_water",
+    "ice",
+))}
+
+
+def tile_type_fields(tile_id: str) -> Tuple[int, bool, bool, bool, bool]:
+    """Return (tile_type, is_water, is_hole, is_pit, is_stair) of the given tile id."""
+    if tile_id not in TILE_TYPES:
+        print(f"ERROR::{tile_id} is not registered on tiles.TILE_TYPES.")
+        tile_type = TILE_TYPES["debug"]
+    else:
+        tile_type = TILE_TYPES[tile_id]
+    return (
+        tile_type,
+        tile_id[-5:] == "water",
+        tile_id == "hole",
+        tile_id[-3:] == "pit",
+        tile_id[-5:] == "stair",
+    )
+
 
 class TileUtil:
     """NOTE: These static method only handles the state-change of a tile.
@@ -54,7 +124,7 @@ class TileUtil:
                 n_tile = Game.engine.game_map.tileset["t_ice"]()
                 return n_tile
             else:
-                print(f"WARNING::Tried to freeze a non-walkable tile {tile['tile_id']}")
+                print(f"WARNING::Tried to freeze a non-walkable tile {get_tile_id(tile)}")
                 return tile
         return tile
 
@@ -84,6 +154,7 @@ class TileUtil:
 
 def new_tile(
     *,  # Enforce the use of keywords, so that parameter order doesn't matter.
+    shape: Optional[Tuple[int, ...]] = None,
     walkable: bool,
     safe_to_walk: bool,
     flammable: float,
@@ -97,12 +168,32 @@ def new_tile(
     tile_name: str,
     tile_id: str,
     ) -> np.ndarray:
-    """Helper function for defining individual tile types """
-    return np.array((walkable, safe_to_walk, flammable, freezable, unfreezable, phaseable, transparent, diggable, dark, light, tile_name, tile_id), dtype=tile_dt)
+    """
+    Helper function for defining individual tile types
+    Args:
+        shape:
+            If given, return an array of the given shape filled with the tile.
+    """
+    tile = np.array((walkable, safe_to_walk, flammable, freezable, unfreezable, phaseable, transparent, diggable, dark, light, register_tile_definition(tile_name, tile_id), *tile_type_fields(tile_id)), dtype=tile_dt)
+    if shape is not None:
+        return np.full(shape, tile, dtype=tile_dt)
+    return tile
+
+
+def randomized_colors(darkest_color: Tuple[int, int, int], brightest_color: Tuple[int, int, int], shape: Tuple[int, ...]) -> np.ndarray:
+    """
+    Return an array of given shape(+ RGB axis) filled with random colors between the two colors, the same way new_tile_randomized() chooses one.
+    """
+    diff = np.abs(np.array(brightest_color) - np.array(darkest_color))
+    min_diff = diff.min()
+    inc = np.array([round(d / min_diff) for d in diff]) #increment
+    strength = np.random.randint(0, min_diff + 1, size=shape)
+    return np.minimum(brightest_color, darkest_color) + inc * strength[..., None]
 
 
 def new_tile_randomized(
     *,  # Enforce the use of keywords, so that parameter order doesn't matter.
+    shape: Optional[Tuple[int, ...]] = None,
     walkable: bool,
     safe_to_walk: bool,
     flammable: float,
@@ -120,7 +211,21 @@ def new_tile_randomized(
     tile_name: str,
     tile_id: str,
     ) -> np.ndarray:
-    """Helper function for defining individual tile types """
+    """
+    Helper function for defining individual tile types
+    Args:
+        shape:
+            If given, return an array of the given shape, where each tile has its own randomized colors.
+            Color strengths are drawn as arrays. (see randomized_colors())
+    """
+    if shape is not None:
+        tiles = np.full(shape, new_tile(walkable=walkable, safe_to_walk=safe_to_walk, flammable=flammable, freezable=freezable, unfreezable=unfreezable,
+                                        phaseable=phaseable, transparent=transparent, diggable=diggable, dark=dark, light=light, tile_name=tile_name, tile_id=tile_id), dtype=tile_dt)
+        if darkest_fg_color and brightest_fg_color:
+            tiles["light"]["fg"] = randomized_colors(darkest_fg_color, brightest_fg_color, shape)
+        if darkest_bg_color and brightest_bg_color:
+            tiles["light"]["bg"] = randomized_colors(darkest_bg_color, brightest_bg_color, shape)
+        return tiles
 
     # fg color randomize
     if darkest_fg_color and brightest_fg_color:
@@ -170,7 +275,73 @@ def new_tile_randomized(
     
     randomized_light = (light[0], fg, bg)
 
-    return np.array((walkable, safe_to_walk, flammable, freezable, unfreezable, phaseable, transparent, diggable, dark, randomized_light, tile_name, tile_id), dtype=tile_dt)
+    return np.array((walkable, safe_to_walk, flammable, freezable, unfreezable, phaseable, transparent, diggable, dark, randomized_light, register_tile_definition(tile_name, tile_id), *tile_type_fields(tile_id)), dtype=tile_dt)
+
+# Tile struct of the tile-definition table of saved gamemaps. tile_def is replaced with the tile's name and id. (see compact_tiles())
+saved_tile_dt = np.dtype(
+    [(name, tile_dt.fields[name][0]) for name in tile_dt.names if name != "tile_def"]
+    + [("tile_name", np.unicode_, 16), ("tile_id", np.unicode_, 16)]
+)
+
+
+def compact_tiles(tile_array: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the compact form of the given tile array, which is used when the gamemap is saved.
+    Return:
+        (table, index, light)
+        table - Every distinct tile of the array, with its light graphic cleared. (saved_tile_dt)
+                Names and ids are stored as text, since TILE_DEFINITIONS indices are not valid in other processes.
+        index - Index of each cell's tile on the table. (small integer array)
+        light - Light graphic of each cell. Stored per cell since tiles made by new_tile_randomized() have different graphics.
+    """
+    definitions = np.array(tile_array, order="C").ravel() # copy
+    definitions["light"] = np.zeros((), dtype=graphic_dt)
+    # Compare raw bytes of each tile, which is much faster than sorting the structured array field by field.
+    _, first, index = np.unique(definitions.view(np.dtype((np.void, tile_dt.itemsize))), return_index=True, return_inverse=True)
+    unique = definitions[first]
+
+    table = np.zeros(len(unique), dtype=saved_tile_dt)
+    for name in tile_dt.names:
+        if name != "tile_def":
+            table[name] = unique[name]
+    table["tile_name"] = [TILE_DEFINITIONS[tile_def][0] for tile_def in unique["tile_def"]]
+    table["tile_id"] = [TILE_DEFINITIONS[tile_def][1] for tile_def in unique["tile_def"]]
+    index = index.reshape(tile_array.shape).astype(np.min_scalar_type(len(table)))
+    return table, index, tile_array["light"].copy()
+
+
+def expand_tiles(table: np.ndarray, index: np.ndarray, light: np.ndarray) -> np.ndarray:
+    """Restore the tile array from the result of compact_tiles()."""
+    unique = np.zeros(len(table), dtype=tile_dt)
+    for name in tile_dt.names:
+        if name != "tile_def":
+            unique[name] = table[name]
+    unique["tile_def"] = [register_tile_definition(tile_name, tile_id) for tile_name, tile_id in zip(table["tile_name"], table["tile_id"])]
+
+    tile_array = np.asfortranarray(unique[index])
+    tile_array["light"] = light
+    return tile_array
+
+
+def fill_tiles(tile_array: np.ndarray, mask: Optional[np.ndarray], tile_function) -> None:
+    """
+    Fill every cell of the mask with tiles made by the tile function, in a single call.
+    Args:
+        tile_array:
+            Tile array to write on. (e.g. gamemap.tiles, or a 2D slice of it)
+        mask:
+            If None, the whole tile_array is filled.
+        tile_function:
+            Tile function such as gamemap.tileset["t_floor"].
+            Randomized tiles get their own colors for each cell.
+    """
+    if mask is None:
+        tile_array[...] = tile_function(shape=tile_array.shape)
+        return
+    count = int(np.count_nonzero(mask))
+    if count:
+        tile_array[mask] = tile_function(shape=(count,))
+
 
 # SHROUD represents unexplored, unseen tiles
 SHROUD = np.array((ord(" "), (255, 255, 255), (0, 0, 0)), dtype=graphic_dt)
@@ -179,6 +350,7 @@ SHROUD = np.array((ord(" "), (255, 255, 255), (0, 0, 0)), dtype=graphic_dt)
 # NOTE:
 # Tiles should have a function form.
 # And each function should only indicate a single type of tile.
+# Each function takes an optional shape parameter, which makes it return an array of tiles. (see fill_tiles())
 # The function name should have the following form:
 #     "tile types"_"biome"
 #     e.g. wall_desert
@@ -186,8 +358,9 @@ SHROUD = np.array((ord(" "), (255, 255, 255), (0, 0, 0)), dtype=graphic_dt)
 
 
 ### Debug Tile
-def DEBUG():
+def DEBUG(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
     walkable=True,
     safe_to_walk=True,
     flammable=1,
@@ -212,8 +385,9 @@ def DEBUG():
 
 
 ### Vintronium (Map border)
-def vintronium():
+def vintronium(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=False,
         safe_to_walk=False,
         flammable=0,
@@ -242,8 +416,9 @@ def vintronium():
 
 
 ### Floor
-def floor():
+def floor(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0,
@@ -265,8 +440,9 @@ def floor():
         tile_name=t("석재 바닥","stone floor"),
         tile_id="floor",
     )
-def floor_forest():
+def floor_forest(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=False,
@@ -288,8 +464,9 @@ def floor_forest():
         tile_name=t("흙","dirt floor"),
         tile_id="floor",
     )
-def floor_desert():
+def floor_desert(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=False,
@@ -311,8 +488,9 @@ def floor_desert():
         tile_name=t("모래 바닥","sand floor"),
         tile_id="floor",
     )
-def floor_crystal():
+def floor_crystal(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=False,
@@ -334,8 +512,9 @@ def floor_crystal():
         tile_name=t("석영 바닥","crystal floor"),
         tile_id="floor",
     )
-def floor_ancient_ruins():
+def floor_ancient_ruins(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=False,
@@ -359,8 +538,9 @@ def floor_ancient_ruins():
     )
 
 ### Wall
-def wall():
+def wall(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=False,
         safe_to_walk=True,
         flammable=0,
@@ -384,8 +564,9 @@ def wall():
         tile_name=t("벽","wall"),
         tile_id="wall",
     )
-def wall_forest():
+def wall_forest(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=False,
         safe_to_walk=True,
         flammable=0.01, # Flammable
@@ -411,8 +592,9 @@ def wall_forest():
         tile_name=t("빽빽한 수목","dense trees"),
         tile_id="wall",
     )
-def wall_desert():
+def wall_desert(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=False,
         safe_to_walk=True,
         flammable=0,
@@ -437,8 +619,9 @@ def wall_desert():
         tile_id="wall",
     )
 
-def wall_crystal():
+def wall_crystal(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=False,
         safe_to_walk=True,
         flammable=0,
@@ -465,8 +648,9 @@ def wall_crystal():
         tile_id="wall",
     )
 
-def wall_ancient_ruins():
+def wall_ancient_ruins(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=False,
         safe_to_walk=True,
         flammable=0,
@@ -492,8 +676,9 @@ def wall_ancient_ruins():
     )
 
 ### Dense Grass
-def dense_grass():
+def dense_grass(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=1,
@@ -517,8 +702,9 @@ def dense_grass():
         tile_name=t("잔디","grass"),
         tile_id="dense_grass",
     )
-def dense_grass_forest():
+def dense_grass_forest(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=1,
@@ -542,8 +728,9 @@ def dense_grass_forest():
         tile_name=t("잔디","grass"),
         tile_id="dense_grass",
     )
-def dense_grass_desert():
+def dense_grass_desert(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=1,
@@ -570,8 +757,9 @@ def dense_grass_desert():
 
 
 ### Sparse Grass
-def sparse_grass():
+def sparse_grass(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0.9,
@@ -593,8 +781,9 @@ def sparse_grass():
         tile_name=t("잔디","grass"),
         tile_id="sparse_grass",
     )
-def sparse_grass_forest():
+def sparse_grass_forest(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0.9,
@@ -616,8 +805,9 @@ def sparse_grass_forest():
         tile_name=t("잔디","grass"),
         tile_id="sparse_grass",
     )
-def sparse_grass_desert():
+def sparse_grass_desert(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0.9,
@@ -642,8 +832,9 @@ def sparse_grass_desert():
 
 
 ### Burnt Floor
-def burnt_floor():
+def burnt_floor(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0,
@@ -668,8 +859,9 @@ def burnt_floor():
 
 
 ### Ascending Stair
-def ascending_stair():
+def ascending_stair(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0,
@@ -694,8 +886,9 @@ def ascending_stair():
 
 
 ### Descending Stair
-def descending_stair():
+def descending_stair(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0,
@@ -720,8 +913,9 @@ def descending_stair():
 
 
 ### Hole
-def hole():
+def hole(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=False,
         flammable=0,
@@ -746,8 +940,9 @@ def hole():
 
 
 ### Deep Pit
-def deep_pit():
+def deep_pit(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=False,
         flammable=0,
@@ -772,8 +967,9 @@ def deep_pit():
 
 
 ### Shallow Pit
-def shallow_pit():
+def shallow_pit(shape: Optional[Tuple[int, ...]] = None):
     return new_tile(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0,
@@ -798,8 +994,9 @@ def shallow_pit():
 
 
 ### Deep Water
-def deep_water():
+def deep_water(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=True,
         safe_to_walk=False,
         flammable=0,
@@ -823,8 +1020,9 @@ def deep_water():
         tile_name=t("깊은 물","deep water"),
         tile_id="deep_water",
     )
-def deep_water_crystal():
+def deep_water_crystal(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=True,
         safe_to_walk=False,
         flammable=0,
@@ -850,8 +1048,9 @@ def deep_water_crystal():
     )
 
 ### Shallow Water
-def shallow_water():
+def shallow_water(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0,
@@ -875,8 +1074,9 @@ def shallow_water():
         tile_name=t("얕은 물","shallow water"),
         tile_id="shallow_water",
     )
-def shallow_water_crystal():
+def shallow_water_crystal(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0,
@@ -904,8 +1104,9 @@ def shallow_water_crystal():
 
 
 ### Ice
-def ice():
+def ice(shape: Optional[Tuple[int, ...]] = None):
     return new_tile_randomized(
+    shape=shape,
         walkable=True,
         safe_to_walk=True,
         flammable=0,
@@ -0,0 +1,202 @@
+"""
+Headless benchmark of the turn loop.
+
+Creates a new game with base.initialization.init_game_variables() using an offscreen console, then drives scripted player actions
+through Engine.handle_world() for a fixed number of turns with a fixed seed.
+Reports turns per second, the time spent on each phase of handle_world(), the cost of each AI / semiactor rule class and the peak memory as JSON.
+Phases are measured with turn_profiler.TurnProfiler, the same way as "profile_turns" of config.json does in the game.
+No window is opened, so this can be run on a machine without a display.
+Gamemaps are saved to a temporary directory that is removed after the run, so the player's saved game is never touched.
+
+Usage:
+    python turn_benchmark.py [--turns N] [--seed SEED] [--descend-every N] [--trace-memory] [--output FILE]
+
+NOTE: Run from the src directory, like main.py.
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Optional
+
+import argparse
+import contextlib
+import copy
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1), (1, -1), (-1, 1))
+
+
+class HeadlessContext:
+    """
+    Stands in for tcod.context.Context while benchmarking.
+    Nothing is presented, since there is no window.
+    """
+    def present(self, *args, **kwargs) -> None:
+        pass
+
+
+class HeadlessSoundManager:
+    """
+    Stands in for sound.SoundManager while benchmarking.
+    Every sound request is accepted and ignored, so that no audio device is needed.
+    """
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: None
+
+
+def init_benchmark_engine(seed: int):
+    """
+    Create a new game the same way main.py does, using an offscreen console, and return the engine.
+    """
+    import tcod
+    import actor_factories
+    from world import World
+    from configuration import get_game_config
+    from base.initialization import init_game_variables
+
+    cfg = get_game_config()
+    World.set_seed(seed)
+    player = copy.deepcopy(actor_factories.player)
+    player.change_name("Benchmark")
+    console = tcod.console.Console(cfg["screen_width"], cfg["screen_height"], order="F")
+    engine = init_game_variables(player, cfg, console, HeadlessContext())
+    engine.sound_manager = HeadlessSoundManager()
+    engine.initialize_pixel() # Animations of monsters' actions read the mouse location
+    engine.player.actor_state.has_immortality = True # Keep the run going for the given number of turns
+    return engine
+
+
+def run_benchmark(turns: int, seed: int, descend_every: int = 0, trace_memory: bool = False) -> dict:
+    """
+    Simulate the given number of turns and measure each phase of Engine.handle_world().
+    The player walks in random directions chosen from its own random stream, so results of different runs are made from the exact same actions.
+    Args:
+        descend_every:
+            If greater than 0, the player is moved onto the descending stair and descends every descend_every turns.
+            Turns that include descending are excluded from turns per second since they are dominated by dungeon generation.
+            descend_time includes the gamemaps serialized and loaded on the background worker.
+        trace_memory:
+            Measure the peak memory of python allocations with tracemalloc. (Slows down the simulation)
+    Return:
+        Dictionary that can be dumped as JSON.
+    """
+    from world import World
+
+    with tempfile.TemporaryDirectory() as map_directory:
+        World.set_map_directory(map_directory)
+        try:
+            return simulate_turns(turns, seed, descend_every, trace_memory)
+        finally:
+            World.set_map_directory(None)
+
+
+def simulate_turns(turns: int, seed: int, descend_every: int, trace_memory: bool) -> dict:
+    """See run_benchmark()."""
+    import exceptions
+    from actions import BumpAction, DescendAction
+    from turn_profiler import TurnProfiler
+
+    if trace_memory:
+        tracemalloc.start()
+
+    engine = init_benchmark_engine(seed)
+    engine.turn_profiler = TurnProfiler(window=turns)
+    script = random.Random(seed)
+    impossible = 0
+    descend_time = 0
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        if descend_every > 0 and turn % descend_every == descend_every - 1 and engine.game_map.descend_loc:
+            descend_start = time.perf_counter()
+            engine.player.place(*engine.game_map.descend_loc)
+            DescendAction(engine.player).perform()
+            engine.world.finish_background_tasks() # Include the gamemaps serialized / loaded on the background worker
+            descend_time += time.perf_counter() - descend_start
+
+        dx, dy = script.choice(DIRECTIONS)
+        try:
+            BumpAction(engine.player, dx, dy).perform()
+        except exceptions.Impossible:
+            impossible += 1
+        engine.handle_world(turn_pass=True)
+    total_time = time.perf_counter() - start
+    engine.world.finish_background_tasks() # Files must be written before the temporary directory is removed
+
+    turn_time = total_time - descend_time
+    stats = engine.turn_profiler.cumulative_stats()
+    report = {
+        "benchmark": "turns",
+        "version": engine.VERSION,
+        "python": platform.python_version(),
+        "seed": seed,
+        "turns": turns,
+        "descend_every": descend_every,
+        "final_depth": engine.depth,
+        "entities": len(engine.game_map.entities),
+        "impossible_actions": impossible,
+        "total_time": total_time,
+        "descend_time": descend_time,
+        "turns_per_second": turns / turn_time if turn_time > 0 else None,
+        "phases": {
+            name: {"total": stat["total"], "per_turn": stat["total"] / turns}
+            for name, stat in stats.get("phase", {}).items()
+        },
+        "ai": stats.get("ai", {}),
+        "rules": stats.get("rule", {}),
+        "peak_memory": get_peak_memory(trace_memory),
+    }
+
+    if trace_memory:
+        tracemalloc.stop()
+    return report
+
+
+def get_peak_memory(trace_memory: bool) -> Dict[str, Optional[int]]:
+    """
+    Return:
+        Peak resident set size of the process in bytes (None if the platform does not support it),
+        and peak size of python allocations in bytes if tracemalloc was used.
+    """
+    peak_rss = None
+    try:
+        import resource # Not available on Windows
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            peak_rss *= 1024 # Linux reports kilobytes
+    except ImportError:
+        pass
+
+    return {
+        "peak_rss_bytes": peak_rss,
+        "tracemalloc_peak_bytes": tracemalloc.get_traced_memory()[1] if trace_memory else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the time spent on each phase of the turn loop.")
+    parser.add_argument("--turns", type=int, default=2000, help="Number of turns to simulate.")
+    parser.add_argument("--seed", type=int, default=0, help="World seed. Also used for the player's scripted actions.")
+    parser.add_argument("--descend-every", type=int, default=0, help="Descend every N turns. (Default: never)")
+    parser.add_argument("--trace-memory", action="store_true", help="Measure peak python allocations with tracemalloc.")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr): # Keep stdout clean for the JSON report (The game prints debug messages)
+        report = run_benchmark(turns=args.turns, seed=args.seed, descend_every=args.descend_every, trace_memory=args.trace_memory)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
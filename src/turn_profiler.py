@@ -0,0 +1,145 @@
+"""
+Optional instrumentation of Engine.handle_world().
+
+When engine.turn_profiler is set, handle_world() reports the wall time of each of its phases,
+and the turn handlers report the cost of every AI / semiactor rule they perform, grouped by class.
+e.g. ("phase", "handle_enemy_turns"), ("ai", "BaseAI"), ("rule", "FireRule")
+When engine.turn_profiler is None (default), nothing is measured.
+
+Costs are kept both as cumulative stats of the whole session and as rolling stats of the recent turns,
+and can be exported as a JSON file to find slow monsters or semiactor rules in a live session.
+"""
+
+from __future__ import annotations
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import json
+import time
+
+
+class TurnProfiler:
+    def __init__(self, window: int = 100, export_path: Optional[str] = None, export_interval: int = 0):
+        """
+        Args:
+            window:
+                Number of recent turns used for rolling stats.
+            export_path:
+                Default path of export().
+            export_interval:
+                If greater than 0, export() is called every export_interval turns.
+        """
+        self.window = window
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.turns: int = 0
+        self.totals: Dict[Tuple[str, str], List[float]] = {} # (category, name): [calls, total time, max time]
+        self.turn_costs: Dict[Tuple[str, str], float] = {} # Costs of the turn that is being measured
+        self.recent: Deque[Dict[Tuple[str, str], float]] = deque(maxlen=window) # turn_costs of recent turns
+
+    def add(self, category: str, name: str, elapsed: float) -> None:
+        key = (category, name)
+        stat = self.totals.get(key)
+        if stat is None:
+            self.totals[key] = [1, elapsed, elapsed]
+        else:
+            stat[0] += 1
+            stat[1] += elapsed
+            if elapsed > stat[2]:
+                stat[2] = elapsed
+        self.turn_costs[key] = self.turn_costs.get(key, 0) + elapsed
+
+    def measure(self, category: str, performer) -> None:
+        """
+        Call performer.perform(), and add its cost to the class of the performer.
+        NOTE: Exceptions are not handled here. (e.g. exceptions.Impossible is passed to the caller)
+        """
+        start = time.perf_counter()
+        try:
+            performer.perform()
+        finally:
+            self.add(category, type(performer).__name__, time.perf_counter() - start)
+
+    def run_phases(self, phases: Iterable[Callable[[], None]]) -> None:
+        """
+        Call every phase of a turn in order, measuring each of them under its function name, then finish the turn.
+        """
+        for phase in phases:
+            start = time.perf_counter()
+            try:
+                phase()
+            finally:
+                self.add("phase", phase.__name__, time.perf_counter() - start)
+        self.end_turn()
+
+    def end_turn(self) -> None:
+        self.recent.append(self.turn_costs)
+        self.turn_costs = {}
+        self.turns += 1
+        if self.export_interval > 0 and self.turns % self.export_interval == 0:
+            self.export()
+
+    def cumulative_stats(self) -> Dict[str, Dict[str, dict]]:
+        """
+        Return:
+            {category: {name: {"calls", "total", "mean", "max"}}} of the whole session. Names are sorted by total time, slowest first.
+        """
+        stats = {}
+        for (category, name), (calls, total, longest) in sorted(self.totals.items(), key=lambda x: -x[1][1]):
+            stats.setdefault(category, {})[name] = {
+                "calls": int(calls),
+                "total": total,
+                "mean": total / calls,
+                "max": longest,
+            }
+        return stats
+
+    def rolling_stats(self) -> Dict[str, Dict[str, dict]]:
+        """
+        Return:
+            {category: {name: {"mean_per_turn", "max_per_turn"}}} of the recent turns. Names are sorted by mean cost per turn, slowest first.
+        """
+        if not self.recent:
+            return {}
+        sums = {}
+        peaks = {}
+        for turn_costs in self.recent:
+            for key, elapsed in turn_costs.items():
+                sums[key] = sums.get(key, 0) + elapsed
+                if elapsed > peaks.get(key, 0):
+                    peaks[key] = elapsed
+
+        stats = {}
+        for key, total in sorted(sums.items(), key=lambda x: -x[1]):
+            category, name = key
+            stats.setdefault(category, {})[name] = {
+                "mean_per_turn": total / len(self.recent),
+                "max_per_turn": peaks[key],
+            }
+        return stats
+
+    def report(self) -> dict:
+        return {
+            "turns": self.turns,
+            "window": len(self.recent),
+            "cumulative": self.cumulative_stats(),
+            "rolling": self.rolling_stats(),
+        }
+
+    def export(self, path: Optional[str] = None) -> None:
+        """Write report() to the given path as JSON. If path is None, self.export_path is used."""
+        path = path or self.export_path
+        if path is None:
+            print("WARNING::TurnProfiler.export() - No export path was given.")
+            return
+        try:
+            with open(path, "w") as f:
+                json.dump(self.report(), f, indent=4)
+        except OSError as e:
+            print(f"ERROR::TurnProfiler.export() - Failed to write {path} - {e}")
+
+    def reset(self) -> None:
+        self.turns = 0
+        self.totals.clear()
+        self.turn_costs = {}
+        self.recent.clear()
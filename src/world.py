@@ -1,16 +1,83 @@
 from __future__ import annotations
-from typing import Optional, Tuple, Type, TypeVar, TYPE_CHECKING, List
+from typing import Optional, Tuple, Type, TypeVar, TYPE_CHECKING, List, Dict, Iterable, Iterator
 from engine import Engine
 from game import Game
 
-import shelve
 import os
+import io
 import copy
+import pickle
 import random
 import numpy
+import rng
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+# Version of the save format. Increase this whenever the format changes, so that incompatible saves are not loaded.
+SAVE_FORMAT_VERSION = 2
+
+
+# Item manager of the engine that created the process pool. Set in each worker process. (see init_pregeneration_process())
+pregeneration_item_manager = None
+
+
+def init_pregeneration_process(snapshot: dict) -> None:
+    """
+    Initialize a worker process of World.pregenerate_maps().
+    Creates an engine that only has the information needed to generate dungeons.
+    """
+    global pregeneration_item_manager
+    from engine import Engine
+    engine = Engine(player=None, language=snapshot["language"], version=snapshot["version"])
+    engine._config = snapshot["config"]
+    engine.toughness = snapshot["toughness"]
+    engine.depth = snapshot["depth"]
+    engine.world = World()
+    engine.world.world_seed = snapshot["world_seed"]
+    pregeneration_item_manager = snapshot["item_manager"]
+    Game.engine = engine
+
+
+def pregenerate_map(depth: int) -> Tuple[GameMap, set]:
+    """
+    Generate the gamemap of given depth in a worker process of World.pregenerate_maps().
+    Every depth starts from the same item manager, so that the result does not depend on which depths the worker has generated before.
+    Return:
+        (gamemap, artifacts that were spawned on the gamemap)
+    """
+    engine = Game.engine
+    engine.item_manager = copy.deepcopy(pregeneration_item_manager)
+    gamemap = engine.world.generate_map(depth)
+    return gamemap, engine.item_manager.generated_artifacts - pregeneration_item_manager.generated_artifacts
+
+
+class GameMapPickler(pickle.Pickler):
+    """Pickles the non-array state of a gamemap. References to the gamemap itself are saved as a persistent id."""
+    def __init__(self, file, gamemap: GameMap):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.gamemap = gamemap
+
+    def persistent_id(self, obj):
+        if obj is self.gamemap:
+            return "gamemap"
+        return None
+
+
+class GameMapUnpickler(pickle.Unpickler):
+    def __init__(self, file, gamemap: GameMap):
+        super().__init__(file)
+        self.gamemap = gamemap
+
+    def persistent_load(self, pid):
+        if pid == "gamemap":
+            return self.gamemap
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
 
 class World():
     __seed: int
+    __map_directory: Optional[str] = None # Directory of gamemap files. storage/data if None. (see set_map_directory())
 
     def __init__(
         self,
@@ -38,6 +105,30 @@ class World():
         #TODO DEBUG
         # NOTE: Change this number depending on the RAM size
 
+        # Background worker
+        # Neighbor levels are loaded, and levels that are removed from the memory are serialized on a single background thread.
+        # Since there is only one worker, tasks are done in the order they were submitted. (e.g. a level is never loaded before it is saved)
+        # NOTE: The worker only reads and writes files. It never touches the engine (item manager, random streams, etc.) or calls get_map().
+        # New levels are generated on the main thread. (see prefetch_map())
+        self.use_background_worker = True # Set to False to do everything on the main thread. (useful for debugging)
+        self.worker: Optional[ThreadPoolExecutor] = None # Created on first use. (see get_worker())
+        self.prefetching: Dict[int, Future] = {} # depth: Future that returns the loaded gamemap
+        self.serializing: Dict[int, Future] = {} # depth: Future of the gamemap being serialized
+
+        # Seed of the world. Each depth's random streams are derived from this value. (see get_depth_seed())
+        self.world_seed = getattr(World, "_World__seed", None)
+        if self.world_seed is None:
+            self.world_seed = random.getrandbits(32)
+        self.pregenerate_depth = 0 # If larger than 0, depth 1 ~ pregenerate_depth are generated in parallel when the game starts. (see pregenerate_maps())
+
+    def __getstate__(self) -> dict:
+        """Background worker is not saved. (Every task is finished before saving, see save_world())"""
+        state = self.__dict__.copy()
+        state["worker"] = None
+        state["prefetching"] = {}
+        state["serializing"] = {}
+        return state
+
     @staticmethod
     def set_seed(seed) -> None:
         World.__seed = seed
@@ -48,6 +139,9 @@ class World():
     def engine(self):
         return Game.engine
 
+    def get_depth_seed(self, depth: int) -> int:
+        return rng.get_depth_seed(self.world_seed, depth)
+
     @property
     def seed(self):
         return copy.deepcopy(self.__seed) # Prevent passing a reference
@@ -64,10 +158,135 @@ class World():
         return False
 
     def check_if_map_has_been_generated(self, depth: int) -> bool:
-        if depth in self.saved_maps:
+        """NOTE: Gamemaps that are being loaded by the background worker are considered generated."""
+        if depth in self.saved_maps or depth in self.prefetching:
             return True
         return False
 
+    def pregenerate_maps(self, depths: Iterable[int], processes: Optional[int]=None) -> None:
+        """
+        Generate the gamemaps of given depths in parallel using a process pool, and serialize them.
+        They are loaded when the player gets close to them, just like any other serialized gamemaps.
+        The result is identical to generating the depths one by one in the given order.
+        Each depth has its own random streams, and every depth of a round starts from the same item manager.
+        When a depth spawns an artifact, later depths of the round were generated while the artifact could still spawn.
+        Their results are discarded, and they are generated again on the next round with the artifact disabled.
+        Args:
+            processes:
+                Number of worker processes. If None, uses every cpu core. If 0, gamemaps are generated one by one on this process.
+        """
+        pending = [depth for depth in depths if not self.check_if_map_has_been_generated(depth)]
+        while pending:
+            accepted = 0
+            results = self.pregenerate_round(pending, processes)
+            try:
+                for depth, (gamemap, artifacts) in zip(pending, results):
+                    for artifact_id in artifacts:
+                        self.engine.item_manager.disable_artifact_from_spawning(artifact_id)
+                    self.save_map_to_serialized_data(gamemap, depth)
+                    self.saved_maps.add(depth)
+                    accepted += 1
+                    if artifacts:
+                        break # The rest of the round did not know about these artifacts.
+            finally:
+                results.close()
+            pending = pending[accepted:]
+
+    def pregenerate_round(self, depths: List[int], processes: Optional[int]) -> Iterator[Tuple[GameMap, set]]:
+        """
+        Generate the given depths from a snapshot of the current engine, and yield the results in order.
+        Depths that are not consumed by the caller are cancelled when possible.
+        """
+        snapshot = {
+            "language": self.engine.LANGUAGE,
+            "version": self.engine.VERSION,
+            "config": self.engine.config,
+            "toughness": self.engine.toughness,
+            "depth": self.engine.depth,
+            "world_seed": self.world_seed,
+            "item_manager": self.engine.item_manager,
+        }
+
+        if processes == 0:
+            engine = Game.engine
+            init_pregeneration_process(copy.deepcopy(snapshot))
+            pregeneration_engine = Game.engine
+            try:
+                for depth in depths:
+                    Game.engine = pregeneration_engine
+                    result = pregenerate_map(depth)
+                    Game.engine = engine # The caller uses the game's engine between depths.
+                    yield result
+            finally:
+                Game.engine = engine
+        else:
+            pool = ProcessPoolExecutor(max_workers=processes, initializer=init_pregeneration_process, initargs=(snapshot,))
+            try:
+                futures = [pool.submit(pregenerate_map, depth) for depth in depths]
+                for future in futures:
+                    yield future.result()
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    def get_worker(self) -> ThreadPoolExecutor:
+        if self.worker is None:
+            self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="world")
+        return self.worker
+
+    def generate_map(self, depth: int):
+        """
+        Generate a new gamemap of given depth.
+        NOTE: Must be called from the main thread, since dungeon generation uses the engine's state. (item manager, random streams, etc.)
+        """
+        print(f"DEBUG::GENERATING DEPTH {depth}")
+        new_map = self.engine.generate_new_dungeon(depth=depth, console=None, context=None, display_process=False)
+        new_map.adjustments_before_new_map() # Adjust things (AI's vision, etc. player's vision is initialized AFTER player has been placed.)
+        return new_map
+
+    def prefetch_map(self, depth: int) -> None:
+        """
+        Prepare the gamemap of given depth, so that it can be swapped in without stalling the game.
+        Gamemaps that have been serialized are loaded on the background.
+        Gamemaps that have never been generated are generated right away on the main thread.
+        """
+        if self.check_if_map_on_mem(depth) or depth in self.prefetching:
+            return None
+        if depth not in self.saved_maps:
+            self.save_map_to_memory(self.generate_map(depth), depth)
+        elif self.use_background_worker:
+            print(f"MEMORY::Loading depth {depth} from serialized data on the background.")
+            self.prefetching[depth] = self.get_worker().submit(World.read_map_file, depth)
+        else:
+            self.save_map_to_memory(self.load_map_from_serialized_data(depth), depth)
+
+    def collect_prefetched_map(self, depth: int) -> None:
+        """
+        Move the prefetched gamemap of given depth to the memory.
+        If the gamemap is not loaded yet, waits until it is done.
+        """
+        future = self.prefetching.pop(depth, None)
+        if future is None:
+            return None
+        try:
+            gamemap = future.result()
+        except Exception as e:
+            print(f"ERROR::Failed to load depth {depth} on the background ({e}). Loading it on the main thread.")
+            gamemap = self.load_map_from_serialized_data(depth)
+        self.save_map_to_memory(gamemap, depth)
+
+    def wait_for_serialization(self, depth: int) -> None:
+        """Wait until the gamemap of given depth is completely serialized by the background worker."""
+        future = self.serializing.pop(depth, None)
+        if future is not None:
+            future.result()
+
+    def finish_background_tasks(self) -> None:
+        """Wait for every task of the background worker, and move every prefetched gamemaps to the memory."""
+        for depth in tuple(self.prefetching.keys()):
+            self.collect_prefetched_map(depth)
+        for depth in tuple(self.serializing.keys()):
+            self.wait_for_serialization(depth)
+
     def save_map_to_memory(self, gamemap, depth: int) -> None:
         """Save map to the memory. Map is yet to be saved as a solid data(serialized form)."""
         print(f"MEMORY::Saved depth {depth} on memory.")
@@ -76,60 +295,155 @@ class World():
         self.saved_maps.add(depth)
         return None
 
-    def save_map_to_serialized_data(self, gamemap, depth:int) -> None:
+    @staticmethod
+    def set_map_directory(path: Optional[str]) -> None:
+        """
+        Save and load gamemap files in the given directory instead of storage/data.
+        Pass None to use storage/data again.
+        NOTE: Used by benchmarks, so that they never overwrite the player's saved gamemaps.
+        """
+        World.__map_directory = path
+
+    @staticmethod
+    def get_map_file_path(depth: int) -> str:
+        if World.__map_directory is not None:
+            return os.path.join(World.__map_directory, f"depth_{depth}.npz")
+        return os.getcwd()+f"\\storage\\data\\depth_{depth}.npz"
+
+    @staticmethod
+    def save_map_to_serialized_data(gamemap, depth:int) -> None:
         print(f"MEMORY::Serialized and saved depth {depth}.")
-        with shelve.open(os.getcwd()+f"\\storage\\data\\game") as gamedata:
-            # prevent pickle lib error(cannot serialize c objects)
-            gamedata["cache_depth_"+str(depth)] = gamemap
-            gamedata.close()
+        World.write_map_file(gamemap, depth)
+
+    @staticmethod
+    def write_map_file(gamemap, depth: int) -> None:
+        """
+        Save the gamemap to its own file. (one file per depth)
+        NOTE: Does not print anything.
+        """
+        World.write_map_layers(World.serialize_map(gamemap), depth)
+
+    @staticmethod
+    def serialize_map(gamemap) -> Dict[str, numpy.ndarray]:
+        """
+        Return the layers of the gamemap's file.
+        Numpy layers (tiles, tilemap, visible, explored, etc.) are saved as raw arrays,
+        and the rest of the gamemap (entities, etc.) is pickled into a single byte array.
+        NOTE: Must be called on the main thread.
+        Entities can refer to entities and gamemaps of other depths (e.g. ai.target, the player), and they are pickled together while the game changes them.
+        """
+        state = gamemap.__getstate__()
+        table, index, light = state.pop("compact_tiles")
+        layers = {"tile_table": table, "tile_index": index, "tile_light": light}
+        for key, value in tuple(state.items()):
+            if isinstance(value, numpy.ndarray):
+                layers[key] = state.pop(key)
+
+        buffer = io.BytesIO()
+        GameMapPickler(buffer, gamemap).dump(state)
+        layers["save_format_version"] = numpy.array(SAVE_FORMAT_VERSION)
+        layers["state"] = numpy.frombuffer(buffer.getvalue(), dtype=numpy.uint8)
+        gamemap.is_dirty = False
+        return layers
+
+    @staticmethod
+    def write_map_layers(layers: Dict[str, numpy.ndarray], depth: int) -> None:
+        """
+        Write the layers made by serialize_map() to the gamemap file of given depth.
+        NOTE: Does not touch any game object, so that it can be called from the background worker.
+        """
+        numpy.savez(World.get_map_file_path(depth), **layers)
 
     def load_map_from_memory(self, depth: int):
         print(f"MEMORY::Load depth {depth} from memory.")
 
         return self.mem_world[depth]
 
-    def load_map_from_serialized_data(self, depth: int):
+    @staticmethod
+    def load_map_from_serialized_data(depth: int):
         """Load a map from serialized data, not memory"""
-        # Check if file exists
-        if not os.path.isfile(os.getcwd()+f"\\storage\\data\\game.dat"):
-            raise FileNotFoundError
-
         print(f"MEMORY::Load depth {depth} from serialized data.")
+        return World.read_map_file(depth)
 
-        with shelve.open(os.getcwd()+f"\\storage\\data\\game") as gamedata:
-            gamemap = gamedata["cache_depth_"+str(depth)]
-            gamedata.close()
+    @staticmethod
+    def read_map_file(depth: int):
+        """
+        Read the gamemap of given depth from its file.
+        NOTE: Does not print anything, so that it can be called from the background worker.
+        """
+        # Check if file exists
+        if not os.path.isfile(World.get_map_file_path(depth)):
+            raise FileNotFoundError
 
-        if gamemap is None:
-            raise Exception("FATAL ERROR::Gamemap is None - load_map_from_serialized data")
+        from game_map import GameMap
+        with numpy.load(World.get_map_file_path(depth), allow_pickle=False) as data:
+            if int(data["save_format_version"]) != SAVE_FORMAT_VERSION:
+                raise Exception(f"FATAL ERROR::Save format version {int(data['save_format_version'])} of depth {depth} is not supported - load_map_from_serialized data")
+            gamemap = GameMap.__new__(GameMap)
+            state = GameMapUnpickler(io.BytesIO(data["state"].tobytes()), gamemap).load()
+            state["compact_tiles"] = (data["tile_table"], data["tile_index"], data["tile_light"])
+            for key in data.files:
+                if key not in ("save_format_version", "state", "tile_table", "tile_index", "tile_light"):
+                    state[key] = data[key]
+        gamemap.__setstate__(state)
+        gamemap.is_dirty = False
         return gamemap
 
     def optimize(self) -> None:
         """
         Delete unused gamemaps from memory, and load gamemaps from serialized data if they are in mem_capacity range.
         """
-        for depth in self.saved_maps:
-            if self.check_if_should_exist_in_memory(depth):
-                if not self.check_if_map_on_mem(depth):
-                    self.mem_world[depth] = self.load_map_from_serialized_data(depth)
-            else:
+        # Remove gamemaps from the memory, and write them on the background if they have changed.
+        # NOTE: Only the file writing is done on the background. Gamemaps are pickled here on the main thread. (see serialize_map())
+        for depth in tuple(self.mem_world.keys()):
+            if not self.check_if_should_exist_in_memory(depth) and self.check_if_map_on_mem(depth):
+                gamemap = self.mem_world[depth]
+                if self.check_if_map_is_dirty(depth):
+                    if self.use_background_worker:
+                        print(f"MEMORY::Writing depth {depth} on the background.")
+                        self.serializing[depth] = self.get_worker().submit(World.write_map_layers, World.serialize_map(gamemap), depth)
+                    else:
+                        self.save_map_to_serialized_data(gamemap, depth)
                 self.mem_world[depth] = None
 
+        # Prepare gamemaps in the memory range
+        for depth in range(self.engine.depth - self.mem_capacity, self.engine.depth + self.mem_capacity + 1): # Including negative depth level generations.
+            self.prefetch_map(depth)
+
     def check_if_map_on_mem(self, depth: int) -> bool:
         if depth not in list(self.mem_world.keys()) or self.mem_world[depth] is None:
             return False
         return True
 
+    def check_if_map_is_dirty(self, depth: int) -> bool:
+        """
+        Return True if the gamemap on memory has changed since it was last serialized.
+        Gamemaps that are not on memory are never dirty, since they are already serialized.
+
+        gamemap.is_dirty is set when entities are added, removed or moved, and when tiles are changed with set_tile().
+        Other changes (explored tiles, entities' own states such as hp, etc.) are not tracked,
+        since they only happen on the current gamemap, where the player is.
+        NOTE: Thus the current gamemap is always considered dirty.
+        When the player leaves a gamemap, the player is removed from it, so the gamemap is marked dirty after every visit.
+        """
+        if not self.check_if_map_on_mem(depth):
+            return False
+        gamemap = self.mem_world[depth]
+        return gamemap.is_dirty or gamemap is self.engine.game_map
+
     def save_world(self) -> None:
-        """Save & Serialize ENTIRE existing gamemaps. For performance issue its recommended to use save_mem() or save_map_to_serialized_data() selectively."""
-        for depth in self.saved_maps:
-            self.save_map_to_serialized_data(self.get_map(depth), depth)
+        """
+        Save & Serialize ENTIRE existing gamemaps.
+        Only the gamemaps that have changed since they were last serialized are rewritten.
+        """
+        self.finish_background_tasks()
+        for depth in sorted(set(self.depths_in_mem)):
+            if self.check_if_map_is_dirty(depth):
+                self.save_map_to_serialized_data(self.mem_world[depth], depth)
 
     def save_mem(self):
         """Update saved maps"""
-        for depth in self.depths_in_mem:
-            if self.check_if_map_on_mem(depth):
-                self.save_map_to_serialized_data(self.load_map_from_memory(depth), depth)
+        self.save_world() # Gamemaps that are not on memory are already serialized.
 
     def get_map(self, depth:int):
         """
@@ -141,9 +455,11 @@ class World():
         Outside of this class boundary, using get_map is preferred.
         """
         gamemap = None
+        self.collect_prefetched_map(depth)
         if self.check_if_map_on_mem(depth): # Prioritize memory.
             gamemap = self.load_map_from_memory(depth)
         elif depth in self.saved_maps:
+            self.wait_for_serialization(depth)
             gamemap = self.load_map_from_serialized_data(depth)
 
         if gamemap is None: